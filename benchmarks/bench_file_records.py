@@ -0,0 +1,121 @@
+"""Memory of the crawled files held as FileIndex records against the nested dicts they replaced."""
+
+#!/usr/bin/env python3
+
+import os
+import sys
+import argparse
+import tracemalloc
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+)  # scripts are imported as top level modules
+
+from file_records import FileIndex  # pylint: disable=wrong-import-position
+
+
+def crawled_files(genomes):
+    """{collection_type: {name: dict}} like add_collection builds, an annotation, 2 proteomes and 4 bigwigs per genome"""
+    files = {"genomes": {}, "annotations": {}, "expression": {}}
+    for number in range(genomes):
+        gensp = ("glyma", "phavu", "medtr", "cicar")[number % 4]
+        genus, species = {
+            "glyma": ("Glycine", "max"),
+            "phavu": ("Phaseolus", "vulgaris"),
+            "medtr": ("Medicago", "truncatula"),
+            "cicar": ("Cicer", "arietinum"),
+        }[gensp]
+        strain = f"S{number // 4}"
+        genome = f"{gensp}.{strain}.gnm1"
+        base = f"https://data.legumeinfo.org/{genus}/{species}"
+        taxa = {
+            "genus": "".join(genus.lower()),  # a new string per file like parsed yaml
+            "species": "".join(species),
+            "infraspecies": "".join(strain),
+            "taxid": 3847,
+        }
+        files["genomes"][genome] = dict(
+            taxa,
+            url=f"{base}/genomes/{strain}.gnm1.ABCD/{genome}.ABCD.genome_main.fna.gz",
+            name=genome,
+            parent=[""],
+            busco={"complete_buscos": 5000, "total_buscos": 5366},
+            counts={"contigs": 20, "scaffolds": 10, "length": 1000000},
+        )
+        annotation = f"{genome}.ann1"
+        collection = f"{base}/annotations/{strain}.gnm1.ann1.EFGH"
+        files["annotations"][annotation] = dict(
+            taxa,
+            url=f"{collection}/{annotation}.EFGH.gene_models_main.gff3.gz",
+            name=annotation,
+            parent=[".".join(genome.split("."))],
+            busco={"complete_buscos": 5000, "total_buscos": 5366},
+            counts={"genes": 50000},
+        )
+        for protein in ("protein", "protein_primary"):
+            files["annotations"][f"{annotation}.{protein}"] = dict(
+                taxa,
+                url=f"{collection}/{annotation}.EFGH.{protein}.faa.gz",
+                name=f"{annotation}.{protein}",
+                parent=[".".join(genome.split("."))],
+            )
+        for sample in ("leaf", "root", "seed", "pod"):
+            name = f"{annotation}.expr.Proj.XY.{sample}.bw"
+            files["expression"][name] = dict(
+                taxa,
+                url=f"{base}/expression/{strain}.gnm1.ann1.expr.Proj.XY/{name}",
+                name=name,
+                parent=[".".join(genome.split("."))],
+            )
+    return files
+
+
+def allocated(build):
+    """Bytes still allocated by what build returns"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def as_dicts(genomes):
+    """The nested dicts self.files kept before"""
+    return crawled_files(genomes)
+
+
+def as_records(genomes):
+    """A FileIndex of the same files, the crawl dicts are dropped once merged"""
+    index = FileIndex()
+    for collection_type, files in crawled_files(genomes).items():
+        index.add(collection_type, files)
+    return index
+
+
+def main():
+    """Prints retained bytes per file for growing synthetic crawls"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", default="100,1000,10000", help="comma separated genome counts"
+    )
+    args = parser.parse_args()
+    print(f"{'files':>8} {'dicts_MB':>9} {'records_MB':>11} {'bytes/file':>17}")
+    for genomes in [int(size) for size in args.sizes.split(",")]:
+        files = sum(len(files) for files in crawled_files(genomes).values())
+        index = as_records(genomes)
+        assert (
+            len(index) == files
+            and len(index.derived_from(next(iter(index.derived)))) == 7
+        )
+        old = allocated(lambda genomes=genomes: as_dicts(genomes))
+        new = allocated(lambda genomes=genomes: as_records(genomes))
+        print(
+            f"{files:>8} {old / 1e6:>9.2f} {new / 1e6:>11.2f} "
+            f"{old // files:>8} -> {new // files:<6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
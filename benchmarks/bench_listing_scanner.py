@@ -0,0 +1,112 @@
+"""Micro-benchmark of ListingScanner against the HTMLParser listing parser it replaced."""
+
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import timeit
+import argparse
+from functools import partial
+from html.parser import HTMLParser
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+)  # scripts are imported as top level modules
+
+from listing_scanner import ListingScanner  # pylint: disable=wrong-import-position
+
+COLLECTION_TYPES = [
+    "genomes",
+    "annotations",
+    "diversity",
+    "expression",
+    "genetic",
+    "markers",
+    "synteny",
+    "genome_alignments",
+]
+
+
+def html_parser_collections(response_text, collection_types):
+    """The per attribute HTMLParser loop previously used by ProcessCollections.parse_attributes"""
+    collections = []
+
+    class CollectionsParser(HTMLParser):
+        """HTMLParser for Collections"""
+
+        def handle_starttag(self, tag, attrs):
+            """Feed from HTMLParser"""
+            for attr in attrs:
+                if attr[0] == "href":
+                    for collection_type in collection_types:
+                        if f"/{collection_type}/" in attr[1]:
+                            collections.append(attr[1])
+
+    CollectionsParser().feed(response_text)
+    return collections
+
+
+def html_listing(base_path, names):
+    """Apache style autoindex listing of base_path linking every name twice like the datastore"""
+    rows = [
+        "<html><head><title>Index</title></head><body><table>",
+        '<tr><td><a href="/Glycine/max/">Parent Directory</a></td></tr>',
+    ]
+    for name in names:
+        rows.append(
+            f'<tr><td valign="top"><img src="/icons/folder.gif" alt="[DIR]"></td>'
+            f'<td><a href="{base_path}{name}/">{name}/</a></td>'
+            f'<td align="right">2024-01-01 00:00</td><td align="right"> - </td>'
+            f'<td><a href="{base_path}{name}/" class="readme">README</a></td></tr>'
+        )
+    rows.append("</table></body></html>")
+    return "\n".join(rows)
+
+
+def json_listing(names):
+    """nginx autoindex_format json listing"""
+    return json.dumps(
+        [
+            {
+                "name": name,
+                "type": "directory",
+                "mtime": "Mon, 01 Jan 2024 00:00:00 GMT",
+            }
+            for name in names
+        ]
+    )
+
+
+def main():
+    """Times both parsers on synthetic listings of increasing size"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", default="100,1000,10000", help="comma separated entry counts"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="timing repeats")
+    args = parser.parse_args()
+    scanner = ListingScanner(COLLECTION_TYPES)
+    base_path = "/Glycine/max/annotations/"
+    print(f"{'entries':>8} {'htmlparser_ms':>14} {'scanner_ms':>11} {'json_ms':>8}")
+    for size in [int(size) for size in args.sizes.split(",")]:
+        names = [f"Wm82.gnm{i}.ann{i}.ABCD" for i in range(size)]
+        html_text = html_listing(base_path, names)
+        json_text = json_listing(names)
+        old = set(html_parser_collections(html_text, COLLECTION_TYPES))
+        new = [entry.path for entry in scanner.scan(html_text, base_path)]
+        assert old == set(new) and len(new) == size  # same collections, deduplicated
+        number = max(1, 10000 // size)
+        timings = []
+        for func in (
+            partial(html_parser_collections, html_text, COLLECTION_TYPES),
+            partial(scanner.scan, html_text, base_path),
+            partial(scanner.scan, json_text, base_path),
+        ):
+            best = min(timeit.repeat(func, number=number, repeat=args.repeat))
+            timings.append(best / number * 1000)
+        print(f"{size:>8} {timings[0]:>14.3f} {timings[1]:>11.3f} {timings[2]:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Benchmark of LocalIndex against per file stats and reads on a synthetic datastore-metadata tree."""
+
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from collections import Counter
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+)  # scripts are imported as top level modules
+
+import local_index  # pylint: disable=wrong-import-position
+
+COLLECTION_TYPES = [
+    "genomes",
+    "annotations",
+    "diversity",
+    "expression",
+    "genetic",
+    "markers",
+    "synteny",
+    "genome_alignments",
+]
+BUSCO_TYPES = ("genomes", "annotations")  # collections with a BUSCO summary
+
+
+class SlowFs:
+    """Counts filesystem calls and adds latency to each, like a network mount"""
+
+    def __init__(self, latency):
+        self.latency = latency  # seconds added to every call
+        self.calls = Counter()
+        self.lock = threading.Lock()
+
+    def wrap(self, name, func):
+        """Returns func counted as name"""
+
+        def call(*args, **kwargs):
+            with self.lock:
+                self.calls[name] += 1
+            if self.latency:
+                time.sleep(self.latency)
+            return func(*args, **kwargs)
+
+        return call
+
+
+def write_file(path, text):
+    """Writes text to path making parent directories"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file_handle:
+        file_handle.write(text)
+
+
+def generate_tree(root, collections, genera=10, species=10):
+    """Writes a datastore-metadata like tree with collections spread over genera, species and genomes/annotations"""
+    taxa = []
+    per_species = max(1, collections // (genera * species * len(BUSCO_TYPES)))
+    for genus_number in range(genera):
+        genus = f"Genus{genus_number}"
+        taxa.append((genus, [f"species{number}" for number in range(species)]))
+        for species_name in taxa[-1][1]:
+            write_file(
+                f"{root}/{genus}/{species_name}/about_this_collection/description_{genus}_{species_name}.yml",
+                "strains: []\n",
+            )
+            for collection_type in BUSCO_TYPES:
+                for number in range(per_species):
+                    name = f"S{number}.gnm1.{collection_type[:3].upper()}{number}"
+                    collection = (
+                        f"{root}/{genus}/{species_name}/{collection_type}/{name}"
+                    )
+                    write_file(
+                        f"{collection}/README.{name}.yml",
+                        "synopsis: x\ntaxid: 1\n",
+                    )
+                    write_file(f"{collection}/CHECKSUM.{name}.md5", "0 ./file.gz\n")
+                    write_file(
+                        f"{collection}/BUSCO/{name}.busco.fabales_odb10.short_summary.json",
+                        "{}",
+                    )
+    return (taxa, per_species * genera * species * len(BUSCO_TYPES))
+
+
+def crawl(root, taxa, isdir, subdirs, read):
+    """Reads every file the from_github crawl reads. Returns the number of files read"""
+    files = 0
+    for genus, species_list in taxa:
+        for species in species_list:
+            species_dir = f"{root}/{genus}/{species}"
+            files += bool(
+                read(
+                    f"{species_dir}/about_this_collection/description_{genus}_{species}.yml"
+                )
+            )
+            for collection_type in COLLECTION_TYPES:
+                collections_dir = f"{species_dir}/{collection_type}/"
+                if not isdir(collections_dir):
+                    continue
+                for name in subdirs(collections_dir):
+                    collection = f"{collections_dir}{name}/"
+                    files += bool(read(f"{collection}README.{name}.yml"))
+                    files += bool(read(f"{collection}CHECKSUM.{name}.md5"))
+                    if collection_type in BUSCO_TYPES:
+                        files += bool(
+                            read(
+                                f"{collection}/BUSCO/{name}.busco.fabales_odb10.short_summary.json"
+                            )
+                        )
+    return files
+
+
+def crawl_stat(root, taxa, slow_fs):
+    """The previous from_github access pattern: isdir, os.walk, isfile and open per file"""
+    isfile = slow_fs.wrap("stat", os.path.isfile)
+    opener = slow_fs.wrap("open", open)
+
+    def read(path):
+        if not isfile(path):
+            return None
+        with opener(path, encoding="utf-8") as file_handle:
+            return file_handle.read()
+
+    return crawl(
+        root,
+        taxa,
+        slow_fs.wrap("stat", os.path.isdir),
+        lambda path: next(slow_fs.wrap("scandir", os.walk)(path))[1],
+        read,
+    )
+
+
+def crawl_index(root, taxa, slow_fs, workers):
+    """The LocalIndex access pattern: one scandir walk per genus and pooled reads"""
+    scandir = os.scandir
+    local_index.os.scandir = slow_fs.wrap("scandir", scandir)
+    local_index.open = slow_fs.wrap("open", open)  # shadows the builtin in the module
+    try:
+        index = local_index.LocalIndex(workers=workers)
+        for genus, _ in taxa:
+            index.add_tree(f"{root}/{genus}")
+        return crawl(root, taxa, index.isdir, index.subdirs, index.read)
+    finally:
+        local_index.os.scandir = scandir
+        del local_index.open
+
+
+def main():
+    """Times both access patterns on one synthetic tree"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--collections", type=int, default=10000, help="collections in the tree"
+    )
+    parser.add_argument(
+        "--latency_ms",
+        type=float,
+        default=0.0,
+        help="milliseconds added to every filesystem call",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=8, help="LocalIndex read threads"
+    )
+    args = parser.parse_args()
+    root = tempfile.mkdtemp(prefix="bench_local_index.")
+    try:
+        taxa, collections = generate_tree(root, args.collections)
+        print(f"{collections} collections in {root}")
+        for label, run in (
+            ("stat+open", lambda slow_fs: crawl_stat(root, taxa, slow_fs)),
+            (
+                "LocalIndex",
+                lambda slow_fs: crawl_index(root, taxa, slow_fs, args.workers),
+            ),
+        ):
+            slow_fs = SlowFs(args.latency_ms / 1000)
+            start = time.perf_counter()
+            files = run(slow_fs)
+            seconds = time.perf_counter() - start
+            calls = ", ".join(
+                f"{name}={count}" for name, count in sorted(slow_fs.calls.items())
+            )
+            print(f"{label:>10}: {seconds:8.3f}s {files} files read, {calls}")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Benchmark of metadata YAML parsing with FullLoader, the libyaml loader and the MetadataLoader cache."""
+
+#!/usr/bin/env python3
+
+import os
+import sys
+import glob
+import time
+import shutil
+import argparse
+import tempfile
+import yaml
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+)  # scripts are imported as top level modules
+
+# pylint: disable=wrong-import-position
+from metadata_loader import MetadataLoader, Loader, Dumper
+
+README = """---
+identifier: {name}
+subdir: {name}
+provenance: https://example.org/provenance/{name}
+source: https://example.org/source/{name}
+synopsis: "Genome assembly of {genus} {species} accession {number}."
+scientific_name: {genus} {species}
+taxid: {taxid}
+bioproject: PRJNA{number:06d}
+scientific_name_abbrev: {gensp}
+genotype:
+  - {number}
+description: "{description}"
+dataset_doi: 10.1000/example.{number}
+publication_doi: 10.1000/journal.{number}
+publication_title: "A chromosome scale assembly of {genus} {species}"
+contributors: "A. Author, B. Author, C. Author"
+data_curators: "D. Curator"
+public_access_level: public
+license: Open
+keywords: [genome, assembly, {genus}, {species}]
+"""
+
+DESCRIPTION = (
+    "This collection was assembled from long reads and scaffolded with Hi-C. " * 8
+)
+
+
+def synthetic_documents(root, genera, species, collections):
+    """Writes READMEs and species descriptions shaped like datastore-metadata. Returns their paths"""
+    paths = []
+    for genus_number in range(genera):
+        genus = f"Genus{genus_number}"
+        for species_number in range(species):
+            species_name = f"species{species_number}"
+            strains = [
+                {
+                    "identifier": f"S{number}",
+                    "accession": f"PI{number}",
+                    "name": f"Strain {number}",
+                    "origin": "Somewhere",
+                    "description": DESCRIPTION,
+                }
+                for number in range(collections)
+            ]
+            path = f"{root}/{genus}/{species_name}/about_this_collection/description_{genus}_{species_name}.yml"
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as handle:
+                yaml.dump(
+                    {"scientific_name": f"{genus} {species_name}", "strains": strains},
+                    handle,
+                )
+            paths.append(path)
+            for number in range(collections):
+                name = f"S{number}.gnm1.ABC{number}"
+                path = f"{root}/{genus}/{species_name}/genomes/{name}/README.{name}.yml"
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w", encoding="utf-8") as handle:
+                    handle.write(
+                        README.format(
+                            name=name,
+                            genus=genus,
+                            species=species_name,
+                            number=number,
+                            taxid=3800 + number,
+                            gensp=f"{genus[:3].lower()}{species_name[:2]}",
+                            description=DESCRIPTION,
+                        )
+                    )
+                paths.append(path)
+    return paths
+
+
+def checkout_documents(metadata_dir):
+    """READMEs and descriptions in a datastore-metadata checkout"""
+    return sorted(
+        glob.glob(f"{metadata_dir}/**/README.*.yml", recursive=True)
+        + glob.glob(f"{metadata_dir}/**/description_*.yml", recursive=True)
+    )
+
+
+def timed(label, func):
+    """Runs func and prints its wall time"""
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:>28}: {time.perf_counter() - start:8.3f}s")
+    return result
+
+
+def main():
+    """Parses every document with each loader and dumps the species descriptions with each dumper"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--metadata_dir",
+        default=None,
+        help="datastore-metadata checkout to parse instead of a synthetic tree",
+    )
+    parser.add_argument("--genera", type=int, default=40, help="synthetic genera")
+    parser.add_argument(
+        "--species", type=int, default=5, help="synthetic species per genus"
+    )
+    parser.add_argument(
+        "--collections", type=int, default=10, help="synthetic collections per species"
+    )
+    args = parser.parse_args()
+    root = tempfile.mkdtemp(prefix="bench_metadata_loader.")
+    try:
+        if args.metadata_dir:
+            paths = checkout_documents(args.metadata_dir)
+        else:
+            paths = synthetic_documents(
+                f"{root}/tree", args.genera, args.species, args.collections
+            )
+        texts = []
+        for path in paths:
+            with open(path, encoding="utf-8") as handle:
+                texts.append((path, os.stat(path).st_mtime_ns, handle.read()))
+        print(
+            f"{len(texts)} documents, {sum(len(text) for _, _, text in texts)} bytes, libyaml: {Loader is not yaml.SafeLoader}"
+        )
+        documents = timed(
+            "yaml.FullLoader",
+            lambda: [yaml.load(text, Loader=yaml.FullLoader) for _, _, text in texts],
+        )
+        timed(
+            "libyaml safe loader",
+            lambda: [yaml.load(text, Loader=Loader) for _, _, text in texts],
+        )
+        loader = MetadataLoader(f"{root}/cache")
+        timed(
+            "MetadataLoader cold cache",
+            lambda: [loader.load(text, path, mtime) for path, mtime, text in texts],
+        )
+        cached = timed(
+            "MetadataLoader warm cache",
+            lambda: [loader.load(text, path, mtime) for path, mtime, text in texts],
+        )
+        assert cached == documents  # the cache returns what the parser did
+        loader.close()
+        descriptions = [
+            document
+            for document in documents
+            if isinstance(document, dict) and "strains" in document
+        ]  # what species_resources.yml is dumped from
+        timed("yaml.dump", lambda: yaml.dump(descriptions))
+        timed("libyaml safe dumper", lambda: yaml.dump(descriptions, Dumper=Dumper))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
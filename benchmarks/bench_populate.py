@@ -0,0 +1,242 @@
+"""Benchmark of parse_collections, populate_dscensor and populate_jbrowse2 --cmds_only on synthetic datastores."""
+
+#!/usr/bin/env python3
+
+import os
+import io
+import sys
+import glob
+import json
+import hashlib
+import time
+import shutil
+import logging
+import argparse
+import resource
+import tempfile
+import contextlib
+import subprocess
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+)  # scripts are imported as top level modules
+
+# pylint: disable=wrong-import-position
+from process_collections import ProcessCollections
+from synthetic_datastore import generate_datastore, serve
+
+STAGES = ("parse_collections", "populate_dscensor", "populate_jbrowse2")
+
+
+def output_digests(out_dir, roots):
+    """{path: sha256} of every YAML file under out_dir, with the datastore roots that change between runs replaced"""
+    digests = {}
+    for path in sorted(glob.glob(f"{out_dir}/**/*.yml", recursive=True)):
+        with open(path, encoding="utf-8") as yaml_handle:
+            text = yaml_handle.read()
+        for root in filter(None, roots):  # server port and temporary directory
+            text = text.replace(root, "DATASTORE")
+        digests[os.path.relpath(path, out_dir)] = hashlib.sha256(
+            text.encode("utf-8")
+        ).hexdigest()
+    return digests
+
+
+def changed_outputs(result, reference):
+    """Paths whose YAML differs between two results, or that only one of them wrote"""
+    paths = set(result["outputs"]) | set(reference["outputs"])
+    return sorted(
+        path
+        for path in paths
+        if result["outputs"].get(path) != reference["outputs"].get(path)
+    )
+
+
+def run_scale(args, datastore_url, taxon_list, from_github, out_dir):
+    """Runs every stage once in this process. Returns seconds per stage, requests sent and peak RSS"""
+    logging.basicConfig(level=logging.ERROR)
+    parser = ProcessCollections(
+        logging.getLogger("bench_populate"),
+        datastore_url=datastore_url,
+        jbrowse_url="http://127.0.0.1/jbrowse",
+        out_dir=f"{out_dir}/jekyll",
+        workers=args.workers,
+        jobs=args.jobs,
+    )
+    seconds = {}
+    start = time.perf_counter()
+    parser.parse_collections(taxon_list, from_github)
+    seconds["parse_collections"] = time.perf_counter() - start
+    start = time.perf_counter()
+    parser.populate_dscensor(f"{out_dir}/dscensor")
+    seconds["populate_dscensor"] = time.perf_counter() - start
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # commands are only printed
+        parser.populate_jbrowse2(f"{out_dir}/jbrowse2", True)
+    seconds["populate_jbrowse2"] = time.perf_counter() - start
+    summary = parser.metrics.summary()
+    untaxed = [
+        record.name
+        for collection_type in ("genomes", "annotations")
+        for record in parser.files.records(collection_type)
+        if not record.url.endswith("faa.gz") and not record.taxid
+    ]  # taxids come from the collection README, BLAST databases are made with them
+    return {
+        "outputs": output_digests(f"{out_dir}/jekyll", (datastore_url, from_github)),
+        "untaxed": untaxed,
+        "seconds": seconds,
+        "requests": sum(
+            request["latency"]["count"] for request in summary["requests"].values()
+        ),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def missing_collections(datastore, jekyll_dir):
+    """Collections whose README collection and synopsis are not in the species_collections.yml of their genus"""
+    missing = []
+    for readme in sorted(glob.glob(f"{datastore}/*/*/*/*/README.*.yml")):
+        genus = os.path.relpath(readme, datastore).split(os.sep)[0]
+        with open(readme, encoding="utf-8") as readme_handle:
+            fields = dict(
+                line.split(": ", 1) for line in readme_handle.read().splitlines()
+            )
+        entry = f'    - collection: {fields["identifier"]}\n      synopsis: "{fields["synopsis"]}"\n'
+        collections = f"{jekyll_dir}/{genus}/species_collections.yml"
+        with open(collections, encoding="utf-8") as collections_handle:
+            if entry not in collections_handle.read():
+                missing.append(fields["identifier"])
+    return missing
+
+
+def measure(args, scale, datastore_url, taxon_list, from_github, out_dir):
+    """Runs run_scale in a fresh interpreter so peak RSS is not carried over from other scales"""
+    output = subprocess.run(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--child",
+            json.dumps([datastore_url, taxon_list, from_github, out_dir]),
+            "--workers",
+            str(args.workers),
+            "--jobs",
+            str(args.jobs),
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    result = json.loads(output.strip().split("\n")[-1])
+    result["scale"] = scale
+    return result
+
+
+def parse_scale(scale):
+    """Returns (genera, species, collections) from a genera:species:collections scale"""
+    genera, species, collections = (int(value) for value in scale.split(":"))
+    return (genera, species, collections)
+
+
+def main():
+    """Generates a datastore per scale and times every stage against the server and as --from_github.
+
+    Every run must write the synopsis of each collection README and set its taxid, and write the same
+    YAML as the same scale and mode in the --compare results, else it fails.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--scales",
+        default="2:2:2,4:5:4,8:10:5",
+        help="comma separated genera:species:collections, collections are per type per species",
+    )
+    parser.add_argument(
+        "--latency_ms",
+        type=float,
+        default=5.0,
+        help="milliseconds the server waits before every response",
+    )
+    parser.add_argument(
+        "--modes",
+        default="remote,github",
+        help="remote crawls the server, github reads metadata from the tree like --from_github",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=8, help="ProcessCollections crawl threads"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="ProcessCollections crawl processes"
+    )
+    parser.add_argument("--json_out", default=None, help="also write results here")
+    parser.add_argument(
+        "--compare",
+        default=None,
+        help="--json_out of an earlier run, the output YAML of every scale and mode must match it",
+    )
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:  # one scale in one mode, see measure
+        print(json.dumps(run_scale(args, *json.loads(args.child))))
+        return
+    references = {}  # (scale, mode) -> earlier result
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as json_handle:
+            for result in json.load(json_handle):
+                references[(result["scale"], result["mode"])] = result
+    root = tempfile.mkdtemp(prefix="bench_populate.")
+    results = []
+    try:
+        print(
+            f"{'scale':>10} {'mode':>6} {'collections':>11} {'requests':>8} "
+            + " ".join(f"{stage:>18}" for stage in STAGES)
+            + f" {'collections/s':>13} {'peak RSS MB':>11}"
+        )
+        for scale in args.scales.split(","):
+            datastore = f"{root}/{scale.replace(':', '_')}/datastore"
+            taxon_list, collections = generate_datastore(datastore, *parse_scale(scale))
+            server, url = serve(datastore, args.latency_ms / 1000)
+            try:
+                for mode in args.modes.split(","):
+                    result = measure(
+                        args,
+                        scale,
+                        url,
+                        taxon_list,
+                        datastore if mode == "github" else "",
+                        f"{root}/{scale.replace(':', '_')}/{mode}",
+                    )
+                    result.update({"mode": mode, "collections": collections})
+                    missing = missing_collections(
+                        datastore, f"{root}/{scale.replace(':', '_')}/{mode}/jekyll"
+                    )
+                    if missing or result["untaxed"]:
+                        raise SystemExit(
+                            f"{scale} {mode}: no synopsis for {missing}, no taxid for {result['untaxed']}"
+                        )
+                    changed = (scale, mode) in references and changed_outputs(
+                        result, references[(scale, mode)]
+                    )
+                    if changed:
+                        raise SystemExit(
+                            f"{scale} {mode}: output differs from {args.compare} in {changed}"
+                        )
+                    results.append(result)
+                    print(
+                        f"{scale:>10} {mode:>6} {collections:>11} {result['requests']:>8} "
+                        + " ".join(
+                            f"{result['seconds'][stage]:>17.3f}s" for stage in STAGES
+                        )
+                        + f" {collections / result['seconds']['parse_collections']:>13.1f}"
+                        + f" {result['peak_rss_kb'] / 1024:>11.1f}"
+                    )
+            finally:
+                server.shutdown()
+                server.server_close()
+        if args.json_out:
+            with open(args.json_out, "w", encoding="utf-8") as json_handle:
+                json.dump(results, json_handle, indent=2)
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
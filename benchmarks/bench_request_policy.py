@@ -0,0 +1,142 @@
+"""Crawls a synthetic datastore through a fault injecting server and checks nothing is lost to transient errors."""
+
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import shutil
+import filecmp
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+)  # scripts are imported as top level modules
+
+# pylint: disable=wrong-import-position
+from process_collections import ProcessCollections
+from synthetic_datastore import generate_datastore, serve, FaultInjector
+
+
+def crawl(args, url, taxon_list, out_dir, retries):
+    """Runs parse_collections and populate_dscensor against url. Returns (seconds, summary, final limit)"""
+    parser = ProcessCollections(
+        logging.getLogger("bench_request_policy"),
+        datastore_url=url,
+        jbrowse_url="http://127.0.0.1/jbrowse",
+        out_dir=f"{out_dir}/jekyll",
+        workers=args.workers,
+        retries=retries,
+    )
+    parser.policy.timeouts = {
+        kind: (1, args.timeout) for kind in parser.policy.timeouts
+    }  # slow faults time out instead of stalling the benchmark
+    parser.policy.backoff = args.backoff
+    start = time.perf_counter()
+    parser.parse_collections(taxon_list, "")
+    parser.populate_dscensor(f"{out_dir}/dscensor")
+    return (
+        time.perf_counter() - start,
+        parser.metrics.summary(),
+        parser.policy.limit.limit,
+    )
+
+
+def differences(expected, actual):
+    """Returns the relative paths of files that differ or are missing between two output trees"""
+    different = []
+    for directory, _, names in os.walk(expected):
+        for name in names:
+            path = os.path.relpath(os.path.join(directory, name), expected)
+            if not os.path.isfile(os.path.join(actual, path)) or not filecmp.cmp(
+                os.path.join(expected, path), os.path.join(actual, path), shallow=False
+            ):
+                different.append(path)
+    return different
+
+
+def main():
+    """Compares crawls through a clean server with crawls through a faulty one with and without retries"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--genera", type=int, default=2, help="synthetic genera")
+    parser.add_argument(
+        "--species", type=int, default=4, help="synthetic species per genus"
+    )
+    parser.add_argument(
+        "--collections", type=int, default=3, help="collections per type per species"
+    )
+    parser.add_argument(
+        "--fault_rate", type=float, default=0.2, help="fraction of requests that fail"
+    )
+    parser.add_argument(
+        "--latency_ms",
+        type=float,
+        default=2.0,
+        help="milliseconds before every response",
+    )
+    parser.add_argument("--workers", type=int, default=8, help="crawl threads")
+    parser.add_argument(
+        "--retries", type=int, default=4, help="retries of the faulty crawl"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=1.0, help="read timeout of every request"
+    )
+    parser.add_argument(
+        "--backoff", type=float, default=0.05, help="seconds before the first retry"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)  # failures are reported below
+    root = tempfile.mkdtemp(prefix="bench_request_policy.")
+    lost = []
+    try:
+        datastore = f"{root}/datastore"
+        taxon_list, collections = generate_datastore(
+            datastore, args.genera, args.species, args.collections
+        )
+        print(f"{collections} collections, fault rate {args.fault_rate}")
+        port = 0  # every crawl uses the same url so outputs compare equal
+        for number, (label, faults, retries) in enumerate(
+            (
+                ("clean", None, args.retries),
+                ("faulty, no retries", FaultInjector(args.fault_rate), 0),
+                (
+                    f"faulty, {args.retries} retries",
+                    FaultInjector(args.fault_rate, slow_seconds=args.timeout * 2),
+                    args.retries,
+                ),
+            )
+        ):
+            server, url = serve(datastore, args.latency_ms / 1000, port, faults)
+            port = server.server_address[1]
+            out_dir = f"{root}/crawl{number}"
+            try:
+                seconds, summary, limit = crawl(args, url, taxon_list, out_dir, retries)
+            except (SystemExit, Exception) as error:  # pylint: disable=broad-except
+                print(
+                    f"{label:>20}: aborted by {type(error).__name__} {error}"
+                )  # a genome without its fai or listing ends the run
+                continue
+            finally:
+                server.shutdown()
+                server.server_close()
+            requests = summary["requests"].values()
+            lost = (
+                differences(f"{root}/crawl0", out_dir) if faults else []
+            )  # the clean crawl is the reference
+            print(
+                f"{label:>20}: {seconds:7.2f}s "
+                f"{sum(request['latency']['count'] for request in requests)} requests "
+                f"{sum(request['retries'] for request in requests)} retries "
+                f"{faults.injected() if faults else 0} faults "
+                f"concurrency limit {limit:.1f} "
+                f"{len(lost)} output files lost or different"
+            )
+    finally:
+        shutil.rmtree(root)
+    sys.exit(1 if lost else 0)  # the last crawl retried and must match the clean one
+
+
+if __name__ == "__main__":
+    main()
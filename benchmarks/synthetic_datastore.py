@@ -0,0 +1,323 @@
+"""Synthetic datastore tree and a local HTTP server standing in for data.legumeinfo.org in benchmarks."""
+
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import functools
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+COLLECTION_TYPES = [
+    "genomes",
+    "annotations",
+    "diversity",
+    "expression",
+    "genetic",
+    "markers",
+    "genome_alignments",
+]  # types generated for every species, in ProcessCollections crawl order
+PLACEHOLDER = "x"  # body of data files, only their names and CHECKSUMs are read
+
+BUSCO = {
+    "results": {
+        "Complete": 98.0,
+        "Single copy": 90.0,
+        "Multi copy": 8.0,
+        "Fragmented": 1.0,
+        "Missing": 1.0,
+        "n_markers": 5366,
+        "Number of scaffolds": 10,
+        "Number of contigs": 20,
+        "Total length": 100000,
+        "Percent gaps": "0.5%",
+        "Scaffold N50": 5000,
+    }
+}  # fabales_odb10 short summary fields parse_busco reads
+
+
+def letters(number):
+    """Two letter prefix for number so every genus and species has a distinct gensp"""
+    return f"{chr(97 + number // 26 % 26)}{chr(97 + number % 26)}"
+
+
+def write_file(path, text):
+    """Writes text to path making parent directories"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file_handle:
+        file_handle.write(text)
+
+
+def write_collection(collection, name, files, synopsis):
+    """Writes files {filename: text}, a README and a CHECKSUM into the collection directory.
+
+    Like the datastore's md5sum ./* the CHECKSUM lists the README and every file at the top of the
+    collection, but nothing in subdirectories like BUSCO/.
+    """
+    readme = f"identifier: {name}\nsynopsis: {synopsis}\ntaxid: 3827\n"
+    files = {**files, f"README.{name}.yml": readme}
+    checksums = []
+    for filename, text in sorted(files.items()):
+        write_file(f"{collection}/{filename}", text)
+        if "/" not in filename:
+            checksums.append(
+                f"{hashlib.md5(text.encode('utf-8')).hexdigest()}  ./{filename}\n"
+            )
+    write_file(f"{collection}/CHECKSUM.{name}.md5", "".join(checksums))
+
+
+def write_listing(directory, path, subdirs):
+    """Writes an autoindex like index.html linking subdirs under the url path"""
+    links = "".join(f'<a href="{path}{subdir}/">{subdir}/</a>\n' for subdir in subdirs)
+    write_file(
+        f"{directory}/index.html",
+        f"<html><head><title>Index of {path}</title></head><body><pre>\n{links}</pre></body></html>\n",
+    )
+
+
+def write_species(root, genus, species, collections):
+    """Writes collections of every type for one species. Returns the number of collections written"""
+    gensp = f"{genus[:3].lower()}{species[:2].lower()}"
+    species_dir = f"{root}/{genus}/{species}"
+    strains = [f"S{number}" for number in range(collections)]
+    write_file(
+        f"{species_dir}/about_this_collection/description_{genus}_{species}.yml",
+        f"scientific_name: {genus} {species}\nstrains:\n"
+        + "".join(
+            f"  - identifier: {strain}\n    name: {strain}\n" for strain in strains
+        ),
+    )
+    listed = {collection_type: [] for collection_type in COLLECTION_TYPES}
+    for number, strain in enumerate(strains):
+        mate = strains[(number + 1) % len(strains)]  # aligned against the next strain
+        names = {
+            "genomes": f"{strain}.gnm1.G{number:03d}",
+            "annotations": f"{strain}.gnm1.ann1.A{number:03d}",
+            "diversity": f"{strain}.gnm1.div1.D{number:03d}",
+            "expression": f"{strain}.gnm1.ann1.expr.Proj{number}.E{number:03d}",
+            "genetic": f"{strain}.gnm1.gen1.N{number:03d}",
+            "markers": f"{strain}.gnm1.mrk1.M{number:03d}",
+            "genome_alignments": f"{strain}.gnm1.x.{gensp}.{mate}.gnm1.X{number:03d}",
+        }
+        busco = json.dumps(BUSCO)
+        files = {
+            "genomes": {
+                f"{gensp}.{names['genomes']}.genome_main.fna.gz": PLACEHOLDER,
+                f"{gensp}.{names['genomes']}.genome_main.fna.gz.fai": "".join(
+                    f"{gensp}.{strain}.gnm1.Chr{chromosome:02d}\t{chromosome * 1000000}\t{chromosome * 64}\t60\t61\n"
+                    for chromosome in range(1, 11)
+                ),
+                f"BUSCO/{gensp}.{names['genomes']}.busco.fabales_odb10.short_summary.json": busco,
+            },
+            "annotations": {
+                f"{gensp}.{names['annotations']}.gene_models_main.gff3.gz": PLACEHOLDER,
+                f"{gensp}.{names['annotations']}.gene_models_main.gff3.gz.tbi": PLACEHOLDER,
+                f"{gensp}.{names['annotations']}.protein.faa.gz": PLACEHOLDER,
+                f"{gensp}.{names['annotations']}.protein_primary.faa.gz": PLACEHOLDER,
+                f"BUSCO/{gensp}.{names['annotations']}.busco.fabales_odb10.short_summary.json": busco,
+            },
+            "diversity": {f"{gensp}.{names['diversity']}.vcf.gz": PLACEHOLDER},
+            "expression": {
+                f"{gensp}.{names['expression']}.{sample}.bw": PLACEHOLDER
+                for sample in ("leaf", "root")
+            },
+            "genetic": {f"{gensp}.{names['genetic']}.qtl.bed.gz": PLACEHOLDER},
+            "markers": {f"{gensp}.{names['markers']}.bed.gz": PLACEHOLDER},
+            "genome_alignments": {
+                f"{gensp}.{names['genome_alignments']}.minimap2.paf.gz": PLACEHOLDER
+            },
+        }
+        for collection_type in COLLECTION_TYPES:
+            name = names[collection_type]
+            write_collection(
+                f"{species_dir}/{collection_type}/{name}",
+                name,
+                files[collection_type],
+                f"{collection_type} {genus} {species} {strain}",
+            )
+            listed[collection_type].append(name)
+    for collection_type, names in listed.items():
+        write_listing(
+            f"{species_dir}/{collection_type}",
+            f"/{genus}/{species}/{collection_type}/",
+            names,
+        )
+    return len(strains) * len(COLLECTION_TYPES)
+
+
+def generate_datastore(root, genera, species, collections):
+    """Writes a datastore of genera x species with collections of every type per species under root.
+
+    At most 676 genera and 676 species per genus, gensp abbreviations must stay unique.
+
+    The same tree is served over HTTP and read as a --from_github datastore-metadata checkout.
+    Returns (taxon_list_path, collections) with the taxon list written next to root.
+    """
+    taxa = []
+    total = 0
+    for genus_number in range(genera):
+        genus = f"G{letters(genus_number)}ia"
+        species_list = [f"{letters(number)}ensis" for number in range(species)]
+        write_file(
+            f"{root}/{genus}/GENUS/about_this_collection/description_{genus}.yml",
+            f"genus: {genus}\nspecies:\n"
+            + "".join(f"  - {name}\n" for name in species_list),
+        )
+        for species_name in species_list:
+            total += write_species(root, genus, species_name, collections)
+        taxa.append(f"- genus: {genus}\n  description: {genus}\n")
+    taxon_list = f"{os.path.abspath(root)}.taxon_list.yml"
+    write_file(taxon_list, "".join(taxa))
+    return (taxon_list, total)
+
+
+FAULTS = (
+    "429",
+    "500",
+    "503",
+    "slow",
+    "drop",
+)  # throttled, server error, unavailable with Retry-After, slow response, dropped connection
+
+
+class FaultInjector:
+    """Picks faults for a fraction rate of requests, at most max_per_path times for each path so retries succeed"""
+
+    def __init__(
+        self,
+        rate,
+        kinds=FAULTS,
+        max_per_path=2,
+        slow_seconds=2.0,
+        retry_after="0",
+        seed=0,
+    ):
+        self.rate = rate  # fraction of requests that fail
+        self.kinds = kinds
+        self.max_per_path = max_per_path
+        self.slow_seconds = slow_seconds  # delay of a slow response
+        self.retry_after = retry_after  # Retry-After sent with 429 and 503
+        self.random = random.Random(seed)
+        self.faults = {}  # path -> faults injected
+        self.lock = threading.Lock()
+
+    def pick(self, path):
+        """Returns the fault for a request of path or None"""
+        with self.lock:
+            if (
+                self.faults.get(path, 0) >= self.max_per_path
+                or self.random.random() >= self.rate
+            ):
+                return None
+            self.faults[path] = self.faults.get(path, 0) + 1
+            return self.random.choice(self.kinds)
+
+    def injected(self):
+        """Returns the number of faults injected so far"""
+        with self.lock:
+            return sum(self.faults.values())
+
+
+class DatastoreHandler(SimpleHTTPRequestHandler):
+    """Serves the synthetic tree, sleeping latency seconds before every response and injecting faults if set"""
+
+    def __init__(self, *args, latency=0.0, faults=None, **kwargs):
+        self.latency = latency
+        self.faults = faults  # FaultInjector or None
+        super().__init__(*args, **kwargs)
+
+    def send_head(self):
+        if self.latency:
+            time.sleep(self.latency)
+        fault = self.faults.pick(self.path) if self.faults else None
+        if fault == "drop":  # close without a response
+            self.close_connection = True
+            return None
+        if fault == "slow":
+            time.sleep(self.faults.slow_seconds)
+        elif fault:
+            self.send_response(int(fault))
+            if fault in ("429", "503"):
+                self.send_header("Retry-After", self.faults.retry_after)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+        return super().send_head()
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Requests are not logged, they would dominate the benchmark output"""
+
+
+class DatastoreServer(ThreadingHTTPServer):
+    """Threaded server with a listen backlog deep enough for every crawl thread to connect at once"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        """Clients closing a connection early, like the fai reader, are not errors"""
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def serve(root, latency=0.0, port=0, faults=None):
+    """Serves root on localhost in a background thread. Returns (server, url). Stop with server.shutdown()"""
+    handler = functools.partial(
+        DatastoreHandler, directory=root, latency=latency, faults=faults
+    )
+    server = DatastoreServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return (server, f"http://127.0.0.1:{server.server_address[1]}")
+
+
+def main():
+    """Generates a synthetic datastore and serves it until interrupted"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("root", help="directory to write the datastore to")
+    parser.add_argument("--genera", type=int, default=2, help="genera to generate")
+    parser.add_argument(
+        "--species", type=int, default=2, help="species per genus to generate"
+    )
+    parser.add_argument(
+        "--collections", type=int, default=2, help="collections per type per species"
+    )
+    parser.add_argument(
+        "--latency_ms",
+        type=float,
+        default=0.0,
+        help="milliseconds before every response",
+    )
+    parser.add_argument(
+        "--fault_rate",
+        type=float,
+        default=0.0,
+        help="fraction of requests answered with 429, 500, 503, a slow response or a dropped connection",
+    )
+    parser.add_argument("--port", type=int, default=8765, help="port to serve on")
+    args = parser.parse_args()
+    taxon_list, collections = generate_datastore(
+        args.root, args.genera, args.species, args.collections
+    )
+    server, url = serve(
+        args.root,
+        args.latency_ms / 1000,
+        args.port,
+        FaultInjector(args.fault_rate) if args.fault_rate else None,
+    )
+    print(
+        f"{collections} collections in {args.root}, taxon list {taxon_list}, serving {url}"
+    )
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
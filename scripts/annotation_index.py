@@ -0,0 +1,35 @@
+"""Shell commands indexing the GFF3 annotations ProcessCollections adds to JBrowse2: tabix copies and trix name indexes."""
+
+#!/usr/bin/env python3
+
+INDEX_TYPES = ("tbi", "csi")  # indexes a Gff3TabixAdapter reads, preferred first
+TRIX_EXCLUDE = "CDS,exon,three_prime_UTR,five_prime_UTR"  # not searched by name
+
+
+def datastore_index(file_name, checksums):
+    """Returns TBI or CSI if an index of file_name is listed in its collection CHECKSUM, else None"""
+    for index_type in INDEX_TYPES:
+        if f"{file_name}.{index_type}" in checksums:
+            return index_type.upper()
+    return None
+
+
+def tabix_command(source, output):
+    """Command writing the gzipped GFF3 source to output sorted like jbrowse sort-gff, bgzipped and tabix indexed"""
+    return (
+        f"set -o pipefail -o errexit -o nounset; mkdir -p $(dirname {output}); "
+        f"(gzip -dc {source} | {{ grep '^#' || true; }}; gzip -dc {source} | {{ grep -v '^#' || true; }} | sort -t$'\\t' -k1,1 -k4,4n)"
+        f" | bgzip > {output}.tmp; mv {output}.tmp {output}; tabix -f -p gff {output}"
+    )  # directives first, then features by reference and start
+
+
+def trix_command(out_dir, assembly, sources):
+    """Command writing one trix name index of every GFF3 in sources to out_dir/trix/assembly.ix, .ixx and _meta.json"""
+    tmp_dir = f"{out_dir}/trix/{assembly}.tmp"
+    files = " ".join(f"--file {source}" for source in sources)
+    return (
+        f"set -o pipefail -o errexit -o nounset; rm -rf {tmp_dir}; "
+        f"jbrowse text-index {files} --out {tmp_dir} --exclude {TRIX_EXCLUDE} --force; "
+        f"mv {tmp_dir}/trix/*.ixx {out_dir}/trix/{assembly}.ixx; mv {tmp_dir}/trix/*.ix {out_dir}/trix/{assembly}.ix; "
+        f"mv {tmp_dir}/trix/*_meta.json {out_dir}/trix/{assembly}_meta.json; rm -rf {tmp_dir}"
+    )  # text-index names its output after the files, one index per assembly is searched by JBrowse
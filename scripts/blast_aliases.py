@@ -0,0 +1,70 @@
+"""blastdb_aliastool alias databases grouping the per file BLAST databases built by ProcessCollections."""
+
+#!/usr/bin/env python3
+
+import hashlib
+
+GROUP_NAMES = {"nucl": "genomes", "prot": "proteomes"}  # alias suffix by dbtype
+
+
+def alias_groups(databases):
+    """Groups databases by species, genus and across all taxa, separately for nucl and prot.
+
+    databases are dicts with name, dbtype, genus and species. A proteome with a protein_primary
+    database is only grouped by it, the full protein set would double every hit.
+    Returns {alias: (dbtype, title, level, members)} with level species, genus or all.
+    """
+    primary = {
+        database["name"].rsplit(".", 1)[0]
+        for database in databases
+        if database["name"].endswith(".protein_primary")
+    }  # annotations with one protein per gene
+    groups = {}
+    for database in sorted(databases, key=lambda database: database["name"]):
+        name = database["name"]
+        if name.endswith(".protein") and name.rsplit(".", 1)[0] in primary:
+            continue
+        suffix = GROUP_NAMES[database["dbtype"]]
+        genus = database["genus"].capitalize()
+        species = database["species"]
+        for alias, title, level in (
+            (
+                f"{genus}.{species}.{suffix}",
+                f"{genus} {species} {suffix.capitalize()}",
+                "species",
+            ),
+            (f"{genus}.{suffix}", f"{genus} {suffix.capitalize()}", "genus"),
+            (f"all.{suffix}", f"All {suffix.capitalize()}", "all"),
+        ):
+            if alias not in groups:
+                groups[alias] = (database["dbtype"], title, level, [])
+            groups[alias][3].append(name)
+    return groups
+
+
+def group_md5(members, *extra):
+    """md5 of (name, md5) pairs of the members of a group and anything else its output depends on"""
+    digest = hashlib.md5()
+    for name, md5 in sorted(members):
+        digest.update(f"{name} {md5}\n".encode("utf-8"))
+    for value in extra:
+        digest.update(f"{value}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def alias_command(out_dir, alias, dbtype, title, members):
+    """blastdb_aliastool command writing alias in out_dir over the member databases next to it"""
+    return (
+        f"set -o pipefail -o errexit -o nounset; cd {out_dir}; "
+        f'blastdb_aliastool -dbtype {dbtype} -out {alias} -title "{title}" -dblist "{" ".join(members)}"'
+    )
+
+
+def merge_command(out_dir, alias, dbtype, title, max_file_sz):
+    """Command copying every sequence of alias into one database split into volumes of max_file_sz"""
+    return (
+        f"set -o pipefail -o errexit -o nounset; cd {out_dir}; "
+        f'blastdbcmd -db {alias} -entry all -outfmt "%a %T" > {alias}.merged.taxid_map; '
+        f"blastdbcmd -db {alias} -entry all | makeblastdb -parse_seqids -out {alias}.merged -hash_index -dbtype {dbtype}"
+        f' -max_file_sz {max_file_sz} -taxid_map {alias}.merged.taxid_map -title "{title}"'
+    )  # taxids are kept, a merged volume is searched like the alias
@@ -0,0 +1,40 @@
+"""Build manifest recording the input checksum of every output built by ProcessCollections."""
+
+#!/usr/bin/env python3
+
+import os
+import json
+
+
+class BuildManifest:
+    """Maps outputs built in mode to the md5 of the input they were built from. Stored as json in path"""
+
+    def __init__(self, path, mode, rebuild_all=False):
+        self.path = path  # json file in the output directory
+        self.mode = mode  # jbrowse and blast can share an output directory
+        self.manifest = {}
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as manifest_handle:
+                self.manifest = json.load(manifest_handle)
+        if rebuild_all or mode not in self.manifest:  # forget previous builds
+            self.manifest[mode] = {}
+        self.entries = self.manifest[mode]  # name -> {"md5": md5, "output": path}
+
+    def unchanged(self, name, md5):
+        """True if name was last built from md5 and its output still exists"""
+        entry = self.entries.get(name)
+        if not md5 or not entry or entry["md5"] != md5:
+            return False
+        return not entry.get("output") or os.path.exists(entry["output"])
+
+    def record(self, name, md5, output=None):
+        """Records that name was built from md5 into output"""
+        if md5:
+            self.entries[name] = {"md5": md5, "output": output}
+
+    def save(self):
+        """Writes the manifest atomically"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as manifest_handle:
+            json.dump(self.manifest, manifest_handle, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,34 @@
+"""Files and md5s of one datastore collection, read from its CHECKSUM by ProcessCollections."""
+
+#!/usr/bin/env python3
+
+
+class CollectionManifest:
+    """Answers which files a collection has and their md5s from its CHECKSUM.<key>.md5.
+
+    The CHECKSUM lists the data files of the collection and their .fai, so one request replaces a
+    HEAD per file. It may leave out the README and BUSCO/, which are always fetched. Without a
+    CHECKSUM nothing is known and exists returns None for the caller to ask the datastore instead.
+    """
+
+    def __init__(self, url, checksums):
+        self.url = url  # collection url without a trailing /
+        self.checksums = checksums  # {name relative to url: md5}, empty if not read
+
+    def exists(self, name):
+        """True if name is listed, False if it is not, None if the collection has no CHECKSUM"""
+        if not self.checksums:
+            return None
+        return name in self.checksums
+
+    def md5(self, name):
+        """md5 of name from the CHECKSUM or None"""
+        return self.checksums.get(name)
+
+    def names(self, suffix=""):
+        """Listed file names ending with suffix, in CHECKSUM order"""
+        return [name for name in self.checksums if name.endswith(suffix)]
+
+    def file_url(self, name):
+        """Datastore url of name"""
+        return f"{self.url}/{name}"
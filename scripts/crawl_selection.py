@@ -0,0 +1,88 @@
+"""Genus, species, collection type and collection name selectors limiting what ProcessCollections crawls and builds."""
+
+#!/usr/bin/env python3
+
+import fnmatch
+
+ALIAS_LEVELS = ("species", "genus", "all")  # BLAST alias levels, narrowest first
+
+
+class CrawlSelection:
+    """Selects part of the taxon list. Every selector left empty selects everything.
+
+    genera and species are matched case insensitively, collection_glob is a shell pattern matched
+    against collection names like Tifrunner.gnm2.ann1.*. Whatever is not selected is never requested.
+    """
+
+    def __init__(
+        self, genera=(), species=(), collection_types=(), collection_glob=None
+    ):
+        self.genera = {genus.lower() for genus in genera}
+        self.species = {name.lower() for name in species}
+        self.collection_types = set(collection_types)
+        if "expression" in self.collection_types:  # bigwigs are added with their genome
+            self.collection_types.add("genomes")
+        self.collection_glob = collection_glob
+
+    def genus_selected(self, genus):
+        """True if taxa of genus are crawled"""
+        return not self.genera or str(genus).lower() in self.genera
+
+    def species_selected(self, species):
+        """True if species is crawled"""
+        return not self.species or str(species).lower() in self.species
+
+    def type_selected(self, collection_type):
+        """True if collections of collection_type are crawled"""
+        return not self.collection_types or collection_type in self.collection_types
+
+    def collection_selected(self, name, collection_type=None):
+        """True if the collection called name is crawled. Genomes are crawled for the expression data shown on them"""
+        if collection_type == "genomes" and self.type_selected("expression"):
+            return True
+        return not self.collection_glob or fnmatch.fnmatchcase(
+            name, self.collection_glob
+        )
+
+    @property
+    def partial(self):
+        """True if anything is left out of the taxon list"""
+        return bool(self.genera or not self.whole_genera)
+
+    @property
+    def whole_genera(self):
+        """True if every collection of a selected genus is selected, so files per genus can be written"""
+        return not (self.species or self.collection_types or self.collection_glob)
+
+    def alias_levels(self):
+        """BLAST alias levels whose groups hold every database they would in a full run"""
+        if self.collection_glob:  # any group can miss collections
+            return ()
+        if self.species:
+            return ALIAS_LEVELS[:1]
+        if self.genera:
+            return ALIAS_LEVELS[:2]
+        return ALIAS_LEVELS  # collection types never split a nucl or prot group
+
+    def select_files(self, species_files):
+        """species_files without collection types or collections that are not selected, for results crawled before"""
+        return {
+            collection_type: {
+                name: data
+                for name, data in files.items()
+                if self.collection_selected(data["url"].split("/")[-2], collection_type)
+            }
+            for collection_type, files in species_files.items()
+            if self.type_selected(collection_type)
+        }
+
+    def __str__(self):
+        selectors = [
+            ("genus", sorted(self.genera)),
+            ("species", sorted(self.species)),
+            ("collection_type", sorted(self.collection_types)),
+            ("collection_glob", [self.collection_glob] if self.collection_glob else []),
+        ]
+        return " ".join(
+            f"{name}={','.join(values)}" for name, values in selectors if values
+        )
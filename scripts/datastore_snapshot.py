@@ -0,0 +1,174 @@
+"""SQLite snapshot of everything ProcessCollections finds while crawling the datastore."""
+
+#!/usr/bin/env python3
+
+import json
+import time
+import sqlite3
+from metadata_loader import load_yaml, dump_yaml
+
+
+class DatastoreSnapshot:
+    """Stores crawled taxa, species, files, fai refs and CHECKSUMs in the sqlite file path.
+
+    A snapshot is written once by the snapshot command and read back by every populate command
+    with --from_snapshot instead of crawling the datastore again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(
+            """CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS taxa (
+                position INTEGER PRIMARY KEY, genus TEXT UNIQUE, description TEXT);
+            CREATE TABLE IF NOT EXISTS species (
+                position INTEGER PRIMARY KEY, genus TEXT, species TEXT, lines TEXT,
+                description TEXT, resources TEXT, UNIQUE (genus, species));
+            CREATE TABLE IF NOT EXISTS files (
+                position INTEGER PRIMARY KEY, genus TEXT, species TEXT, collection_type TEXT,
+                name TEXT, url TEXT, taxid INTEGER, record TEXT,
+                UNIQUE (genus, species, collection_type, name));
+            CREATE TABLE IF NOT EXISTS fai_refs (url TEXT PRIMARY KEY, ref TEXT, stop TEXT);
+            CREATE TABLE IF NOT EXISTS checksums (collection_url TEXT PRIMARY KEY, checksums TEXT);
+            CREATE INDEX IF NOT EXISTS files_type ON files (collection_type, name);"""
+        )
+
+    def reset(self, datastore_url, jbrowse_url):
+        """Empties the snapshot before a new crawl of datastore_url"""
+        with self.connection:
+            for table in ("meta", "taxa", "species", "files", "fai_refs", "checksums"):
+                self.connection.execute(f"DELETE FROM {table}")
+            self.connection.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [
+                    ("datastore_url", datastore_url),
+                    ("jbrowse_url", jbrowse_url),
+                    ("created", str(time.time())),
+                ],
+            )
+
+    def meta(self):
+        """Returns the settings the snapshot was crawled with"""
+        return dict(self.connection.execute("SELECT key, value FROM meta"))
+
+    def add_taxon(self, genus, genus_description, species_results):
+        """Stores a crawled genus in place of any stored before. species_results are (species, species_files, lines, description, resources)"""
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO taxa (genus, description) VALUES (?, ?)",
+                (genus, dump_yaml(genus_description)),
+            )
+            for table in ("species", "files"):  # a genus listed twice or crawled again
+                self.connection.execute(f"DELETE FROM {table} WHERE genus=?", (genus,))
+            for (
+                species,
+                species_files,
+                lines,
+                species_description,
+                resources,
+            ) in species_results:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO species (genus, species, lines, description, resources) VALUES (?, ?, ?, ?, ?)",
+                    (
+                        genus,
+                        species,
+                        json.dumps(lines),
+                        dump_yaml(species_description),
+                        json.dumps(resources),
+                    ),
+                )
+                for collection_type, files in species_files.items():
+                    self.connection.executemany(
+                        "INSERT OR REPLACE INTO files (genus, species, collection_type, name, url, taxid, record) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [
+                            (
+                                genus,
+                                species,
+                                collection_type,
+                                name,
+                                record["url"],
+                                record.get("taxid", 0),
+                                json.dumps(record),
+                            )
+                            for name, record in files.items()
+                        ],
+                    )
+
+    def add_fai_refs(self, fai_refs):
+        """Stores (ref, length) by genome url, False if the genome has no fai"""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO fai_refs VALUES (?, ?, ?)",
+                [
+                    (url, *(fai_ref or (None, None)))
+                    for url, fai_ref in fai_refs.items()
+                ],
+            )
+
+    def add_checksums(self, checksums):
+        """Stores {filename: md5} by collection url"""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO checksums VALUES (?, ?)",
+                [(url, json.dumps(files)) for url, files in checksums.items()],
+            )
+
+    def genera(self):
+        """Returns every genus in the order it was crawled"""
+        return [
+            row[0]
+            for row in self.connection.execute(
+                "SELECT genus FROM taxa ORDER BY position"
+            )
+        ]
+
+    def taxon(self, genus):
+        """Returns (genus_description, species_results) for genus like add_taxon received them or None"""
+        row = self.connection.execute(
+            "SELECT description FROM taxa WHERE genus=?", (genus,)
+        ).fetchone()
+        if not row:
+            return None
+        genus_description = load_yaml(row[0])
+        species_results = []
+        for species, lines, species_description, resources in self.connection.execute(
+            "SELECT species, lines, description, resources FROM species WHERE genus=? ORDER BY position",
+            (genus,),
+        ).fetchall():
+            species_files = {}
+            for collection_type, name, record in self.connection.execute(
+                "SELECT collection_type, name, record FROM files WHERE genus=? AND species=? ORDER BY position",
+                (genus, species),
+            ):
+                if collection_type not in species_files:
+                    species_files[collection_type] = {}
+                species_files[collection_type][name] = json.loads(record)
+            species_results.append(
+                (
+                    species,
+                    species_files,
+                    json.loads(lines),
+                    load_yaml(species_description),
+                    json.loads(resources),
+                )
+            )
+        return (genus_description, species_results)
+
+    def fai_refs(self):
+        """Returns (ref, length) or False by genome url"""
+        return {
+            url: (ref, stop) if ref is not None else False
+            for url, ref, stop in self.connection.execute("SELECT * FROM fai_refs")
+        }
+
+    def checksums(self):
+        """Returns {filename: md5} by collection url"""
+        return {
+            url: json.loads(files)
+            for url, files in self.connection.execute("SELECT * FROM checksums")
+        }
+
+    def close(self):
+        """Closes the snapshot"""
+        self.connection.close()
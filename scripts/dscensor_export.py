@@ -0,0 +1,82 @@
+"""Bulk writers for the DSCensor nodes built by ProcessCollections."""
+
+#!/usr/bin/env python3
+
+import io
+import csv
+import json
+from output_writer import write_if_changed
+
+NODE_FORMATS = (
+    "json",
+    "ndjson",
+    "neo4j-csv",
+)  # values accepted by populate-dscensor --format
+
+NODE_LABEL = "File"  # neo4j label of every DSCensor node
+RELATIONSHIP_TYPE = "DERIVED_FROM"  # node -> each of its derived_from parents
+
+NODE_FIELDS = [
+    ("filename", "filename:ID(File)"),
+    ("filetype", "filetype"),
+    ("canonical_type", "canonical_type"),
+    ("url", "url"),
+    ("genus", "genus"),
+    ("species", "species"),
+    ("origin", "origin"),
+    ("infraspecies", "infraspecies"),
+    ("derived_from", "derived_from:string[]"),
+    ("counts", "counts"),
+    ("busco", "busco"),
+]  # node key and neo4j-admin header column. counts and busco are stored as json strings
+
+
+def unique_nodes(nodes):
+    """Returns nodes with one node per filename, later nodes replace earlier ones like the json files do"""
+    return list({node["filename"]: node for node in nodes}.values())
+
+
+def write_ndjson(nodes, path):
+    """Writes every node into path, one json object per line. Returns True if path changed"""
+    return write_if_changed(path, "".join(f"{json.dumps(node)}\n" for node in nodes))
+
+
+def node_row(node):
+    """Returns the neo4j-admin csv row for node"""
+    row = []
+    for key, _ in NODE_FIELDS:
+        value = node.get(key)
+        if key == "derived_from":
+            value = ";".join(parent for parent in value or [] if parent)
+        elif isinstance(value, dict):
+            value = json.dumps(value)
+        row.append("" if value is None else value)
+    row.append(NODE_LABEL)
+    return row
+
+
+def write_neo4j_csv(nodes, nodes_path, relationships_path):
+    """Writes node and derived_from relationship csvs with headers for neo4j-admin database import.
+
+    Returns the number of relationships written. Parents that are not nodes are left out so the
+    import does not need --skip-bad-relationships.
+    """
+    nodes = unique_nodes(nodes)
+    filenames = {node["filename"] for node in nodes}
+    nodes_handle = io.StringIO(newline="")
+    writer = csv.writer(nodes_handle)
+    writer.writerow([header for _, header in NODE_FIELDS] + [":LABEL"])
+    for node in nodes:
+        writer.writerow(node_row(node))
+    relationships = 0
+    relationships_handle = io.StringIO(newline="")
+    writer = csv.writer(relationships_handle)
+    writer.writerow([":START_ID(File)", ":END_ID(File)", ":TYPE"])
+    for node in nodes:
+        for parent in node.get("derived_from") or []:
+            if parent in filenames:  # only link nodes in this import
+                writer.writerow([node["filename"], parent, RELATIONSHIP_TYPE])
+                relationships += 1
+    write_if_changed(nodes_path, nodes_handle.getvalue())
+    write_if_changed(relationships_path, relationships_handle.getvalue())
+    return relationships
@@ -0,0 +1,109 @@
+"""Compact records of the datastore files ProcessCollections crawled, indexed by parent genome."""
+
+#!/usr/bin/env python3
+
+import sys
+
+
+class FileRecord:
+    """One datastore file. Names, taxa and parents are interned, shared by every record naming them.
+
+    Reads like the dicts add_collection builds, record["url"] or record.get("busco"), so output
+    stages use records and crawl dicts the same way.
+    """
+
+    __slots__ = (
+        "collection_type",
+        "url",
+        "name",
+        "parent",
+        "genus",
+        "species",
+        "infraspecies",
+        "taxid",
+        "busco",
+        "counts",
+        "bam_url",
+    )
+
+    def __init__(self, collection_type, data):
+        self.collection_type = sys.intern(collection_type)
+        self.url = data["url"]  # unique, not interned
+        self.name = sys.intern(data["name"])
+        self.parent = tuple(
+            sys.intern(parent) for parent in data.get("parent") or ()
+        )  # genome names, also the names of their records
+        self.genus = sys.intern(data["genus"])
+        self.species = sys.intern(data["species"])
+        self.infraspecies = sys.intern(data["infraspecies"])
+        self.taxid = data.get("taxid", 0)
+        self.busco = data.get("busco")
+        self.counts = data.get("counts")
+        self.bam_url = data.get("bam_url")
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        """record.get like dict.get"""
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def node(self):
+        """DSCensor node of this file"""
+        filetype = self.url.split(".")[-3]  # datastore file name filetype.X.gz
+        return {
+            "filename": self.name,
+            "filetype": filetype,
+            "canonical_type": filetype,
+            "url": self.url,
+            "counts": self.counts,
+            "busco": self.busco,
+            "genus": self.genus,
+            "species": self.species,
+            "origin": "LIS",
+            "infraspecies": self.infraspecies,
+            "derived_from": list(self.parent),
+        }
+
+
+class FileIndex:
+    """Every FileRecord by collection type and name, with an index from each genome to the files derived from it.
+
+    Files are iterated in the order they were first added, adding a name again replaces its record
+    in place like dict.update did.
+    """
+
+    def __init__(self):
+        self.by_type = {}  # collection type -> {name: FileRecord}
+        self.derived = {}  # parent genome name -> {name: FileRecord} derived from it
+
+    def add(self, collection_type, files):
+        """Adds the {name: dict} files of collection_type a crawl found"""
+        records = self.by_type.setdefault(sys.intern(collection_type), {})
+        for data in files.values():
+            record = FileRecord(collection_type, data)
+            records[record.name] = record
+            for parent in filter(None, record.parent):  # genomes have no parent
+                self.derived.setdefault(parent, {})[record.name] = record
+
+    def records(self, collection_type):
+        """Records of collection_type in the order they were added"""
+        return self.by_type.get(collection_type, {}).values()
+
+    def genome(self, name):
+        """The genomes record called name or None"""
+        return self.by_type.get("genomes", {}).get(name)
+
+    def derived_from(self, genome, collection_type=None):
+        """Annotations, proteins, bigwigs and alignments with genome as a parent, of collection_type if set"""
+        return [
+            record
+            for record in self.derived.get(genome, {}).values()
+            if collection_type in (None, record.collection_type)
+        ]
+
+    def __len__(self):
+        return sum(len(records) for records in self.by_type.values())
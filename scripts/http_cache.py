@@ -0,0 +1,171 @@
+"""Persistent on-disk cache for datastore responses used by ProcessCollections."""
+
+#!/usr/bin/env python3
+
+import os
+import time
+import pathlib
+import sqlite3
+import threading
+from collections import namedtuple
+
+CachedResponse = namedtuple(
+    "CachedResponse", ["status_code", "text", "etag", "last_modified", "from_cache"]
+)  # response-like object returned for both cached and fresh requests
+PartialResponse = namedtuple(
+    "PartialResponse", ["status_code", "content", "text", "headers"]
+)  # what a send function returns when only part of the body is read and cached
+
+
+class HttpCache:
+    """Caches GET and HEAD responses in a sqlite file under cache_dir.
+
+    Entries younger than ttl seconds are served without a request. Older entries are revalidated
+    with If-None-Match/If-Modified-Since and the least recently used are evicted past max_size bytes.
+    """
+
+    cacheable = (200, 404, 410)  # status codes worth remembering between runs
+
+    def __init__(self, cache_dir, ttl=0, max_size=512 * 1024 * 1024, logger=None):
+        self.logger = logger
+        self.ttl = ttl  # seconds an entry is served without revalidating
+        self.max_size = max_size  # bytes of bodies kept before evicting
+        pathlib.Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()  # the connection is shared by all crawl threads
+        self.connection = sqlite3.connect(
+            os.path.join(cache_dir, "responses.sqlite"),
+            check_same_thread=False,
+            timeout=60,
+        )
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                method TEXT, url TEXT, status INTEGER, body BLOB, etag TEXT,
+                last_modified TEXT, fetched REAL, accessed REAL, size INTEGER,
+                PRIMARY KEY (method, url))"""
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self.pending = 0  # writes not committed yet
+        self.size = 0  # bytes of bodies stored, kept up to date by store
+        self.commit()
+
+    def lookup(self, method, url):
+        """Returns the cached row for method and url or None"""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT status, body, etag, last_modified, fetched FROM responses WHERE method=? AND url=?",
+                (method, url),
+            ).fetchone()
+
+    def commit(self):
+        """Commits pending writes and recounts self.size, which other processes sharing cache_dir change"""
+        self.connection.commit()
+        self.pending = 0
+        self.committed = time.time()
+        self.size = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def written(self):
+        """Counts a write made under self.lock. Commits every 256 writes or after a second"""
+        self.pending += 1
+        if (
+            self.pending >= 256 or time.time() - self.committed > 1
+        ):  # a commit per response costs more than the lookup, other --jobs wait on an open one
+            self.commit()
+
+    def touch(self, method, url, fetched=None):
+        """Marks an entry as recently used. Sets fetched when it was revalidated"""
+        now = time.time()
+        with self.lock:
+            if fetched:
+                self.connection.execute(
+                    "UPDATE responses SET accessed=?, fetched=? WHERE method=? AND url=?",
+                    (now, fetched, method, url),
+                )
+            else:
+                self.connection.execute(
+                    "UPDATE responses SET accessed=? WHERE method=? AND url=?",
+                    (now, method, url),
+                )
+            self.written()
+
+    def evict(self):
+        """Deletes least recently used entries until self.size is under self.max_size. Called under self.lock"""
+        while self.size > self.max_size:
+            oldest = self.connection.execute(
+                "SELECT method, url, size FROM responses ORDER BY accessed LIMIT 64"
+            ).fetchall()  # read from the accessed index, not the whole table
+            if not oldest:
+                break
+            for old_method, old_url, size in oldest:
+                if self.size <= self.max_size:
+                    break
+                self.connection.execute(
+                    "DELETE FROM responses WHERE method=? AND url=?",
+                    (old_method, old_url),
+                )
+                self.size -= size
+
+    def store(self, method, url, status, body, etag, last_modified):
+        """Stores a response and evicts least recently used entries past self.max_size"""
+        now = time.time()
+        with self.lock:
+            replaced = self.connection.execute(
+                "SELECT size FROM responses WHERE method=? AND url=?", (method, url)
+            ).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (method, url, status, body, etag, last_modified, now, now, len(body)),
+            )
+            self.size += len(body) - (replaced[0] if replaced else 0)
+            self.evict()
+            self.written()
+
+    def request(self, send, method, url):
+        """Returns a CachedResponse for url. send(method, url, headers) is only called when the entry is stale"""
+        logger = self.logger
+        entry = self.lookup(method, url)
+        headers = {}
+        if entry:
+            status, body, etag, last_modified, fetched = entry
+            text = body.decode("utf-8", errors="replace")
+            if time.time() - fetched < self.ttl:  # fresh, no request needed
+                self.touch(method, url)
+                return CachedResponse(status, text, etag, last_modified, True)
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        response = send(method, url, headers)
+        if entry and response.status_code == 304:  # unchanged since cached
+            if logger:
+                logger.debug(f"Revalidated cached {method} for: {url}")
+            self.touch(method, url, fetched=time.time())
+            return CachedResponse(status, text, etag, last_modified, True)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code in self.cacheable:
+            self.store(
+                method,
+                url,
+                response.status_code,
+                response.content or b"",
+                etag,
+                last_modified,
+            )
+        return CachedResponse(
+            response.status_code, response.text, etag, last_modified, False
+        )
+
+    def flush(self):
+        """Commits stored responses"""
+        with self.lock:
+            self.commit()
+
+    def close(self):
+        """Closes the cache connection"""
+        self.flush()
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,136 @@
+"""In process JBrowse2 config.json builder used by ProcessCollections instead of one jbrowse CLI call per file."""
+
+#!/usr/bin/env python3
+
+import os
+import json
+from output_writer import write_if_changed
+
+
+def uri_location(uri):
+    """JBrowse2 location object for a remote file"""
+    return {"uri": uri, "locationType": "UriLocation"}
+
+
+def track_id(url):
+    """Default trackId used by jbrowse add-track, the file name without its last extension"""
+    return os.path.splitext(url.split("/")[-1])[0]
+
+
+class JBrowseConfig:
+    """Builds assemblies and tracks in memory and writes config_path once. Entries with the same name or trackId are replaced like --force"""
+
+    def __init__(self, config_path):
+        self.config_path = config_path
+        self.config = {  # what the jbrowse CLI writes for a new config.json
+            "assemblies": [],
+            "configuration": {},
+            "connections": [],
+            "defaultSession": {"name": "New Session"},
+            "tracks": [],
+        }
+        if os.path.isfile(config_path):  # keep everything not added by us
+            with open(config_path, encoding="utf-8") as config_handle:
+                self.config.update(json.load(config_handle))
+        self.assemblies = {
+            assembly["name"]: assembly for assembly in self.config["assemblies"]
+        }  # existing assemblies by name
+        self.tracks = {
+            track["trackId"]: track for track in self.config["tracks"]
+        }  # existing tracks by trackId
+        self.text_search = {
+            adapter["textSearchAdapterId"]: adapter
+            for adapter in self.config.get("aggregateTextSearchAdapters", [])
+        }  # existing name search indexes by id
+
+    def add_assembly(self, name, display_name, url):
+        """jbrowse add-assembly -n name -t bgzipFasta --displayName display_name url"""
+        self.assemblies[name] = {
+            "name": name,
+            "sequence": {
+                "type": "ReferenceSequenceTrack",
+                "trackId": f"{name}-ReferenceSequenceTrack",
+                "adapter": {
+                    "type": "BgzipFastaAdapter",
+                    "fastaLocation": uri_location(url),
+                    "faiLocation": uri_location(f"{url}.fai"),
+                    "gziLocation": uri_location(f"{url}.gzi"),
+                },
+            },
+            "displayName": display_name,
+        }
+
+    def add_track(self, track_type, url, adapter, assembly_names, **kwargs):
+        """Adds a track for url. name and trackId default to the file name like the CLI. kwargs: name, track, category"""
+        track = kwargs.get("track") or track_id(url)
+        name = kwargs.get("name")
+        category = kwargs.get("category")
+        track_config = {
+            "type": track_type,
+            "trackId": track,
+            "name": name or track,
+            "adapter": adapter,
+            "assemblyNames": assembly_names,
+        }
+        if category:
+            track_config["category"] = category
+        self.tracks[track] = track_config
+
+    def add_gff3(self, url, assembly, name, location=None, index_type="TBI"):
+        """jbrowse add-track -a assembly -n name url.gff3.gz. location is a sorted copy of url to read instead, e.g. relative to config_path"""
+        location = location or url
+        adapter = {
+            "type": "Gff3TabixAdapter",
+            "gffGzLocation": uri_location(location),
+            "index": {
+                "location": uri_location(f"{location}.{index_type.lower()}"),
+                "indexType": index_type,
+            },
+        }
+        self.add_track("FeatureTrack", url, adapter, [assembly], name=name)
+
+    def add_text_search(self, assembly, prefix):
+        """Adds the trix name index prefix.ix, prefix.ixx and prefix_meta.json for assembly like jbrowse text-index"""
+        self.text_search[f"{assembly}-index"] = {
+            "type": "TrixTextSearchAdapter",
+            "textSearchAdapterId": f"{assembly}-index",
+            "ixFilePath": uri_location(f"{prefix}.ix"),
+            "ixxFilePath": uri_location(f"{prefix}.ixx"),
+            "metaFilePath": uri_location(f"{prefix}_meta.json"),
+            "assemblyNames": [assembly],
+        }
+
+    def add_paf(self, url, assembly_names):
+        """jbrowse add-track --assemblyNames a,b url.paf.gz"""
+        adapter = {
+            "type": "PAFAdapter",
+            "pafLocation": uri_location(url),
+            "assemblyNames": assembly_names,
+        }
+        self.add_track("SyntenyTrack", url, adapter, assembly_names)
+
+    def add_bam(self, url, assembly, name):
+        """jbrowse add-track -n name --trackId name -a assembly --indexFile url.bai url"""
+        adapter = {
+            "type": "BamAdapter",
+            "bamLocation": uri_location(url),
+            "index": {"location": uri_location(f"{url}.bai"), "indexType": "BAI"},
+        }
+        self.add_track(
+            "AlignmentsTrack", url, adapter, [assembly], name=name, track=name
+        )
+
+    def add_bigwig(self, url, assembly, name, category):
+        """jbrowse add-track url --name name --assemblyNames assembly --category category"""
+        adapter = {"type": "BigWigAdapter", "bigWigLocation": uri_location(url)}
+        self.add_track(
+            "QuantitativeTrack", url, adapter, [assembly], name=name, category=category
+        )
+
+    def write(self):
+        """Writes config_path atomically if it changed"""
+        self.config["assemblies"] = list(self.assemblies.values())
+        self.config["tracks"] = list(self.tracks.values())
+        if self.text_search:
+            self.config["aggregateTextSearchAdapters"] = list(self.text_search.values())
+        write_if_changed(self.config_path, json.dumps(self.config, indent=2))
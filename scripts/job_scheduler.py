@@ -0,0 +1,153 @@
+"""Dependency aware scheduler for the shell commands and downloads generated by ProcessCollections."""
+
+#!/usr/bin/env python3
+
+import time
+import pathlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class Job:
+    """A shell command, or func if set, that runs once all jobs named in deps have succeeded.
+
+    Jobs in a stage run on that stage's workers.
+    """
+
+    def __init__(self, name, cmd, deps=None, func=None, stage=None):
+        self.name = name  # unique name other jobs depend on
+        self.cmd = cmd  # command run with /bin/bash, or a description of func
+        self.deps = deps or []  # names of jobs that must succeed first
+        self.func = func  # called instead of running cmd, fails if it raises
+        self.stage = stage  # e.g. download, sized apart from the build workers
+        self.returncode = None  # exit value once run
+        self.skipped = False  # True if a dependency failed
+        self.duration = 0.0  # seconds spent running cmd
+        self.log_file = None  # stdout and stderr of cmd
+
+    def succeeded(self):
+        """True if the job ran and exited 0"""
+        return self.returncode == 0
+
+
+class JobScheduler:
+    """Runs Jobs on a pool of workers in dependency order and reports failures once all jobs are done"""
+
+    def __init__(
+        self, logger, workers=1, log_dir="./logs", on_finish=None, stage_workers=None
+    ):
+        self.logger = logger
+        self.workers = max(
+            1, int(workers)
+        )  # jobs without a stage allowed to run at once
+        self.stage_workers = {
+            stage: max(1, int(count)) for stage, count in (stage_workers or {}).items()
+        }  # jobs of each stage allowed to run at once, alongside workers
+        self.log_dir = log_dir  # per job logs are written here
+        self.on_finish = on_finish  # called with each job as soon as it has run
+        self.jobs = {}  # jobs by name in the order they were added
+
+    def add(self, job):
+        """Adds a job. A job with the same name replaces the earlier one"""
+        if job.name in self.jobs:
+            self.logger.warning(f"Replacing duplicate job: {job.name}")
+        self.jobs[job.name] = job
+
+    def execute(self, job):
+        """Runs job.cmd writing its output to job.log_file"""
+        job.log_file = f"{self.log_dir}/{job.name}.log"
+        start = time.time()
+        with open(job.log_file, "w", encoding="utf-8") as log_handle:
+            print(job.cmd, file=log_handle, flush=True)
+            if job.func:
+                try:
+                    job.func()
+                    job.returncode = 0
+                except Exception as error:  # pylint: disable=broad-except
+                    print(f"{type(error).__name__}: {error}", file=log_handle)
+                    job.returncode = 1
+            else:
+                job.returncode = subprocess.call(
+                    job.cmd,
+                    shell=True,
+                    executable="/bin/bash",
+                    stdout=log_handle,
+                    stderr=subprocess.STDOUT,
+                )
+        job.duration = time.time() - start
+        return job
+
+    def pool_of(self, job):
+        """Returns job's stage if it has its own workers, otherwise None for the shared workers"""
+        return job.stage if job.stage in self.stage_workers else None
+
+    def has_room(self, job, running):
+        """True if fewer jobs of job's pool than its workers are in running"""
+        pool = self.pool_of(job)
+        busy = sum(1 for other in running if self.pool_of(other) == pool)
+        return busy < self.stage_workers.get(pool, self.workers)
+
+    def ready(self, job):
+        """Returns True if job can start, False if it must wait or None if a dependency failed"""
+        for dep in job.deps:
+            if dep not in self.jobs or dep == job.name:  # not a job in this run
+                continue
+            dependency = self.jobs[dep]
+            if dependency.skipped or (
+                dependency.returncode not in (None, 0)
+            ):  # dependency failed
+                return None
+            if not dependency.succeeded():  # dependency has not finished
+                return False
+        return True
+
+    def run(self):
+        """Runs all jobs. Returns the list of jobs that failed or were skipped"""
+        logger = self.logger
+        pathlib.Path(self.log_dir).mkdir(parents=True, exist_ok=True)
+        pending = list(self.jobs.values())
+        running = {}  # future -> job
+        with ThreadPoolExecutor(
+            max_workers=self.workers + sum(self.stage_workers.values())
+        ) as pool:
+            while pending or running:
+                waiting = []
+                for job in pending:  # start every job that is ready
+                    ready = self.ready(job)
+                    if ready is None:
+                        job.skipped = True
+                        logger.error(f"Skipping {job.name}, a dependency failed")
+                    elif ready and self.has_room(job, running.values()):
+                        logger.info(f"Running {job.name}")
+                        running[pool.submit(self.execute, job)] = job
+                    else:
+                        waiting.append(job)
+                if not running:  # nothing can start, dependencies form a cycle
+                    if waiting == pending:
+                        for job in waiting:
+                            job.skipped = True
+                            logger.error(f"Skipping {job.name}, dependencies never ran")
+                        waiting = []
+                    pending = waiting
+                    continue
+                pending = waiting
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job = running.pop(future)
+                    future.result()  # raise errors from execute
+                    if not job.succeeded():
+                        logger.error(
+                            f"Non-zero exit value {job.returncode} for {job.name}, see {job.log_file}"
+                        )
+                    if self.on_finish:
+                        self.on_finish(job)
+        failed = [job for job in self.jobs.values() if not job.succeeded()]
+        logger.info(
+            f"{len(self.jobs) - len(failed)} of {len(self.jobs)} jobs succeeded"
+        )
+        for job in failed:  # report all failures at the end
+            if job.skipped:
+                logger.error(f"Skipped: {job.name}")
+            else:
+                logger.error(f"Failed ({job.returncode}): {job.name}: {job.cmd}")
+        return failed
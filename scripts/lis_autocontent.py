@@ -16,6 +16,8 @@ def cli_entry_point():
     cli.add_command(lis_cli.populate_jbrowse2)
     cli.add_command(lis_cli.populate_blast)
     cli.add_command(lis_cli.populate_dscensor)
+    cli.add_command(lis_cli.populate_all)
+    cli.add_command(lis_cli.snapshot)
     cli()  # invoke cli
 
 
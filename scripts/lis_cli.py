@@ -2,9 +2,12 @@
 #!/usr/bin/env python3
 
 import sys
+import functools
 import logging
 import click
 from process_collections import ProcessCollections
+from crawl_selection import CrawlSelection
+from dscensor_export import NODE_FORMATS
 
 
 def setup_logging(log_file, log_level, process):
@@ -24,6 +27,109 @@ def setup_logging(log_file, log_level, process):
     return logger
 
 
+def selection_options(command):
+    """adds the options choosing part of the taxa list, passed to command as one CrawlSelection"""
+
+    @click.option(
+        "--genus",
+        multiple=True,
+        help="""Only crawl and build this genus of the taxa list. Repeat for more genera. (Default: all)""",
+    )
+    @click.option(
+        "--species",
+        multiple=True,
+        help="""Only crawl and build this species, e.g. hypogaea. Repeat for more species. (Default: all)""",
+    )
+    @click.option(
+        "--collection_type",
+        multiple=True,
+        help="""Only crawl and build collections of this type, e.g. annotations. Repeat for more types. (Default: all)""",
+    )
+    @click.option(
+        "--collection_glob",
+        default=None,
+        help="""Only crawl and build collections whose name matches this pattern, e.g. "Tifrunner.gnm2.ann1.*". (Default: all)""",
+    )
+    @functools.wraps(command)
+    def wrapper(genus, species, collection_type, collection_glob, **kwargs):
+        selection = CrawlSelection(genus, species, collection_type, collection_glob)
+        return command(selection=selection, **kwargs)
+
+    return wrapper
+
+
+def crawl_options(command):
+    """adds the options every crawling command takes, passed to command as crawl, the ProcessCollections keywords, and metrics_out"""
+
+    @click.option(
+        "--workers",
+        default=1,
+        type=int,
+        help="""Threads used to crawl species and collections concurrently. (Default: 1)""",
+    )
+    @click.option(
+        "--jobs",
+        default=1,
+        type=int,
+        help="""Processes used to crawl genera concurrently. Outputs match a serial run. (Default: 1)""",
+    )
+    @click.option(
+        "--cache_dir",
+        default=None,
+        help="""Directory for a persistent cache of datastore responses. Disabled if not set.""",
+    )
+    @click.option(
+        "--cache_ttl",
+        default=0,
+        type=int,
+        help="""Seconds to reuse cached responses before revalidating them. (Default: 0)""",
+    )
+    @click.option(
+        "--retries",
+        default=4,
+        type=int,
+        help="""Times a datastore request is sent again after a timeout or a 429 or 5xx response. (Default: 4)""",
+    )
+    @click.option(
+        "--metrics_out",
+        default=None,
+        help="""Write run timings and request counters to this json file and a prometheus textfile next to it.""",
+    )
+    @click.option(
+        "--journal",
+        default=None,
+        help="""Record the taxa crawled and commands built in this file, read back by --resume. Started over unless --resume is set. Disabled if not set.""",
+    )
+    @click.option(
+        "--resume",
+        is_flag=True,
+        help="""Continue an interrupted or failed run from --journal instead of starting over. Requires --journal.""",
+    )
+    @functools.wraps(command)
+    def wrapper(
+        workers, jobs, cache_dir, cache_ttl, retries, journal, resume, **kwargs
+    ):
+        crawl = dict(
+            workers=workers,
+            jobs=jobs,
+            cache_dir=cache_dir,
+            cache_ttl=cache_ttl,
+            retries=retries,
+            journal=journal,
+            resume=resume,
+        )
+        return command(crawl=crawl, **kwargs)
+
+    return wrapper
+
+
+def check_crawl(logger, crawl):
+    """exits if the crawl_options given can not be used together"""
+    if crawl["resume"] and not crawl["journal"]:
+        logger.error("--journal required for --resume")
+        sys.exit(1)
+
+
 @click.command()
 @click.option(
     "--taxa_list",
@@ -38,6 +144,13 @@ def setup_logging(log_file, log_level, process):
     default="./datastore-metadata",
     help="""Path to datastore-metadata github directory. (Default: ./datastore-metadata).""",
 )
+@click.option(
+    "--from_snapshot",
+    default=None,
+    help="""Read collections from a snapshot written by the snapshot command instead of crawling the datastore.""",
+)
+@selection_options
+@crawl_options
 @click.option(
     "--log_file",
     default="./populate-jekyll.log",
@@ -48,13 +161,36 @@ def setup_logging(log_file, log_level, process):
     default="INFO",
     help="""Log Level to output messages. (default: INFO)""",
 )
-def populate_jekyll(taxa_list, collections_out, from_github, log_file, log_level):
+def populate_jekyll(
+    taxa_list,
+    collections_out,
+    from_github,
+    from_snapshot,
+    selection,
+    crawl,
+    metrics_out,
+    log_file,
+    log_level,
+):
     """CLI entry for populate-jekyll"""
     logger = setup_logging(log_file, log_level, "populate-jekyll")
+    check_crawl(logger, crawl)
     logger.info("Processing Collections...")
-    parser = ProcessCollections(logger, out_dir=collections_out)  # initialize class
+    parser = ProcessCollections(
+        logger,
+        out_dir=collections_out,
+        selection=selection,
+        **crawl,
+    )  # initialize class
     logger.info("Outputting Collections...")
-    parser.parse_collections(taxa_list, from_github)  # parse_collections
+    if from_snapshot:  # no crawl, read what the snapshot command found
+        parser.load_snapshot(from_snapshot, taxa_list)
+    else:
+        parser.parse_collections(taxa_list, from_github)  # parse_collections
+    if metrics_out:
+        parser.write_metrics(metrics_out)
+    if parser.errors:
+        sys.exit(1)  # skipped collections were reported by the crawl
 
 
 @click.command()
@@ -68,11 +204,25 @@ def populate_jekyll(taxa_list, collections_out, from_github, log_file, log_level
     default="./autocontent",
     help="""Output for dscensor nodes.""",
 )
+@click.option(
+    "--format",
+    "node_format",
+    default="json",
+    type=click.Choice(NODE_FORMATS),
+    help="""json writes one file per node, ndjson one file of all nodes and neo4j-csv node and derived_from relationship csvs for neo4j-admin database import. (Default: json)""",
+)
 @click.option(
     "--from_github",
     default="./datastore-metadata",
     help="""Path to datastore-metadata github directory. (Default: ./datastore-metadata).""",
 )
+@click.option(
+    "--from_snapshot",
+    default=None,
+    help="""Read collections from a snapshot written by the snapshot command instead of crawling the datastore.""",
+)
+@selection_options
+@crawl_options
 @click.option(
     "--log_file",
     default="./populate-dscensor.log",
@@ -83,14 +233,38 @@ def populate_jekyll(taxa_list, collections_out, from_github, log_file, log_level
     default="INFO",
     help="""Log Level to output messages. (default: INFO)""",
 )
-def populate_dscensor(taxa_list, nodes_out, from_github, log_file, log_level):
+def populate_dscensor(
+    taxa_list,
+    nodes_out,
+    node_format,
+    from_github,
+    from_snapshot,
+    selection,
+    crawl,
+    metrics_out,
+    log_file,
+    log_level,
+):
     """CLI entry for populate-dscensor"""
     logger = setup_logging(log_file, log_level, "populate-dscensor")
-    parser = ProcessCollections(logger, out_dir=nodes_out)  # initialize class
+    check_crawl(logger, crawl)
+    parser = ProcessCollections(
+        logger,
+        out_dir=nodes_out,
+        selection=selection,
+        **crawl,
+    )  # initialize class
     logger.info("Processing Collections...")
-    parser.parse_collections(taxa_list, from_github)  # parse_collections
+    if from_snapshot:  # no crawl, read what the snapshot command found
+        parser.load_snapshot(from_snapshot, taxa_list)
+    else:
+        parser.parse_collections(taxa_list, from_github)  # parse_collections
     logger.info("Creating DSCensor Nodes...")
-    parser.populate_dscensor(nodes_out)  # populate JBrowse2
+    parser.populate_dscensor(nodes_out, node_format)  # populate DSCensor
+    if metrics_out:
+        parser.write_metrics(metrics_out)
+    if parser.errors:
+        sys.exit(1)  # skipped collections were reported by the crawl
 
 
 @click.command()
@@ -115,11 +289,45 @@ def populate_dscensor(taxa_list, nodes_out, from_github, log_file, log_level):
     default="./datastore-metadata",
     help="""Path to datastore-metadata github directory. (Default: ./datastore-metadata).""",
 )
+@click.option(
+    "--from_snapshot",
+    default=None,
+    help="""Read collections from a snapshot written by the snapshot command instead of crawling the datastore.""",
+)
 @click.option(
     "--cmds_only",
     is_flag=True,
-    help="""Output commands only. Do not run Jbrowse2 just output the commands that would be run.""",
+    help="""Output commands only. Do not write config.json just output the jbrowse commands that would build it.""",
+)
+@click.option(
+    "--rebuild_all",
+    is_flag=True,
+    help="""Rebuild every annotation copy and name index, even if its input checksum has not changed.""",
+)
+@click.option(
+    "--index_annotations",
+    is_flag=True,
+    help="""Point annotation tracks without a tbi or csi in the datastore at a sorted, tabix indexed local copy and build a trix name search index per assembly.""",
+)
+@click.option(
+    "--build_workers",
+    default=1,
+    type=int,
+    help="""Indexing commands run at once. Failures are reported after all commands finish. (Default: 1)""",
+)
+@click.option(
+    "--sequence_cache",
+    default=None,
+    help="""Directory keeping the downloaded annotation files indexes are built from, by CHECKSUM md5. (Default: sequence_cache in the JBrowse2 output)""",
+)
+@click.option(
+    "--download_workers",
+    default=4,
+    type=int,
+    help="""Files downloaded at once for indexing, while --build_workers indexes are built. (Default: 4)""",
 )
+@selection_options
+@crawl_options
 @click.option(
     "--log_file",
     default="./populate-jbrowse2.log",
@@ -136,12 +344,22 @@ def populate_jbrowse2(
     taxa_list,
     jbrowse_out,
     from_github,
+    from_snapshot,
     cmds_only,
+    rebuild_all,
+    index_annotations,
+    build_workers,
+    sequence_cache,
+    download_workers,
+    selection,
+    crawl,
+    metrics_out,
     log_file,
     log_level,
 ):
     """CLI entry for populate-jbrowse2"""
     logger = setup_logging(log_file, log_level, "populate-jbrowse2")
+    check_crawl(logger, crawl)
     if not jbrowse_url:
         logger.error("--jbrowse_url required for populate-jbrowse2")
         sys.exit(1)
@@ -150,11 +368,25 @@ def populate_jbrowse2(
         jbrowse_url=jbrowse_url,
         datastore_url=datastore_url,
         out_dir=jbrowse_out,
+        selection=selection,
+        build_workers=build_workers,
+        sequence_cache_dir=sequence_cache,
+        download_workers=download_workers,
+        index_annotations=index_annotations,
+        rebuild_all=rebuild_all,
+        **crawl,
     )  # initialize class
     logger.info("Processing Collections...")
-    parser.parse_collections(taxa_list, from_github)  # parse_collections
+    if from_snapshot:  # no crawl, read what the snapshot command found
+        parser.load_snapshot(from_snapshot, taxa_list)
+    else:
+        parser.parse_collections(taxa_list, from_github)  # parse_collections
     logger.info("Creating JBrowse2 Config...")
-    parser.populate_jbrowse2(jbrowse_out, cmds_only)  # populate JBrowse2
+    failed = parser.populate_jbrowse2(jbrowse_out, cmds_only)  # populate JBrowse2
+    if metrics_out:
+        parser.write_metrics(metrics_out)
+    if failed or parser.errors:
+        sys.exit(1)  # failures were reported by the scheduler and the crawl
 
 
 @click.command()
@@ -173,11 +405,45 @@ def populate_jbrowse2(
     default="./datastore-metadata",
     help="""Path to datastore-metadata github directory. (Default: ./datastore-metadata).""",
 )
+@click.option(
+    "--from_snapshot",
+    default=None,
+    help="""Read collections from a snapshot written by the snapshot command instead of crawling the datastore.""",
+)
 @click.option(
     "--cmds_only",
     is_flag=True,
     help="""Output commands only. Do not run makeblastdb just output the commands that would be run.""",
 )
+@click.option(
+    "--rebuild_all",
+    is_flag=True,
+    help="""Rebuild every target, even if its input checksum has not changed.""",
+)
+@click.option(
+    "--merge_max_file_sz",
+    default=None,
+    help="""Also merge the genus and all taxa BLAST alias databases into one database split into volumes of this size, e.g. 1GB. Disabled if not set.""",
+)
+@click.option(
+    "--sequence_cache",
+    default=None,
+    help="""Directory keeping the downloaded genome and protein files BLAST databases are built from, by CHECKSUM md5. (Default: sequence_cache in the BLAST output)""",
+)
+@click.option(
+    "--download_workers",
+    default=4,
+    type=int,
+    help="""Files downloaded at once for BLAST builds, while --build_workers databases are built. (Default: 4)""",
+)
+@click.option(
+    "--build_workers",
+    default=1,
+    type=int,
+    help="""Commands run at once. Failures are reported after all commands finish. (Default: 1)""",
+)
+@selection_options
+@crawl_options
 @click.option(
     "--log_file",
     default="./populate-blast.log",
@@ -188,11 +454,252 @@ def populate_jbrowse2(
     default="INFO",
     help="""Log Level to output messages. (default: INFO)""",
 )
-def populate_blast(taxa_list, blast_out, from_github, cmds_only, log_file, log_level):
+def populate_blast(
+    taxa_list,
+    blast_out,
+    from_github,
+    from_snapshot,
+    cmds_only,
+    rebuild_all,
+    merge_max_file_sz,
+    sequence_cache,
+    download_workers,
+    build_workers,
+    selection,
+    crawl,
+    metrics_out,
+    log_file,
+    log_level,
+):
     """CLI entry for populate-blast"""
     logger = setup_logging(log_file, log_level, "populate-blast")
-    parser = ProcessCollections(logger, out_dir=blast_out)  # initialize class
+    check_crawl(logger, crawl)
+    parser = ProcessCollections(
+        logger,
+        out_dir=blast_out,
+        selection=selection,
+        build_workers=build_workers,
+        rebuild_all=rebuild_all,
+        merge_max_file_sz=merge_max_file_sz,
+        sequence_cache_dir=sequence_cache,
+        download_workers=download_workers,
+        **crawl,
+    )  # initialize class
     logger.info(f"Processing Collections from {taxa_list}")
-    parser.parse_collections(taxa_list, from_github)  # parse_collections
+    if from_snapshot:  # no crawl, read what the snapshot command found
+        parser.load_snapshot(from_snapshot, taxa_list)
+    else:
+        parser.parse_collections(taxa_list, from_github)  # parse_collections
     logger.info("Creating BLAST DBs...")
-    parser.populate_blast(blast_out, cmds_only)  # populate BLAST
+    failed = parser.populate_blast(blast_out, cmds_only)  # populate BLAST
+    if metrics_out:
+        parser.write_metrics(metrics_out)
+    if failed or parser.errors:
+        sys.exit(1)  # failures were reported by the scheduler and the crawl
+
+
+@click.command()
+@click.option("--jbrowse_url", default="", help="""URL hosting JBrowse2""")
+@click.option(
+    "--taxa_list",
+    default="../_data/taxon_list.yml",
+    help="""Taxa.yml file. (Default: ../_data/taxon_list.yml)""",
+)
+@click.option(
+    "--datastore_url",
+    default="https://data.legumeinfo.org",
+    help="""URL hosting datastore formatted files.""",
+)
+@click.option(
+    "--snapshot_out",
+    default="./datastore_snapshot.sqlite",
+    help="""SQLite file to write the snapshot to. (Default: ./datastore_snapshot.sqlite)""",
+)
+@click.option(
+    "--from_github",
+    default="./datastore-metadata",
+    help="""Path to datastore-metadata github directory. (Default: ./datastore-metadata).""",
+)
+@crawl_options
+@click.option(
+    "--log_file",
+    default="./snapshot.log",
+    help="""Log file to output messages. (default: ./snapshot.log)""",
+)
+@click.option(
+    "--log_level",
+    default="INFO",
+    help="""Log Level to output messages. (default: INFO)""",
+)
+def snapshot(
+    jbrowse_url,
+    taxa_list,
+    datastore_url,
+    snapshot_out,
+    from_github,
+    crawl,
+    metrics_out,
+    log_file,
+    log_level,
+):
+    """CLI entry for snapshot"""
+    logger = setup_logging(log_file, log_level, "snapshot")
+    check_crawl(logger, crawl)
+    parser = ProcessCollections(
+        logger,
+        jbrowse_url=jbrowse_url,
+        datastore_url=datastore_url,
+        **crawl,
+    )  # initialize class
+    logger.info(f"Crawling Collections from {taxa_list}")
+    parser.create_snapshot(snapshot_out, taxa_list, from_github)  # crawl once
+    if metrics_out:
+        parser.write_metrics(metrics_out)
+    if parser.errors:
+        sys.exit(1)  # skipped collections were reported by the crawl
+
+
+@click.command()
+@click.option("--jbrowse_url", help="""URL hosting JBrowse2""")
+@click.option(
+    "--taxa_list",
+    default="../_data/taxon_list.yml",
+    help="""Taxa.yml file. (Default: ../_data/taxon_list.yml)""",
+)
+@click.option(
+    "--datastore_url",
+    default="https://data.legumeinfo.org",
+    help="""URL hosting datastore formatted files.""",
+)
+@click.option(
+    "--collections_out", default="../_data/taxa/", help="""Output for collections."""
+)
+@click.option(
+    "--nodes_out",
+    default="./autocontent/dscensor",
+    help="""Output for dscensor nodes. (Default: ./autocontent/dscensor)""",
+)
+@click.option(
+    "--jbrowse_out",
+    default="./autocontent/jbrowse2",
+    help="""Output directory for Jbrowse2. (Default: ./autocontent/jbrowse2)""",
+)
+@click.option(
+    "--blast_out",
+    default="./autocontent/blast",
+    help="""Output directory for BLAST DBs. (Default: ./autocontent/blast)""",
+)
+@click.option(
+    "--from_github",
+    default="./datastore-metadata",
+    help="""Path to datastore-metadata github directory. (Default: ./datastore-metadata).""",
+)
+@click.option(
+    "--from_snapshot",
+    default=None,
+    help="""Read collections from a snapshot written by the snapshot command instead of crawling the datastore.""",
+)
+@click.option(
+    "--concurrent_stages",
+    is_flag=True,
+    help="""Build the JBrowse2 config and the BLAST DBs at the same time.""",
+)
+@click.option(
+    "--rebuild_all",
+    is_flag=True,
+    help="""Rebuild every target, even if its input checksum has not changed.""",
+)
+@click.option(
+    "--merge_max_file_sz",
+    default=None,
+    help="""Also merge the genus and all taxa BLAST alias databases into one database split into volumes of this size, e.g. 1GB. Disabled if not set.""",
+)
+@click.option(
+    "--sequence_cache",
+    default=None,
+    help="""Directory keeping the downloaded genome and protein files BLAST databases are built from, by CHECKSUM md5. (Default: sequence_cache in the BLAST output)""",
+)
+@click.option(
+    "--download_workers",
+    default=4,
+    type=int,
+    help="""Files downloaded at once for BLAST builds, while --build_workers databases are built. (Default: 4)""",
+)
+@click.option(
+    "--index_annotations",
+    is_flag=True,
+    help="""Point annotation tracks without a tbi or csi in the datastore at a sorted, tabix indexed local copy and build a trix name search index per assembly.""",
+)
+@click.option(
+    "--build_workers",
+    default=1,
+    type=int,
+    help="""Commands run at once. Failures are reported after all commands finish. (Default: 1)""",
+)
+@selection_options
+@crawl_options
+@click.option(
+    "--log_file",
+    default="./populate-all.log",
+    help="""Log file to output messages. (default: ./populate-all.log)""",
+)
+@click.option(
+    "--log_level",
+    default="INFO",
+    help="""Log Level to output messages. (default: INFO)""",
+)
+def populate_all(
+    jbrowse_url,
+    taxa_list,
+    datastore_url,
+    collections_out,
+    nodes_out,
+    jbrowse_out,
+    blast_out,
+    from_github,
+    from_snapshot,
+    concurrent_stages,
+    rebuild_all,
+    merge_max_file_sz,
+    sequence_cache,
+    download_workers,
+    index_annotations,
+    build_workers,
+    selection,
+    crawl,
+    metrics_out,
+    log_file,
+    log_level,
+):
+    """CLI entry for populate-all"""
+    logger = setup_logging(log_file, log_level, "populate-all")
+    check_crawl(logger, crawl)
+    if not jbrowse_url:
+        logger.error("--jbrowse_url required for populate-all")
+        sys.exit(1)
+    parser = ProcessCollections(
+        logger,
+        jbrowse_url=jbrowse_url,
+        datastore_url=datastore_url,
+        out_dir=collections_out,
+        selection=selection,
+        build_workers=build_workers,
+        rebuild_all=rebuild_all,
+        merge_max_file_sz=merge_max_file_sz,
+        sequence_cache_dir=sequence_cache,
+        download_workers=download_workers,
+        index_annotations=index_annotations,
+        **crawl,
+    )  # initialize class
+    logger.info("Processing Collections...")
+    if from_snapshot:  # no crawl, read what the snapshot command found
+        parser.load_snapshot(from_snapshot, taxa_list)
+    else:
+        parser.parse_collections(taxa_list, from_github)  # one crawl for every output
+    failed = parser.populate_all(
+        nodes_out, jbrowse_out, blast_out, concurrent_stages
+    )  # populate DSCensor, JBrowse2 and BLAST
+    if metrics_out:
+        parser.write_metrics(metrics_out)
+    if failed or parser.errors:
+        sys.exit(1)  # failures were reported by the scheduler and the crawl
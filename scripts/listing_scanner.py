@@ -0,0 +1,57 @@
+"""Scanner for datastore directory listings used by ProcessCollections."""
+
+#!/usr/bin/env python3
+
+import re
+import json
+import html
+from collections import namedtuple
+
+CollectionEntry = namedtuple(
+    "CollectionEntry", ["collection_type", "path"]
+)  # a collection directory found in a listing
+
+
+class ListingScanner:
+    """Finds collection links in HTML or JSON directory listings with one precompiled pattern"""
+
+    def __init__(self, collection_types):
+        types = "|".join(
+            re.escape(collection_type)
+            for collection_type in sorted(collection_types, key=len, reverse=True)
+        )  # longest first so genome_alignments is not read as a shorter type
+        self.href_pattern = re.compile(
+            rf"""href\s*=\s*["']?([^"'\s>]*/({types})/[^"'\s>]+)""", re.IGNORECASE
+        )  # group 1 is the link, group 2 the collection type
+
+    def scan_html(self, response_text):
+        """Returns CollectionEntries for every distinct collection href in an HTML listing"""
+        entries = {}  # path -> CollectionEntry, keeps listing order
+        for match in self.href_pattern.finditer(response_text):
+            path = html.unescape(match.group(1))
+            if path not in entries:
+                entries[path] = CollectionEntry(match.group(2), path)
+        return list(entries.values())
+
+    def scan_json(self, response_text, base_path):
+        """Returns CollectionEntries for the directories of a JSON listing of base_path, e.g. nginx autoindex_format json"""
+        collection_type = base_path.rstrip("/").split("/")[-1]
+        entries = {}
+        for item in json.loads(response_text):
+            if isinstance(item, dict):  # {"name": ..., "type": "directory"}
+                if item.get("type", "directory") != "directory":
+                    continue
+                item = item["name"]
+            path = f"{base_path}{item.strip('/')}/"
+            if path not in entries:
+                entries[path] = CollectionEntry(collection_type, path)
+        return list(entries.values())
+
+    def scan(self, response_text, base_path):
+        """Returns CollectionEntries found in the listing of base_path in either format"""
+        if response_text.lstrip().startswith("["):  # JSON directory index
+            try:
+                return self.scan_json(response_text, base_path)
+            except (ValueError, KeyError, TypeError):
+                pass  # not a JSON listing after all
+        return self.scan_html(response_text)
@@ -0,0 +1,157 @@
+"""In-memory index of a datastore-metadata checkout used by ProcessCollections in from_github mode."""
+
+#!/usr/bin/env python3
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+def metadata_file(name):
+    """True for the README, CHECKSUM, BUSCO summary and description files read while crawling"""
+    return name.startswith(("README.", "CHECKSUM.", "description_")) or name.endswith(
+        "short_summary.json"
+    )
+
+
+class LocalIndex:
+    """Indexes directories and files below a tree with one os.scandir walk and reads metadata files on a pool.
+
+    Lookups for paths outside every indexed tree go to the filesystem.
+    """
+
+    def __init__(self, workers=1):
+        self.workers = max(1, int(workers))  # threads reading metadata files
+        self.roots = []  # trees indexed so far
+        self.dirs = {}  # directory -> subdirectory names in scandir order
+        self.files = set()  # every file below self.roots
+        self.contents = {}  # text of metadata files by path
+        self.mtimes = {}  # st_mtime_ns of metadata files by path
+
+    def indexed(self, path):
+        """Returns the normalized path and whether it is below an indexed tree"""
+        path = os.path.normpath(path)
+        for root in self.roots:
+            if path == root or path.startswith(f"{root}{os.sep}"):
+                return (path, True)
+        return (path, False)
+
+    @staticmethod
+    def scan_dir(directory):
+        """Returns ((name, path) of subdirectories, (name, path) of files) of directory, empty if it does not exist"""
+        subdirs = []
+        files = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        subdirs.append((entry.name, entry.path))
+                    else:
+                        files.append((entry.name, entry.path))
+        except FileNotFoundError:  # root does not exist
+            pass
+        return (subdirs, files)
+
+    def map_chunks(self, pool, func, items):
+        """Maps func over items in order, a chunk of items per task so pool overhead is not paid per file"""
+        if pool is None:
+            return [func(item) for item in items]
+        size = max(1, len(items) // (self.workers * 4))
+        chunks = [items[start : start + size] for start in range(0, len(items), size)]
+        return [
+            result
+            for results in pool.map(
+                lambda chunk: [func(item) for item in chunk], chunks
+            )
+            for result in results
+        ]
+
+    def add_tree(self, root):
+        """Walks root once, a level of directories at a time, and reads all of its metadata files on the pool"""
+        root = os.path.normpath(os.path.abspath(root))
+        if self.indexed(root)[1]:  # already indexed
+            return
+        self.roots.append(root)
+        metadata = []  # files to read
+        pool = None
+        if self.workers > 1:
+            pool = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            level = [root]
+            while level:  # one scandir per directory, no stat calls
+                next_level = []
+                for directory, (subdirs, files) in zip(
+                    level, self.map_chunks(pool, self.scan_dir, level)
+                ):
+                    self.dirs[directory] = [name for name, _ in subdirs]
+                    next_level += [path for _, path in subdirs]
+                    for name, path in files:
+                        self.files.add(path)
+                        if metadata_file(name):
+                            metadata.append(path)
+                level = next_level
+            for path, (text, mtime) in zip(
+                metadata, self.map_chunks(pool, self.read_metadata, metadata)
+            ):
+                self.contents[path] = text
+                self.mtimes[path] = mtime
+        finally:
+            if pool:
+                pool.shutdown()
+
+    @staticmethod
+    def read_file(path):
+        """Returns the text of path"""
+        with open(path, encoding="utf-8") as file_handle:
+            return file_handle.read()
+
+    @staticmethod
+    def read_metadata(path):
+        """Returns (text, st_mtime_ns) of path, the mtime from the open file instead of another stat by path"""
+        with open(path, encoding="utf-8") as file_handle:
+            return (file_handle.read(), os.fstat(file_handle.fileno()).st_mtime_ns)
+
+    def version(self, path):
+        """st_mtime_ns of path or None if it does not exist"""
+        path = os.path.normpath(path)
+        if path in self.mtimes:  # read by add_tree
+            return self.mtimes[path]
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def isdir(self, path):
+        """os.path.isdir from the index"""
+        path, indexed = self.indexed(path)
+        if not indexed:
+            return os.path.isdir(path)
+        return path in self.dirs
+
+    def isfile(self, path):
+        """os.path.isfile from the index"""
+        path, indexed = self.indexed(path)
+        if not indexed:
+            return os.path.isfile(path)
+        return path in self.files
+
+    def subdirs(self, path):
+        """Subdirectory names of path like next(os.walk(path))[1]"""
+        path, indexed = self.indexed(path)
+        if not indexed:
+            return next(os.walk(path))[1]
+        return list(self.dirs.get(path, []))
+
+    def read(self, path):
+        """Returns the text of path or None if it does not exist"""
+        path = os.path.normpath(path)
+        if path in self.contents:  # read by add_tree
+            return self.contents[path]
+        path, indexed = self.indexed(path)
+        if indexed:
+            if path in self.contents:
+                return self.contents[path]
+            if path not in self.files:
+                return None
+        elif not os.path.isfile(path):
+            return None
+        return self.read_file(path)
@@ -0,0 +1,101 @@
+"""Parsing and caching of datastore metadata YAML and JSON used by ProcessCollections."""
+
+#!/usr/bin/env python3
+
+import os
+import json
+import pickle
+import pathlib
+import sqlite3
+import threading
+import yaml
+
+Loader = getattr(
+    yaml, "CSafeLoader", yaml.SafeLoader
+)  # libyaml when pyyaml was built with it
+Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+def load_yaml(text):
+    """yaml.load with the fastest safe loader available"""
+    return yaml.load(text, Loader=Loader)
+
+
+def dump_yaml(data, stream=None):
+    """yaml.dump with the fastest safe dumper available"""
+    return yaml.dump(data, stream, Dumper=Dumper)
+
+
+PARSERS = {"yaml": load_yaml, "json": json.loads}  # document formats load accepts
+
+
+class MetadataLoader:
+    """Parses metadata documents and keeps them in a sqlite file under cache_dir.
+
+    Documents are stored by key (a path or url) with a version (an mtime or ETag). A document whose
+    version has not changed is unpickled instead of parsed again. Without cache_dir nothing is kept.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.connection = None
+        self.pending = 0  # stores not committed yet
+        self.lock = threading.Lock()  # the connection is shared by all crawl threads
+        if cache_dir:
+            pathlib.Path(cache_dir).mkdir(parents=True, exist_ok=True)
+            self.connection = sqlite3.connect(
+                os.path.join(cache_dir, "metadata.sqlite"),
+                check_same_thread=False,
+                timeout=60,
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents (key TEXT PRIMARY KEY, version TEXT, document BLOB)"
+            )
+            self.connection.commit()
+
+    def lookup(self, key, version):
+        """Returns the pickled document stored for key at version or None"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT document FROM documents WHERE key=? AND version=?",
+                (key, version),
+            ).fetchone()
+        return row[0] if row else None
+
+    def store(self, key, version, document):
+        """Stores document for key at version, replacing older versions. Commits every 256 documents"""
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?)",
+                (key, version, pickle.dumps(document, pickle.HIGHEST_PROTOCOL)),
+            )
+            self.pending += 1
+            if self.pending >= 256:  # a commit per document costs more than parsing it
+                self.connection.commit()
+                self.pending = 0
+
+    def flush(self):
+        """Commits stored documents"""
+        if self.connection is not None:
+            with self.lock:
+                self.connection.commit()
+                self.pending = 0
+
+    def load(self, text, key=None, version=None, document_format="yaml"):
+        """Returns text parsed as document_format, from the cache if key is stored at version"""
+        cacheable = self.connection is not None and key and version
+        if cacheable:
+            stored = self.lookup(key, str(version))
+            if stored is not None:  # unchanged since it was parsed
+                return pickle.loads(stored)
+        document = PARSERS[document_format](text)
+        if cacheable:
+            self.store(key, str(version), document)
+        return document
+
+    def close(self):
+        """Closes the cache connection"""
+        if self.connection is not None:
+            self.flush()
+            with self.lock:
+                self.connection.close()
+            self.connection = None
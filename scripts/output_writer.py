@@ -0,0 +1,31 @@
+"""Atomic writers for the files ProcessCollections outputs."""
+
+#!/usr/bin/env python3
+
+import os
+import hashlib
+
+
+def file_digest(path):
+    """sha256 of the file at path or None if it does not exist"""
+    try:
+        with open(path, "rb") as file_handle:
+            return hashlib.sha256(file_handle.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def write_if_changed(path, text):
+    """Writes text to path unless it already holds the same content. Returns True if path was written.
+
+    The new content goes to a temporary file that replaces path in one rename, so readers never see
+    a partial file and an unchanged file keeps its mtime.
+    """
+    data = text.encode("utf-8")
+    if file_digest(path) == hashlib.sha256(data).hexdigest():  # nothing changed
+        return False
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as tmp_handle:
+        tmp_handle.write(data)
+    os.replace(tmp_path, path)
+    return True
@@ -2,14 +2,37 @@
 
 #!/usr/bin/env python3
 
+import io
 import os
 import sys
 import json
+import time
 import pathlib
-import subprocess
-from html.parser import HTMLParser
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import requests
-import yaml
+from requests.adapters import HTTPAdapter
+from http_cache import HttpCache, PartialResponse
+from job_scheduler import Job, JobScheduler
+from build_manifest import BuildManifest
+from jbrowse_config import JBrowseConfig, track_id
+from listing_scanner import ListingScanner
+from datastore_snapshot import DatastoreSnapshot
+from dscensor_export import write_ndjson, write_neo4j_csv
+from local_index import LocalIndex
+from metadata_loader import MetadataLoader, load_yaml, dump_yaml
+from output_writer import write_if_changed
+from run_metrics import RunMetrics
+from request_policy import RequestPolicy, RETRY_STATUSES, FAILED_STATUS
+from progress_journal import ProgressJournal
+from sequence_cache import SequenceCache
+from annotation_index import datastore_index, tabix_command, trix_command
+from blast_aliases import alias_groups, group_md5, alias_command, merge_command
+from session_links import session_url
+from collection_manifest import CollectionManifest
+from file_records import FileIndex
+from crawl_selection import CrawlSelection
 
 
 class ProcessCollections:
@@ -21,6 +44,20 @@ class ProcessCollections:
         datastore_url="https://data.legumeinfo.org",
         jbrowse_url="",
         out_dir="./autocontent",
+        workers=1,
+        cache_dir=None,
+        cache_ttl=0,
+        build_workers=1,
+        rebuild_all=False,
+        jobs=1,
+        retries=4,
+        journal=None,
+        resume=False,
+        merge_max_file_sz=None,
+        sequence_cache_dir=None,
+        download_workers=4,
+        index_annotations=False,
+        selection=None,
     ):
         self.logger = logger
         if self.logger:
@@ -34,9 +71,8 @@ class ProcessCollections:
         self.jbrowse_url = jbrowse_url  # URL to append jbrowse2 sessions
         self.out_dir = out_dir  # output directory for objects.  This is set by the runtimes if provided
         self.files = (
-            {}
+            FileIndex()
         )  # stores all files by collection type. This is used to populate output after scanning
-        self.file_objects = []  # a list of all file objects to write for DSCensor nodes
         self.collection_types = (
             [  # collection types currently recorded from datastore_url
                 "genomes",  # fasta
@@ -49,60 +85,252 @@ class ProcessCollections:
                 "genome_alignments",  # paf
             ]
         )  # types to search the datastore_url for
+        self.listing_scanner = ListingScanner(
+            self.collection_types
+        )  # finds collections in directory listings
         #        self.relationships = {'genomes': {'annotations': ...}, 'annotations': {}}  # establish related objects once this is relevant
         self.current_taxon = {}
         self.species_descriptions = (
             []
         )  # list of all species descriptions to be written to species collections
-        self.infraspecies_resources = {}  # used to track all "strains"
         self.species_collections_handle = (
             None  # yaml file to write for species collections
         )
         self.genus_resources_handle = None  # yaml file to write for genus resources
         self.species_resources_handle = None  # yaml file to write for species resources
+        self.workers = max(
+            1, int(workers)
+        )  # threads used to crawl species and collections
+        self.species_pool = None  # thread pool for species, set by parse_collections
+        self.collection_pool = (
+            None  # thread pool for collections, set by parse_collections
+        )
+        self.session = requests.Session()  # keep-alive session shared by all requests
+        adapter = HTTPAdapter(
+            pool_connections=self.workers, pool_maxsize=self.workers * 2
+        )  # species and collection threads can both hold a connection
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.cache = (
+            None  # persistent response cache used by get_remote and head_remote
+        )
+        if cache_dir:
+            self.cache = HttpCache(cache_dir, ttl=cache_ttl, logger=logger)
+        self.cache_dir = cache_dir  # passed on to worker processes
+        self.metadata = MetadataLoader(
+            cache_dir
+        )  # parsed documents are kept with the response cache
+        self.cache_ttl = cache_ttl
+        self.jobs = max(1, int(jobs))  # processes used to crawl genera
+        self.local_index = LocalIndex(
+            workers=self.workers
+        )  # datastore-metadata files read in from_github mode
+        self.build_workers = build_workers  # jobs run at once by process_collections
+        self.rebuild_all = (
+            rebuild_all  # ignore the build manifest and rebuild everything
+        )
+        self.checksums = {}  # CHECKSUM contents by collection url
+        self.fai_refs = {}  # (ref, length) of the first fai line by genome url
+        self.fai_lock = threading.Lock()  # fai_refs is shared by crawl threads
+        self.snapshot = None  # DatastoreSnapshot being written by create_snapshot
+        self.unchanged_outputs = 0  # output files whose content did not change
+        self.metrics = RunMetrics()  # timings and request counters for --metrics_out
+        self.retries = retries  # passed on to worker processes
+        self.policy = RequestPolicy(
+            logger, concurrency=self.workers * 2, retries=retries, metrics=self.metrics
+        )  # retries and backs off when the datastore struggles
+        self.merge_max_file_sz = merge_max_file_sz  # also merge genus and all taxa BLAST aliases into volumes this size
+        self.sequence_cache_dir = (
+            sequence_cache_dir  # BLAST inputs, <blast out>/sequence_cache if not set
+        )
+        self.download_workers = download_workers  # BLAST inputs downloaded at once
+        self.index_annotations = (
+            index_annotations  # tabix copies and trix indexes of JBrowse2 annotations
+        )
+        self.selection = (
+            selection or CrawlSelection()
+        )  # taxa, collection types and collections to crawl and build
+        self.errors = []  # collections and taxa skipped after an error
+        self.errors_lock = threading.Lock()  # errors are recorded by crawl threads
+        self.journal = None  # ProgressJournal of finished work, disabled if not set
+        if journal:
+            pathlib.Path(os.path.dirname(os.path.abspath(journal))).mkdir(
+                parents=True, exist_ok=True
+            )
+            self.journal = ProgressJournal(journal, resume)
+            if resume:
+                logger.info(
+                    f"Resuming from {journal}: {len(self.journal.genera)} genera, {len(self.journal.species)} species, {len(self.journal.jobs)} commands done"
+                )
+
+    def map_workers(self, pool, func, items):
+        """Maps func over items on pool. Results are returned in the order of items. Runs serially if pool is None"""
+        if pool is None:
+            return [func(item) for item in items]
+        return list(pool.map(func, items))
+
+    def record_error(self, error, **where):
+        """Logs and keeps an error that skipped the collection or taxon in where, journaling it if enabled"""
+        record = dict(where, error=f"{type(error).__name__}: {error}")
+        self.logger.error(
+            f"Skipping {' '.join(where.values())} after {record['error']}"
+        )
+        with self.errors_lock:
+            self.errors.append(record)
+        if self.journal:
+            self.journal.add_error(record)
+
+    def has_errors(self, genus, species=None, collection_type=None):
+        """True if an error was recorded for genus, species and collection_type when given"""
+        with self.errors_lock:
+            return any(
+                error_matches(error, genus, species, collection_type)
+                for error in self.errors
+            )
+
+    def send_request(self, method, url, headers=None, stream=False):
+        """Sends method for url on the shared session, retried by self.policy"""
+
+        def attempt(timeout):
+            start = time.perf_counter()
+            try:
+                response = self.session.request(
+                    method,
+                    url,
+                    headers=headers,
+                    timeout=timeout,
+                    allow_redirects=method != "HEAD",
+                    stream=stream,
+                )  # get remote object
+            except requests.RequestException:
+                self.metrics.observe_request(
+                    method, url, "error", time.perf_counter() - start
+                )
+                raise
+            self.metrics.observe_request(
+                method,
+                url,
+                response.status_code,
+                time.perf_counter() - start,
+                0 if stream else len(response.content or b""),
+            )  # streamed bytes are added by the reader
+            return response
+
+        response = self.policy.send(attempt, method, url)
+        if (
+            response.status_code in RETRY_STATUSES
+            or response.status_code == FAILED_STATUS
+        ):  # not a missing file, whatever needed it is incomplete
+            self.record_error(
+                requests.HTTPError(f"{response.status_code} for {method}"), url=url
+            )
+        return response
+
+    def fetch_remote(self, method, url, send=None):
+        """Fetches url with send, self.send_request if not set, through self.cache if set. Returns a response with status_code and text"""
+        send = send or self.send_request
+        if self.cache:
+            response = self.cache.request(send, method, url)
+            if response.from_cache:
+                self.metrics.cache_hit(method, url)
+            return response
+        return send(method, url)
 
     def get_remote(self, url):
-        """Uses requests.get to grab remote URL returns response.text otherwise returns False"""
+        """Uses GET to grab remote URL returns response.text otherwise returns False"""
         logger = self.logger
-        response = requests.get(url, timeout=5)  # get remote object
+        response = self.fetch_remote("GET", url)  # get remote object
         if response.status_code == 200:  # SUCCESS
             return response.text
         logger.debug(f"GET failed with status {response.status_code} for: {url}")
         return False
 
     def head_remote(self, url):
-        """Uses requests.head to grab remote URL returns response.text otherwise returns False"""
+        """Uses HEAD to check remote URL returns True otherwise returns False"""
         logger = self.logger
-        response = requests.head(url, timeout=5)  # get remote object
-        if response.status_code == 200:  # SUCCESS
-            return response.text
-        logger.debug(f"GET failed with status {response.status_code} for: {url}")
+        response = self.fetch_remote("HEAD", url)  # get remote object
+        if response.status_code == 200:  # SUCCESS, HEAD has no text to return
+            return True
+        logger.debug(f"HEAD failed with status {response.status_code} for: {url}")
         return False
 
-    def parse_attributes(self, response_text):  # inherited from Sammyjava
-        """parses attributes returned from HTMLParser. Credit to SammyJava"""
-        collections = (
-            []
-        )  # Prevents self.collections collision with self in CollectionsParser
-        collection_types = self.collection_types
-
-        class CollectionsParser(HTMLParser):
-            """HTMLParser for Collections"""
-
-            def handle_starttag(self, tag, attrs):
-                """Feed from HTMLParser"""
-                for attr in attrs:  # check each attribute passed in attrs
-                    if attr[0] == "href":  # attribute is a URL
-                        for collection_type in collection_types:
-                            if (
-                                f"/{collection_type}/" in attr[1]
-                            ):  # collection_type iterator is in URL attr[1]
-                                collections.append(
-                                    attr[1]
-                                )  # add attr[1] to collections for later use in process_collections
-
-        CollectionsParser().feed(response_text)  # populate collections
+    def get_metadata(self, url, local_path=None, document_format="yaml"):
+        """Returns the parsed yaml or json document at url, or at local_path in from_github mode, otherwise None"""
+        logger = self.logger
+        if self.from_github:
+            text = self.local_index.read(local_path)
+            key = local_path
+            version = self.local_index.version(local_path)  # mtime
+        else:
+            response = self.fetch_remote("GET", url)
+            if response.status_code != 200:
+                logger.debug(
+                    f"GET failed with status {response.status_code} for: {url}"
+                )
+                return None
+            text = response.text
+            key = url
+            if self.cache:
+                version = response.etag or response.last_modified
+            else:
+                version = response.headers.get("ETag") or response.headers.get(
+                    "Last-Modified"
+                )  # unchanged ETag, unchanged document
+        if not text:
+            return None
+        with self.metrics.phase("parse_metadata", document_format):
+            return self.metadata.load(text, key, version, document_format)
+
+    def send_first_line(self, method, url, headers=None):
+        """Sends a ranged method for url and reads its first line. Returns a PartialResponse of that line, 200 if read"""
+        response = self.send_request(
+            method, url, headers=dict(headers or {}, Range="bytes=0-4095"), stream=True
+        )  # only the leading bytes, servers ignoring Range are streamed
+        first_line = b""
+        try:
+            if response.status_code in (200, 206):  # SUCCESS or partial content
+                for chunk in response.iter_content(chunk_size=4096):
+                    first_line += chunk
+                    if b"\n" in first_line:  # stop streaming after the first line
+                        break
+        finally:
+            response.close()
+        self.metrics.add_bytes(method, url, len(first_line))
+        first_line = first_line.split(b"\n")[0]
+        return PartialResponse(
+            200 if response.status_code == 206 else response.status_code,
+            first_line,
+            first_line.decode("utf-8"),
+            response.headers,
+        )  # cached as the whole response, revalidated with the fai validators
+
+    def get_fai_ref(self, url):
+        """Returns (ref, length) from the first line of the fai for genome url or False. Each genome is read once"""
+        logger = self.logger
+        with self.fai_lock:
+            if url in self.fai_refs:
+                return self.fai_refs[url]
+        fai_url = f"{url}.fai"  # get fai file for jbrowse session construction
+        response = self.fetch_remote("GET", fai_url, self.send_first_line)
+        if response.status_code != 200:
+            logger.debug(
+                f"GET failed with status {response.status_code} for: {fai_url}"
+            )
+        fields = response.text.split() if response.status_code == 200 else []
+        fai_ref = (
+            tuple(fields[:2]) if len(fields) > 1 else False
+        )  # fai field 1\s+2. field 1 is sequence_id field 2 is length
+        with self.fai_lock:
+            self.fai_refs[url] = fai_ref
+        return fai_ref
+
+    def parse_attributes(self, response_text, base_path=""):
+        """Returns the distinct collection paths linked from a directory listing"""
+        collections = [
+            entry.path for entry in self.listing_scanner.scan(response_text, base_path)
+        ]  # deduplicated collections in listing order
         self.collections = collections  # set self.collections
+        return collections
 
     def get_attributes(self, parts):
         """parse parts return url components"""
@@ -110,56 +338,111 @@ class ProcessCollections:
         strain = parts[-2]  # get strain and key information
         return (gensp, strain)
 
-    def process_collections(self, cmds_only, mode):
-        """General method to create a jbrowse-components config or populate a blast db using mode"""
+    def get_checksums(self, url):
+        """Returns {filename: md5} from the CHECKSUM file of the collection holding url"""
+        collection_url = url.rsplit("/", 1)[0]
+        if collection_url in self.checksums:  # each CHECKSUM is read once
+            return self.checksums[collection_url]
+        key = collection_url.rsplit("/", 1)[1]
+        checksum_response = None
+        if self.from_github and collection_url.startswith(self.datastore_url):
+            checksum_file = f"{self.from_github}{collection_url[len(self.datastore_url):]}/CHECKSUM.{key}.md5"
+            checksum_response = self.local_index.read(checksum_file)
+        else:
+            checksum_response = self.get_remote(f"{collection_url}/CHECKSUM.{key}.md5")
+        checksums = {}
+        for line in (checksum_response or "").split("\n"):
+            fields = line.split()
+            if len(fields) > 1:  # md5 ./filename
+                checksums[fields[1].replace("./", "")] = fields[0]
+        self.checksums[collection_url] = checksums
+        return checksums
+
+    def collection_manifest(self, collection_dir):
+        """CollectionManifest of the datastore collection at collection_dir, its CHECKSUM is read once"""
+        url = f"{self.datastore_url}{collection_dir}".rstrip("/")
+        return CollectionManifest(url, self.get_checksums(f"{url}/"))
+
+    def file_exists(self, manifest, name):
+        """True if the collection of manifest has name. Only a collection without a CHECKSUM is asked with HEAD"""
+        exists = manifest.exists(name)
+        if exists is None:
+            return self.head_remote(manifest.file_url(name))
+        self.metrics.cache_hit("HEAD", manifest.file_url(name))  # no request sent
+        return exists
+
+    def process_collections(self, cmds_only, mode, out_dir=None):
+        """General method to create a jbrowse-components config or populate a blast db using mode in out_dir. Returns failed jobs"""
         logger = self.logger
-        pathlib.Path(self.out_dir).mkdir(parents=True, exist_ok=True)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        out_dir = (
+            out_dir or self.out_dir
+        )  # stages can run concurrently, each with its own out_dir
+        pathlib.Path(out_dir).mkdir(parents=True, exist_ok=True)
+        inputs = {}  # name -> (md5, output) for jobs added to the scheduler
+        databases = []  # BLAST databases grouped into aliases after they are built
+        annotations = []  # (url, assembly, name) of JBrowse2 GFF3 tracks to index
+        journal = self.journal
+
+        def journal_job(job):
+            if (
+                journal and job.succeeded() and job.name in inputs
+            ):  # kept even if the run dies before the manifest is saved
+                journal.add_job(mode, job.name, inputs[job.name][0])
+
+        scheduler = JobScheduler(
+            logger,
+            workers=self.build_workers,
+            log_dir=f"{os.path.abspath(out_dir)}/logs",
+            on_finish=journal_job,
+            stage_workers={"download": self.download_workers},
+        )  # commands are run after all of them are built
+        sequence_cache = None  # BLAST inputs are downloaded apart from the builds
+        if mode == "blast" and not cmds_only:
+            sequence_cache = self.download_cache(out_dir)
+        manifest = BuildManifest(
+            f"{os.path.abspath(out_dir)}/autocontent_manifest.json",
+            mode,
+            rebuild_all=self.rebuild_all,
+        )  # md5 of the input each output was last built from
+        jbrowse_config = None  # built in memory unless only printing jbrowse commands
+        if mode == "jbrowse" and not cmds_only:
+            jbrowse_config = JBrowseConfig(f"{os.path.abspath(out_dir)}/config.json")
         for collection_type in self.collection_types:  # for all collections
-            for dsfile in self.files.get(
-                collection_type, []
+            for record in self.files.records(
+                collection_type
             ):  # for all files in all collections
                 cmd = ""
-                url = self.files[collection_type][dsfile]["url"]
+                url = record.url
                 if not url:  # do not take objects with no defined link
                     continue
-                name = self.files[collection_type][dsfile]["name"]
+                name = record.name
                 version = name.split(".")[-1]
-                #                dsname = self.files[collection_type][dsfile]["url"].split("/")[-1]
-                genus = self.files[collection_type][dsfile]["genus"]
-                taxid = self.files[collection_type][dsfile].get("taxid", 0)
-                parent = self.files[collection_type][dsfile]["parent"]
-                species = self.files[collection_type][dsfile]["species"]
-                infraspecies = self.files[collection_type][dsfile]["infraspecies"]
-                filetype = url.split(".")[
-                    -3
-                ]  # get file type from datastore file name filetype.X.gz
-                self.file_objects.append(
-                    {
-                        "filename": name,
-                        "filetype": filetype,
-                        "canonical_type": filetype,
-                        "url": url,
-                        "counts": self.files[collection_type][dsfile].get(
-                            "counts", None
-                        ),
-                        "busco": self.files[collection_type][dsfile].get("busco", None),
-                        "genus": genus,
-                        "species": species,
-                        "origin": "LIS",
-                        "infraspecies": infraspecies,
-                        "derived_from": parent,
-                    }
-                )  # object for DSCensor node
+                genus = record.genus
+                taxid = record.taxid
+                parent = record.parent
+                species = record.species
+                infraspecies = record.infraspecies
+                if (
+                    collection_type != "genomes"
+                    and mode == "jbrowse"
+                    and self.selection.whole_genera  # else parents may not be selected
+                    and not all(self.files.genome(genome) for genome in parent)
+                ):  # the track would point at an assembly that is not in the config
+                    logger.warning(f"Parent genome {parent} not crawled for: {name}")
                 ### possibly break out next section into methods: blast, jbrowse, then types
 
                 if collection_type == "genomes":  # add genome
                     if mode == "jbrowse":  # for jbrowse
-                        cmd = f"jbrowse add-assembly -n {name} --out {os.path.abspath(self.out_dir)}/ -t bgzipFasta --force"
-                        cmd += f' --displayName "{genus.capitalize()} {species} {infraspecies} V{version.replace("gnm", "")} {collection_type.capitalize()}" {url}'
-                        # print("url: ", url)
+                        display_name = f'{genus.capitalize()} {species} {infraspecies} V{version.replace("gnm", "")} {collection_type.capitalize()}'
+                        cmd = f"jbrowse add-assembly -n {name} --out {os.path.abspath(out_dir)}/ -t bgzipFasta --force"
+                        cmd += f' --displayName "{display_name}" {url}'
+                        if jbrowse_config:
+                            jbrowse_config.add_assembly(name, display_name, url)
                     elif mode == "blast":  # for blast
-                        cmd = f"set -o pipefail -o errexit -o nounset; curl {url} | gzip -dc"  # retrieve genome and decompress
-                        cmd += f'| makeblastdb -parse_seqids -out {self.out_dir}/{name} -hash_index -dbtype nucl -title "{genus.capitalize()} {species} {infraspecies} V{version.replace("gnm", "")} {collection_type.capitalize()}"'
+                        cmd = f"set -o pipefail -o errexit -o nounset; {self.sequence_source(sequence_cache, url)} | gzip -dc"  # retrieve genome and decompress
+                        cmd += f'| makeblastdb -parse_seqids -out {out_dir}/{name} -hash_index -dbtype nucl -title "{genus.capitalize()} {species} {infraspecies} V{version.replace("gnm", "")} {collection_type.capitalize()}"'
                         if taxid:
                             cmd += f" -taxid {taxid}"
 
@@ -169,28 +452,34 @@ class ProcessCollections:
                             "faa.gz"
                         ):  # only process non faa annotations in jbrowse
                             continue
-                        cmd = f"jbrowse add-track -a {parent[0]} --out {os.path.abspath(self.out_dir)}/ --force"
-                        cmd += f' -n "{genus.capitalize()} {species} {infraspecies} V{version.replace("ann", "")} {collection_type.capitalize()}" {url}'
+                        track_name = f'{genus.capitalize()} {species} {infraspecies} V{version.replace("ann", "")} {collection_type.capitalize()}'
+                        cmd = f"jbrowse add-track -a {parent[0]} --out {os.path.abspath(out_dir)}/ --force"
+                        cmd += f' -n "{track_name}" {url}'
+                        if jbrowse_config:
+                            jbrowse_config.add_gff3(url, parent[0], track_name)
+                            annotations.append((url, parent[0], track_name))
                     elif mode == "blast":  # for blast
                         if not url.endswith(
                             "faa.gz"
                         ):  # only process faa annotations in blast
                             continue
-                        cmd = f"set -o pipefail -o errexit -o nounset; curl {url} | gzip -dc"  # retrieve genome and decompress
-                        cmd += f'| makeblastdb -parse_seqids -out {self.out_dir}/{name} -hash_index -dbtype prot -title "{genus.capitalize()} {species} {infraspecies} V{version.replace("ann", "")} {collection_type.capitalize()}"'
+                        cmd = f"set -o pipefail -o errexit -o nounset; {self.sequence_source(sequence_cache, url)} | gzip -dc"  # retrieve genome and decompress
+                        cmd += f'| makeblastdb -parse_seqids -out {out_dir}/{name} -hash_index -dbtype prot -title "{genus.capitalize()} {species} {infraspecies} V{version.replace("ann", "")} {collection_type.capitalize()}"'
                         if taxid:
                             cmd += f" -taxid {taxid}"
 
                 if collection_type == "genome_alignments":  # add pair-wise paf files
                     if mode == "jbrowse":  # for jbrowse
-                        cmd = f"jbrowse add-track --assemblyNames {','.join(parent)} --out {os.path.abspath(self.out_dir)}/ {url} --force"
-                        bam_url = self.files[collection_type][dsfile].get(
-                            "bam_url", None
-                        )
+                        cmd = f"jbrowse add-track --assemblyNames {','.join(parent)} --out {os.path.abspath(out_dir)}/ {url} --force"
+                        if jbrowse_config:
+                            jbrowse_config.add_paf(url, parent)
+                        bam_url = record.bam_url
                         if bam_url:
-
+                            bam_name = bam_url.split("/")[-1]
                             cmd += f";jbrowse add-track -n {bam_name} --trackId {bam_name} -a {parent[1]}"
-                            cmd += f" --out {os.path.abspath(self.out_dir)}/ --indexFile {bam_url}.bai {bam_url} --force"  # add BAM alignment track for genome_alignments
+                            cmd += f" --out {os.path.abspath(out_dir)}/ --indexFile {bam_url}.bai {bam_url} --force"  # add BAM alignment track for genome_alignments
+                            if jbrowse_config:
+                                jbrowse_config.add_bam(bam_url, parent[1], bam_name)
                     elif mode == "blast":  # for blast
                         continue  # Not blastable at the moment
 
@@ -198,12 +487,17 @@ class ProcessCollections:
 
                     if mode == "jbrowse":  # for jbrowse
                         if url.endswith("bw"):
-                            bw_name = self.files[collection_type][dsfile].get(
-                                "name", None
-                            )
+                            bw_name = record.name
                             bw_id = bw_name.split(".")[-2:]
                             project_id = ".".join(bw_name.split(".")[1:-2])
-                            cmd = f"jbrowse add-track {url} --name {bw_id[0]} --assemblyNames {parent[0]} --category expression,{project_id} --out {os.path.abspath(self.out_dir)} --force"
+                            cmd = f"jbrowse add-track {url} --name {bw_id[0]} --assemblyNames {parent[0]} --category expression,{project_id} --out {os.path.abspath(out_dir)} --force"
+                            if jbrowse_config:
+                                jbrowse_config.add_bigwig(
+                                    url,
+                                    parent[0],
+                                    bw_id[0],
+                                    ["expression", project_id],
+                                )
 
                     elif mode == "blast":  # for blast
                         continue  # Not blastable at the moment
@@ -211,60 +505,387 @@ class ProcessCollections:
                 # MORE CANONICAL TYPES HERE
                 if not cmd:  # continue for null or incomplete objects
                     continue
+                if mode == "blast":
+                    databases.append(
+                        {
+                            "name": name,
+                            "dbtype": (
+                                "nucl" if collection_type == "genomes" else "prot"
+                            ),
+                            "genus": genus,
+                            "species": species,
+                        }
+                    )
                 if cmds_only:  # output only cmds
                     print(cmd)
+                    continue
+                if jbrowse_config:  # already added to the config in memory
+                    continue
+                md5 = self.get_checksums(url).get(url.split("/")[-1])
+                if manifest.unchanged(name, md5):  # input has not changed
+                    logger.debug(f"Skipping unchanged: {name}")
+                    continue
+                dbtype = "n" if collection_type == "genomes" else "p"
+                inputs[name] = (
+                    md5,
+                    f"{os.path.abspath(out_dir)}/{name}.{dbtype}db",
+                )
+                if journal and journal.built(
+                    mode, name, md5
+                ):  # before a resumed run died
+                    logger.debug(f"Skipping built before resuming: {name}")
+                    manifest.record(name, *inputs[name])
+                    continue
+                deps = []
+                if sequence_cache:  # downloads overlap with builds of earlier files
+                    deps.append(f"{name}.download")
+                    scheduler.add(
+                        Job(
+                            deps[0],
+                            f"download {url}",
+                            func=functools.partial(sequence_cache.fetch, url, md5),
+                            stage="download",
+                        )
+                    )
+                scheduler.add(Job(name, cmd, deps))
+        self.metrics.add_phase(
+            "build_config",
+            mode,
+            time.perf_counter() - wall,
+            time.process_time() - cpu,
+        )  # commands and config built from what the crawl found
+        if cmds_only:
+            for job in self.blast_alias_jobs(out_dir, databases):
+                print(job.cmd)
+            return []
+        if jbrowse_config:  # one write for every assembly and track
+            failed = self.index_annotation_tracks(
+                out_dir, annotations, jbrowse_config, manifest, inputs, journal_job
+            )
+            jbrowse_config.write()
+            logger.info(f"Wrote {jbrowse_config.config_path}")
+            manifest.save()
+            return failed
+        with self.metrics.phase("run_commands", mode):
+            failed = scheduler.run()
+        self.record_jobs(scheduler, mode, manifest, inputs)
+        if databases:  # group what was built, now or before, into aliases
+            aliases = JobScheduler(
+                logger,
+                workers=self.build_workers,
+                log_dir=f"{os.path.abspath(out_dir)}/logs",
+                on_finish=journal_job,
+            )
+            for job in self.blast_alias_jobs(out_dir, databases, manifest, inputs):
+                aliases.add(job)
+            with self.metrics.phase("run_commands", f"{mode}_aliases"):
+                failed += aliases.run()
+            self.record_jobs(aliases, f"{mode}_aliases", manifest, inputs)
+        manifest.save()
+        return failed
+
+    def download_cache(self, out_dir):
+        """SequenceCache for the files builds in out_dir read, sequence_cache_dir if set"""
+        return SequenceCache(
+            self.sequence_cache_dir or f"{os.path.abspath(out_dir)}/sequence_cache",
+            lambda url: self.send_request("GET", url, stream=True),
+            self.logger,
+            self.metrics,
+        )
 
-                elif subprocess.check_call(
-                    cmd, shell=True, executable="/bin/bash"
-                ):  # execute cmd and check exit value = 0
-                    logger.error(f"Non-zero exit value: {cmd}")
+    def index_annotation_tracks(
+        self, out_dir, annotations, jbrowse_config, manifest, inputs, on_finish
+    ):
+        """Points GFF3 tracks at their datastore tabix index or, with index_annotations, at a local sorted copy.
+
+        With index_annotations a trix name index of all annotations of each assembly is also built.
+        Copies and indexes are only rebuilt when the md5 of an annotation they come from changes.
+        Returns the jobs that failed.
+        """
+        logger = self.logger
+        out_dir = os.path.abspath(out_dir)
+        cache = self.download_cache(out_dir) if self.index_annotations else None
+        scheduler = JobScheduler(
+            logger,
+            workers=self.build_workers,
+            log_dir=f"{out_dir}/logs",
+            on_finish=on_finish,
+            stage_workers={"download": self.download_workers},
+        )
+
+        def add_job(name, cmd, md5, output, sources):
+            if manifest.unchanged(name, md5):
+                return
+            if self.journal and self.journal.built("jbrowse", name, md5):
+                manifest.record(name, md5, output)
+                return
+            deps = []
+            for url, url_md5 in sources:  # each file is downloaded once for all jobs
+                deps.append(f"{track_id(url)}.download")
+                if deps[-1] not in scheduler.jobs:
+                    scheduler.add(
+                        Job(
+                            deps[-1],
+                            f"download {url}",
+                            func=functools.partial(cache.fetch, url, url_md5),
+                            stage="download",
+                        )
+                    )
+            inputs[name] = (md5, output)
+            scheduler.add(Job(name, cmd, deps))
+
+        copies = {}  # tabix job name -> (url, assembly, name, location) of local copies
+        for url, assembly, track_name in annotations:
+            file_name = url.split("/")[-1]
+            checksums = self.get_checksums(url)
+            md5 = checksums.get(file_name)
+            index_type = datastore_index(file_name, checksums)
+            if index_type:  # browsers read only the regions they show
+                jbrowse_config.add_gff3(
+                    url, assembly, track_name, index_type=index_type
+                )
+                continue
+            if not cache:
+                logger.warning(
+                    f"No tbi or csi index in the CHECKSUM of {url}, add --index_annotations for an indexed copy"
+                )
+                continue
+            location = f"annotations/{file_name}"  # relative to config.json
+            copies[f"{track_id(url)}.tabix"] = (url, assembly, track_name, location)
+            add_job(
+                f"{track_id(url)}.tabix",
+                tabix_command(cache.path(url, md5), f"{out_dir}/{location}"),
+                md5,
+                f"{out_dir}/{location}.tbi",
+                [(url, md5)],
+            )
+        if not cache:
+            return []
+        assemblies = dict.fromkeys(assembly for _, assembly, _ in annotations)
+        for assembly in assemblies:  # one name index per assembly
+            if self.selection.collection_glob:  # may miss annotations of assembly
+                logger.info(
+                    f"Not rebuilt from part of its annotations: {assembly}.trix"
+                )
+                continue
+            sources = [
+                (
+                    record.url,
+                    self.get_checksums(record.url).get(record.url.split("/")[-1]),
+                )
+                for record in self.files.derived_from(assembly, "annotations")
+                if not record.url.endswith("faa.gz")
+            ]  # gene models of assembly, joined through the parent genome index
+            add_job(
+                f"{assembly}.trix",
+                trix_command(
+                    out_dir, assembly, [cache.path(url, md5) for url, md5 in sources]
+                ),
+                (
+                    group_md5(sources) if all(md5 for _, md5 in sources) else None
+                ),  # rebuilt every run if an annotation has no CHECKSUM
+                f"{out_dir}/trix/{assembly}.ix",
+                sources,
+            )
+        with self.metrics.phase("run_commands", "jbrowse_index"):
+            failed = scheduler.run()
+        self.record_jobs(scheduler, "jbrowse_index", manifest, inputs)
+        for name, (url, assembly, track_name, location) in copies.items():
+            if name in manifest.entries:  # built now or by an earlier run
+                jbrowse_config.add_gff3(url, assembly, track_name, location=location)
+        for assembly in assemblies:
+            if f"{assembly}.trix" in manifest.entries:
+                jbrowse_config.add_text_search(assembly, f"trix/{assembly}")
+        return failed
+
+    def sequence_source(self, sequence_cache, url):
+        """Shell command writing the compressed sequence file at url to stdout, from sequence_cache if set"""
+        if not sequence_cache:  # printed commands download for themselves
+            return f"curl {url}"
+        md5 = self.get_checksums(url).get(url.split("/")[-1])
+        return f"cat {sequence_cache.path(url, md5)}"
+
+    def record_jobs(self, scheduler, mode, manifest, inputs):
+        """Records the durations of the jobs scheduler ran and the inputs of those that succeeded in manifest"""
+        for name, job in scheduler.jobs.items():
+            if job.returncode is not None:  # skipped jobs never ran
+                self.metrics.observe_subprocess(
+                    f"{mode}_{job.stage}" if job.stage else mode,
+                    name,
+                    job.duration,
+                    job.returncode,
+                )
+            if job.succeeded() and name in inputs:  # record what was built
+                manifest.record(name, *inputs[name])
+
+    def blast_alias_jobs(self, out_dir, databases, manifest=None, inputs=None):
+        """Returns Jobs writing alias databases over databases per species, genus and all taxa.
+
+        Genus and all taxa aliases are also merged into volumes of merge_max_file_sz if set. With a
+        manifest only databases it records as built are grouped and aliases of unchanged groups are
+        left out, inputs is updated with the md5 and output of every job returned.
+        """
+        out_dir = os.path.abspath(out_dir)
+        if manifest:
+            databases = [
+                database
+                for database in databases
+                if database["name"] in manifest.entries
+            ]
+        jobs = []
+        levels = self.selection.alias_levels()  # groups with every member selected
+        for alias, (dbtype, title, level, members) in alias_groups(databases).items():
+            if level not in levels:
+                self.logger.info(f"Not rebuilt from part of its databases: {alias}")
+                continue
+            md5 = None  # printed commands are not compared with the manifest
+            if manifest:
+                md5 = group_md5(
+                    [(member, manifest.entries[member]["md5"]) for member in members]
+                )
+            outputs = [
+                (
+                    alias,
+                    alias_command(out_dir, alias, dbtype, title, members),
+                    md5,
+                    f"{out_dir}/{alias}.{dbtype[0]}al",
+                    [],
+                )
+            ]
+            if self.merge_max_file_sz and level != "species":
+                outputs.append(
+                    (
+                        f"{alias}.merged",
+                        merge_command(
+                            out_dir, alias, dbtype, title, self.merge_max_file_sz
+                        ),
+                        md5 and group_md5([], md5, self.merge_max_file_sz),
+                        f"{out_dir}/{alias}.merged.{dbtype[0]}db",
+                        [alias],
+                    )
+                )  # reads every sequence through the alias
+            for name, cmd, name_md5, output, deps in outputs:
+                if manifest and manifest.unchanged(name, name_md5):
+                    continue
+                if (
+                    manifest
+                    and self.journal
+                    and self.journal.built("blast", name, name_md5)
+                ):
+                    manifest.record(name, name_md5, output)
+                    continue
+                if inputs is not None:
+                    inputs[name] = (name_md5, output)
+                jobs.append(Job(name, cmd, deps))
+        return jobs
 
     def populate_jbrowse2(self, out_dir, cmds_only=False):
         """Populate jbrowse2 config object from collected objects"""
-        if out_dir:  # set output directory
-            self.out_dir = out_dir
-        pathlib.Path(self.out_dir).mkdir(parents=True, exist_ok=True)
-        self.process_collections(
-            cmds_only, "jbrowse"
-        )  # process collections for jbrowse-components
+        out_dir = out_dir or self.out_dir  # set output directory
+        pathlib.Path(out_dir).mkdir(parents=True, exist_ok=True)
+        try:
+            return self.process_collections(
+                cmds_only, "jbrowse", out_dir
+            )  # process collections for jbrowse-components
+        finally:
+            self.flush_caches()  # CHECKSUMs read while building commands
 
     def populate_blast(self, out_dir, cmds_only=False):
         """Populate a BLAST db for genome_main, mrna/mrna_primary and protein/protein_primary"""
-        if out_dir:  # set output directory
-            self.out_dir = out_dir
-        pathlib.Path(self.out_dir).mkdir(parents=True, exist_ok=True)
-        self.process_collections(
-            cmds_only, "blast"
-        )  # process collections for BLAST sequenceserver
-
-    def populate_dscensor(self, out_dir):
-        """Populate dscensor nodes for loading into a neo4j database"""
-        if out_dir:  # set output directory
-            self.out_dir = out_dir
-        pathlib.Path(self.out_dir).mkdir(parents=True, exist_ok=True)
-        self.process_collections(True, "dscensor")  # process collections for DSCensor
-        for node in self.file_objects:  # write all processed objects to node files
-            node_out = open(
-                f'{self.out_dir}/{node["filename"]}.json', "w", encoding="utf-8"
-            )  # file to write node to
-            node_out.write(json.dumps(node))
-            node_out.close()
+        out_dir = out_dir or self.out_dir  # set output directory
+        pathlib.Path(out_dir).mkdir(parents=True, exist_ok=True)
+        try:
+            return self.process_collections(
+                cmds_only, "blast", out_dir
+            )  # process collections for BLAST sequenceserver
+        finally:
+            self.flush_caches()  # CHECKSUMs read while building commands
+
+    def dscensor_nodes(self):
+        """DSCensor node of every crawled file with a url, in collection type order"""
+        return [
+            record.node()
+            for collection_type in self.collection_types
+            for record in self.files.records(collection_type)
+            if record.url
+        ]
+
+    def populate_dscensor(self, out_dir, node_format="json"):
+        """Populate dscensor nodes for loading into a neo4j database. node_format is json, ndjson or neo4j-csv"""
+        logger = self.logger
+        out_dir = out_dir or self.out_dir  # set output directory
+        pathlib.Path(out_dir).mkdir(parents=True, exist_ok=True)
+        nodes = self.metrics.timed(
+            "build_config", "dscensor", self.dscensor_nodes
+        )  # built from the crawled records when they are written
+        if node_format != "json" and self.selection.partial:
+            logger.error(
+                f"{node_format} holds every node, not written for part of the taxa"
+            )
+            return
+        if node_format == "ndjson":  # every node in one file
+            write_ndjson(nodes, f"{out_dir}/dscensor_nodes.ndjson")
+            logger.info(f"Wrote {len(nodes)} nodes to {out_dir}")
+            return
+        if node_format == "neo4j-csv":  # bulk import with neo4j-admin
+            relationships = write_neo4j_csv(
+                nodes,
+                f"{out_dir}/dscensor_nodes.csv",
+                f"{out_dir}/dscensor_derived_from.csv",
+            )
+            logger.info(
+                f"Wrote nodes and {relationships} relationships to {out_dir}. Load with: "
+                f"neo4j-admin database import full --nodes={out_dir}/dscensor_nodes.csv "
+                f"--relationships={out_dir}/dscensor_derived_from.csv --array-delimiter=';'"
+            )
+            return
+        written = 0
+        for node in nodes:  # write all processed objects to node files
+            written += write_if_changed(
+                f'{out_dir}/{node["filename"]}.json', json.dumps(node)
+            )  # unchanged nodes keep their mtime
+        logger.info(
+            f"Wrote {written} nodes to {out_dir}, {len(nodes) - written} unchanged"
+        )
+
+    def populate_all(self, nodes_out, jbrowse_out, blast_out, concurrent=False):
+        """Populate dscensor nodes, a jbrowse2 config and BLAST dbs from collections already crawled. Returns failed jobs"""
+        logger = self.logger
+        logger.info("Creating DSCensor Nodes...")
+        self.populate_dscensor(nodes_out)
+        stages = [
+            lambda: self.populate_jbrowse2(jbrowse_out),
+            lambda: self.populate_blast(blast_out),
+        ]  # builders only read what the crawl found
+        pool = None
+        if concurrent:  # jbrowse and blast each write their own out_dir
+            pool = ThreadPoolExecutor(max_workers=len(stages))
+        logger.info("Creating JBrowse2 Config and BLAST DBs...")
+        try:
+            results = self.map_workers(pool, lambda stage: stage(), stages)
+        finally:
+            if pool:
+                pool.shutdown()
+        return [job for failed in results for job in failed]
+
+    def write_metrics(self, metrics_out):
+        """Writes the run metrics as json to metrics_out and as a prometheus textfile next to it"""
+        pathlib.Path(os.path.abspath(metrics_out)).parent.mkdir(
+            parents=True, exist_ok=True
+        )
+        prom_path = self.metrics.write(metrics_out)
+        self.logger.info(f"Wrote metrics to {metrics_out} and {prom_path}")
 
     def parse_busco(self, busco_url):
         """Grab BUSCOs from remote busco_url"""
         logger = self.logger
-        busco_response = None
-        if self.from_github:
-            if os.path.isfile(busco_url):
-                busco_response = open(busco_url, encoding="utf-8").read()
-        else:
-            busco_response = self.get_remote(busco_url)
-        if not busco_response:
-            logger.debug(busco_response)
+        busco_data = self.get_metadata(
+            busco_url, busco_url, "json"
+        )  # busco_url is local in from_github mode
+        if not busco_data:
+            logger.debug(busco_data)
             return {}
-        logger.debug(f"Adding BUSCO: {busco_response}")
-        busco_data = json.loads(busco_response)
-        logger.debug(busco_data)
+        logger.debug(f"Adding BUSCO: {busco_data}")
         results = busco_data["results"]  # get stats from run for genome
         complete = float(results["Complete"] / 100)
         single_copy = float(results["Single copy"] / 100)
@@ -308,8 +929,8 @@ class ProcessCollections:
             return {"counts": gff_return, "busco": busco_return}
         return {}
 
-    def add_collections(self, collection_type, genus, species):
-        """Adds collection to self.files[collection_type] for later use"""
+    def add_collections(self, collection_type, genus, species, species_files):
+        """Adds collections to species_files[collection_type]. Returns (lines, resources) in listing order or False"""
         logger = self.logger
         logger.debug("in add_collections")
         from_github = self.from_github
@@ -320,402 +941,371 @@ class ProcessCollections:
         if from_github:
             species_url = f"{self.from_github}/{genus}/{species}"
             collections_dir = f"{species_url}/{collection_type}/"
-            if os.path.isdir(collections_dir):
+            if self.local_index.isdir(collections_dir):
                 collections_response = collections_dir
         else:
             collections_response = self.get_remote(collections_url)
         if not collections_response:  # get remote failed
             logger.debug(collections_response)
             return False
-        if collection_type not in self.files:  # add new type
-            self.files[collection_type] = {}
-        print(
-            f"  {collection_type}:", file=self.species_collections_handle
-        )  # print collection type in species collections
-        self.collections = []  # Set to empty list for use in self.parse_attributes
+        if collection_type not in species_files:  # add new type
+            species_files[collection_type] = {}
+        lines = [
+            f"  {collection_type}:"
+        ]  # print collection type in species collections
+        resources = {}  # infraspecies resources found in these collections
+        collections = []
         if from_github:
-            #            for d in os.walk(collections_dir):
-            for collection_dir in next(os.walk(collections_dir))[1]:
+            for collection_dir in self.local_index.subdirs(collections_dir):
                 collection = "/".join(collections_dir.split("/")[-4:])
-                self.collections.append(f"/{collection}{collection_dir}/")
+                collections.append(f"/{collection}{collection_dir}/")
         else:
-            self.parse_attributes(
-                collections_response
+            collections = self.parse_attributes(
+                collections_response, f"/{genus}/{species}/{collection_type}/"
             )  # Feed response from GET to populate collections
-        for collection_dir in self.collections:
-            parts = collection_dir.split("/")
-            #            print(collection_dir, parts)
-            #            ['', 'falafel', 'ctc', 'sw', 'LIS-autocontent', 'datastore-metadata', 'Arachis', 'hypogaea', 'genomes', '']
-            #            ['', 'Arachis', 'hypogaea', 'genomes', 'BaileyII.gnm1.1JTF', '']
-            #            sys.exit(1)
-            logger.debug(parts)
-            name = parts[4]
-            url = ""
-            parent = ""
-            parts = self.get_attributes(parts)
-            lookup = f"{parts[0]}.{'.'.join(name.split('.')[:-1])}"  # reference name in datastructure
-            strain_lookup = lookup.split(".")[1]  # the strain for the lookup
-            if collection_type == "genomes":  # add parent genome_main files
-                ref = ""
-                stop = 0
-                url = f"{self.datastore_url}{collection_dir}{parts[0]}.{parts[1]}.genome_main.fna.gz"  # genome_main in datastore_url
-                fai_url = f"{url}.fai"  # get fai file for jbrowse session construction
-                fai_response = self.get_remote(
-                    fai_url
-                )  # get fai file to build loc from
-                if fai_response:  # fai SUCCESS 200
-                    (ref, stop) = fai_response.split("\n")[0].split()[
-                        :2
-                    ]  # fai field 1\s+2. field 1 is sequence_id field 2 is length
-                    logger.debug(f"{ref},{stop}")
-                else:  # fai file could not be accessed
-                    logger.error(f"No fai file for: {url}")
-                    sys.exit(1)
-
-                linear_session = {  # LinearGenomeView object for JBrowse2
-                    "views": [
-                        {
-                            "assembly": lookup,
-                            "loc": f"{ref}:1-1000000",  # JBrowse2 does not allow null loc
-                            "type": "LinearGenomeView",
-                            #                                            "tracks": [
-                            #                                                " gff3tabix_genes " ,
-                            #                                                " volvox_filtered_vcf " ,
-                            #                                                " volvox_microarray " ,
-                            #                                                " volvox_cram "
-                            #                                            ]
-                        }
-                    ]
-                }
-                linear_url = f"{self.jbrowse_url}/?config=config.json&session=spec-{linear_session}"  # build the URL for the resource
-
-                linear_data = {
-                    "name": f"JBrowse2 {lookup}",
-                    "URL": str(linear_url).replace(
-                        "'", "%22"
-                    ),  # url encode for .yml file and Jekyll linking
-                    "description": "JBrowse2 Linear Genome View",
-                }  # the object that will be written into the .yml file
-
-                logger.debug(f"linear data for assembly: {linear_data} \n")
-
-                if strain_lookup not in self.infraspecies_resources:
-                    self.infraspecies_resources[strain_lookup] = (
-                        []
-                    )  # initialize infraspecies list within species
-                if self.jbrowse_url:  # dont add data if no jbrowse url set
-                    self.infraspecies_resources[strain_lookup].append(linear_data)
-                logger.debug(url)
-                busco_url = f"{self.datastore_url}{collection_dir}/BUSCO/{parts[0]}.{parts[1]}.busco.fabales_odb10.short_summary.json"
-                if from_github:
-                    busco_url = f"{self.from_github}/{collection_dir}/BUSCO/{parts[0]}.{parts[1]}.busco.fabales_odb10.short_summary.json"
-                logger.debug(busco_url)
-                genome_stats = self.parse_busco(busco_url)
-                logger.debug(genome_stats)
-                if not genome_stats:
-                    logger.debug(f"No short summary for: {busco_url}")
-                self.files[collection_type][lookup] = {
-                    "url": url,
-                    "name": lookup,
+        collections = [
+            collection_dir
+            for collection_dir in collections
+            if self.selection.collection_selected(
+                collection_dir.split("/")[4], collection_type
+            )
+        ]  # /genus/species/type/name/
+
+        def crawl_collection(collection_dir):
+            try:
+                return self.add_collection(
+                    collection_type, genus, species, collection_dir, species_files
+                )
+            except Exception as error:  # pylint: disable=broad-except
+                self.record_error(
+                    error,
+                    genus=genus,
+                    species=species,
+                    collection_type=collection_type,
+                    collection=collection_dir,
+                )  # the rest of the species is still crawled
+                return ({}, {}, [])
+
+        results = self.map_workers(
+            self.collection_pool, crawl_collection, collections
+        )  # fetch collections concurrently, results keep listing order
+        for files, collection_resources, collection_lines in results:
+            species_files[collection_type].update(files)
+            for strain, strain_resources in collection_resources.items():
+                if strain not in resources:
+                    resources[strain] = []
+                resources[strain] += strain_resources
+            lines += collection_lines
+        return (lines, resources)
+
+    def add_collection(
+        self, collection_type, genus, species, collection_dir, species_files
+    ):
+        """Fetches a single collection_dir. Returns (files, resources, lines) for add_collections to merge"""
+        logger = self.logger
+        from_github = self.from_github
+        files = {}  # files found in this collection by lookup
+        resources = {}  # infraspecies resources found in this collection
+        lines = []  # species collections lines for this collection
+        parts = collection_dir.split("/")
+        #            print(collection_dir, parts)
+        #            ['', 'falafel', 'ctc', 'sw', 'LIS-autocontent', 'datastore-metadata', 'Arachis', 'hypogaea', 'genomes', '']
+        #            ['', 'Arachis', 'hypogaea', 'genomes', 'BaileyII.gnm1.1JTF', '']
+        #            sys.exit(1)
+        logger.debug(parts)
+        name = parts[4]
+        url = ""
+        parent = ""
+        parts = self.get_attributes(parts)
+        lookup = f"{parts[0]}.{'.'.join(name.split('.')[:-1])}"  # reference name in datastructure
+        strain_lookup = lookup.split(".")[1]  # the strain for the lookup
+        if collection_type == "genomes":  # add parent genome_main files
+            ref = ""
+            stop = 0
+            url = f"{self.datastore_url}{collection_dir}{parts[0]}.{parts[1]}.genome_main.fna.gz"  # genome_main in datastore_url
+            fai_ref = self.get_fai_ref(url)  # get fai ref to build loc from
+            if fai_ref:  # fai SUCCESS 200
+                (ref, stop) = fai_ref
+                logger.debug(f"{ref},{stop}")
+            else:  # fai file could not be accessed
+                raise FileNotFoundError(f"No fai file for: {url}")
+
+            linear_session = {  # LinearGenomeView object for JBrowse2
+                "views": [
+                    {
+                        "assembly": lookup,
+                        "loc": f"{ref}:1-1000000",  # JBrowse2 does not allow null loc
+                        "type": "LinearGenomeView",
+                        #                                            "tracks": [
+                        #                                                " gff3tabix_genes " ,
+                        #                                                " volvox_filtered_vcf " ,
+                        #                                                " volvox_microarray " ,
+                        #                                                " volvox_cram "
+                        #                                            ]
+                    }
+                ]
+            }
+            linear_data = self.session_resource(
+                f"JBrowse2 {lookup}", linear_session, "JBrowse2 Linear Genome View"
+            )  # the object that will be written into the .yml file
+
+            logger.debug(f"linear data for assembly: {linear_data} \n")
+
+            if strain_lookup not in resources:
+                resources[strain_lookup] = (
+                    []
+                )  # initialize infraspecies list within species
+            if self.jbrowse_url:  # dont add data if no jbrowse url set
+                resources[strain_lookup].append(linear_data)
+            logger.debug(url)
+            busco_url = f"{self.datastore_url}{collection_dir}/BUSCO/{parts[0]}.{parts[1]}.busco.fabales_odb10.short_summary.json"
+            if from_github:
+                busco_url = f"{self.from_github}/{collection_dir}/BUSCO/{parts[0]}.{parts[1]}.busco.fabales_odb10.short_summary.json"
+            logger.debug(busco_url)
+            genome_stats = self.parse_busco(busco_url)  # BUSCO/ may be unlisted
+            logger.debug(genome_stats)
+            if not genome_stats:
+                logger.debug(f"No short summary for: {busco_url}")
+            files[lookup] = {
+                "url": url,
+                "name": lookup,
+                "parent": [parent],
+                "genus": genus,
+                "species": species,
+                "infraspecies": strain_lookup,
+                "taxid": 0,
+                "busco": genome_stats.get("busco"),
+                "counts": genome_stats.get("counts"),
+            }  # add type and lookup for object with labels, stats and buscos
+            logger.debug(files[lookup])
+        ###
+        elif (
+            collection_type == "annotations"
+        ):  # add gff3 annotation files and protein/protein_primary. genome_main parent
+            genome_lookup = ".".join(lookup.split(".")[:-1])  # genome parent prefix
+            #                self.files["genomes"][genome_lookup]["url"]
+            parent = genome_lookup
+            manifest = self.collection_manifest(
+                collection_dir
+            )  # answers which proteins exist instead of a HEAD for each
+            url = f"{self.datastore_url}{collection_dir}{parts[0]}.{parts[1]}.gene_models_main.gff3.gz"
+            busco_url = f"{self.datastore_url}{collection_dir}/BUSCO/{parts[0]}.{parts[1]}.busco.fabales_odb10.short_summary.json"
+            if from_github:
+                busco_url = f"{self.from_github}/{collection_dir}/BUSCO/{parts[0]}.{parts[1]}.busco.fabales_odb10.short_summary.json"
+            logger.debug(busco_url)
+            annotation_stats = self.parse_busco(busco_url)  # BUSCO/ may be unlisted
+            logger.debug(annotation_stats)
+            if not annotation_stats:
+                logger.debug(f"No short summary for: {busco_url}")
+            files[lookup] = {  # gene_models_main
+                "url": url,
+                "name": lookup,
+                "parent": [parent],
+                "genus": genus,
+                "species": species,
+                "infraspecies": strain_lookup,
+                "taxid": 0,
+                "busco": annotation_stats.get("busco"),
+                "counts": annotation_stats.get("counts"),
+            }  # add type and url
+            logger.debug(files[lookup])
+            protprimary_url = f"{self.datastore_url}{collection_dir}{parts[0]}.{parts[1]}.protein_primary.faa.gz"
+            protprimary_response = self.file_exists(
+                manifest, protprimary_url.rsplit("/", 1)[1]
+            )
+            if protprimary_response:
+                protprimary_lookup = f"{lookup}.protein_primary"
+                files[protprimary_lookup] = {  # protein_primary
+                    "url": protprimary_url,
+                    "name": protprimary_lookup,
                     "parent": [parent],
                     "genus": genus,
                     "species": species,
                     "infraspecies": strain_lookup,
                     "taxid": 0,
-                    "busco": genome_stats.get("busco"),
-                    "counts": genome_stats.get("counts"),
-                }  # add type and lookup for object with labels, stats and buscos
-                logger.debug(self.files[collection_type][lookup])
-            ###
-            elif (
-                collection_type == "annotations"
-            ):  # add gff3 annotation files and protein/protein_primary. genome_main parent
-                genome_lookup = ".".join(lookup.split(".")[:-1])  # genome parent prefix
-                #                self.files["genomes"][genome_lookup]["url"]
-                parent = genome_lookup
-                url = f"{self.datastore_url}{collection_dir}{parts[0]}.{parts[1]}.gene_models_main.gff3.gz"
-                busco_url = f"{self.datastore_url}{collection_dir}/BUSCO/{parts[0]}.{parts[1]}.busco.fabales_odb10.short_summary.json"
-                if from_github:
-                    busco_url = f"{self.from_github}/{collection_dir}/BUSCO/{parts[0]}.{parts[1]}.busco.fabales_odb10.short_summary.json"
-                logger.debug(busco_url)
-                annotation_stats = self.parse_busco(busco_url)
-                logger.debug(annotation_stats)
-                if not annotation_stats:
-                    logger.debug(f"No short summary for: {busco_url}")
-                self.files[collection_type][lookup] = {  # gene_models_main
-                    "url": url,
-                    "name": lookup,
+                }
+            else:
+                logger.debug(
+                    f"protein_primary failed:{protprimary_url}, {protprimary_response}"
+                )
+
+            protein_url = f"{self.datastore_url}{collection_dir}{parts[0]}.{parts[1]}.protein.faa.gz"
+            protein_response = self.file_exists(manifest, protein_url.rsplit("/", 1)[1])
+            if protein_response:
+                protein_lookup = f"{lookup}.protein"
+                files[protein_lookup] = {  # all proteins
+                    "url": protein_url,
+                    "name": protein_lookup,
                     "parent": [parent],
                     "genus": genus,
                     "species": species,
                     "infraspecies": strain_lookup,
                     "taxid": 0,
-                    "busco": annotation_stats.get("busco"),
-                    "counts": annotation_stats.get("counts"),
-                }  # add type and url
-                logger.debug(self.files[collection_type][lookup])
-                protprimary_url = f"{self.datastore_url}{collection_dir}{parts[0]}.{parts[1]}.protein_primary.faa.gz"
-                protprimary_response = self.head_remote(protprimary_url)
-                if protprimary_response:
-                    protprimary_lookup = f"{lookup}.protein_primary"
-                    self.files[collection_type][protprimary_lookup] = (
-                        {  # protein_primary
-                            "url": protprimary_url,
-                            "name": protprimary_lookup,
-                            "parent": [parent],
-                            "genus": genus,
-                            "species": species,
-                            "infraspecies": strain_lookup,
-                            "taxid": 0,
-                        }
-                    )
-                else:
-                    logger.debug(
-                        f"protein_primary failed:{protprimary_url}, {protprimary_response}"
-                    )
-
-                protein_url = f"{self.datastore_url}{collection_dir}{parts[0]}.{parts[1]}.protein.faa.gz"
-                protein_response = self.head_remote(protein_url)
-                if protein_response:
-                    protein_lookup = f"{lookup}.protein"
-                    self.files[collection_type][protein_lookup] = {  # all proteins
-                        "url": protein_url,
-                        "name": protein_lookup,
-                        "parent": [parent],
+                }
+            else:
+                logger.debug(f"protein failed:{protein_url}, {protein_response}")
+        ###
+        #            elif collection_type == "synteny":  # DEPRICATED?
+        #                checksum_url = f"{self.datastore_url}{collection_dir}CHECKSUM.{parts[1]}.md5"
+        #                checksum_response = requests.get(checksum_url)
+        #                if checksum_response.status_code == 200:
+        #                    continue
+        #                else:  # CheckSum FAILURE
+        #                    logger.debug(
+        #                        f"GET Failed for checksum {checksum_response.status_code} {checksum_url}"
+        #                    )
+        ###
+        elif (
+            collection_type == "genome_alignments"
+        ):  # Synteny after the new changes. Parent is a tuple with both genome_main files
+            manifest = self.collection_manifest(collection_dir)
+            logger.debug(manifest.checksums)
+            if manifest.checksums:  # checksum SUCCESS 200
+                for listed in manifest.names("paf.gz"):  # get paf file
+                    logger.debug(listed)
+                    paf_lookup = listed  # paf file to load
+                    logger.debug(paf_lookup)
+                    paf_url = f"{self.datastore_url}{collection_dir}{paf_lookup}"  # where the paf file is in the datastore
+                    paf_parts = paf_lookup.split(
+                        "."
+                    )  # split the paf file name into parts delimited by '.'
+                    parent1 = ".".join(paf_parts[:3])  # parent 1 in pair-wise alignment
+                    parent2 = ".".join(
+                        paf_parts[4:7]
+                    )  # parent 2 in pair-wise alignment
+                    files[paf_lookup] = {
+                        "url": paf_url,
+                        "name": paf_lookup,
+                        "parent": [parent2, parent1],
                         "genus": genus,
                         "species": species,
                         "infraspecies": strain_lookup,
                         "taxid": 0,
+                        "bam_url": paf_url.replace("paf.gz", "bam"),
                     }
-                else:
-                    logger.debug(f"protein failed:{protein_url}, {protein_response}")
-            ###
-            #            elif collection_type == "synteny":  # DEPRICATED?
-            #                checksum_url = f"{self.datastore_url}{collection_dir}CHECKSUM.{parts[1]}.md5"
-            #                checksum_response = requests.get(checksum_url)
-            #                if checksum_response.status_code == 200:
-            #                    continue
-            #                else:  # CheckSum FAILURE
-            #                    logger.debug(
-            #                        f"GET Failed for checksum {checksum_response.status_code} {checksum_url}"
-            #                    )
-            ###
-            elif (
-                collection_type == "genome_alignments"
-            ):  # Synteny after the new changes. Parent is a tuple with both genome_main files
-                checksum_url = (
-                    f"{self.datastore_url}{collection_dir}CHECKSUM.{parts[1]}.md5"
-                )
-                checksum_response = None
-                if from_github:
-                    checksum_response = open(
-                        f"{self.from_github}/{collection_dir}CHECKSUM.{parts[1]}.md5",
-                        encoding="utf-8",
-                    ).read()
-                else:
-                    checksum_response = self.get_remote(checksum_url)
-                logger.debug(checksum_response)
-                if checksum_response:  # checksum SUCCESS 200
-                    for line in checksum_response.split("\n"):
-                        logger.debug(line)
-                        fields = line.split()
-                        if fields:  # process if fields exists
-                            if fields[1].endswith("paf.gz"):  # get paf file
-                                paf_lookup = fields[1].replace(
-                                    "./", ""
-                                )  # get paf file to load will start with ./
-                                logger.debug(paf_lookup)
-                                paf_url = f"{self.datastore_url}{collection_dir}{paf_lookup}"  # where the paf file is in the datastore
-                                paf_parts = paf_lookup.split(
-                                    "."
-                                )  # split the paf file name into parts delimited by '.'
-                                parent1 = ".".join(
-                                    paf_parts[:3]
-                                )  # parent 1 in pair-wise alignment
-                                parent2 = ".".join(
-                                    paf_parts[4:7]
-                                )  # parent 2 in pair-wise alignment
-                                self.files[collection_type][paf_lookup] = {
-                                    "url": paf_url,
-                                    "name": paf_lookup,
-                                    "parent": [parent2, parent1],
-                                    "genus": genus,
-                                    "species": species,
-                                    "infraspecies": strain_lookup,
-                                    "taxid": 0,
-                                    "bam_url": paf_url.replace("paf.gz", "bam"),
-                                }
-                                logger.debug(self.files[collection_type][paf_lookup])
-                                dotplot_view = {  # session object for jbrowse2 dotplot view populate below with parent1 and parent2
-                                    "views": [
-                                        {
-                                            "type": "DotplotView",
-                                            "views": [
-                                                {"assembly": parent1},
-                                                {"assembly": parent2},
-                                            ],
-                                            "tracks": [paf_lookup.replace(".gz", "")],
-                                        }
-                                    ]
-                                }
-                                dotplot_url = f"{self.jbrowse_url}/?config=config.json&session=spec-{dotplot_view}"  # build the URL for the resource
-                                dotplot_data = {
-                                    "name": f"JBrowse2 {paf_lookup}",
-                                    "URL": str(dotplot_url).replace(
-                                        "'", "%22"
-                                    ),  # url encode for .yml file and Jekyll linking
-                                    "description": "JBrowse2 Dotplot View",
-                                }  # the object that will be written into the .yml file
-                                if strain_lookup not in self.infraspecies_resources:
-                                    self.infraspecies_resources[strain_lookup] = (
-                                        []
-                                    )  # initialize infraspecies list within species
-                                if (
-                                    self.jbrowse_url
-                                ):  # dont add data if no jbrowse url set
-                                    self.infraspecies_resources[strain_lookup].append(
-                                        dotplot_data
-                                    )  # add data for later writing in resources
-            ###
-            elif collection_type == "expression":  # add parent expr files
-                ref = ""
-                # Synteny after the new changes. Parent is a tuple with both genome_main files
-                checksum_url = (
-                    f"{self.datastore_url}{collection_dir}CHECKSUM.{parts[1]}.md5"
-                )
-                # print('\nchecksum_url: ', checksum_url,'\n')
-                checksum_response = None
-                if from_github:
-                    checksum_response = open(
-                        f"{self.from_github}/{collection_dir}CHECKSUM.{parts[1]}.md5",
-                        encoding="utf-8",
-                    ).read()
-                else:
-                    checksum_response = self.get_remote(checksum_url)
-                logger.debug(checksum_response)
-                # print('\nchecksum_response: ', checksum_response,'\n')
-                if checksum_response:  # checksum SUCCESS 200
-                    for line in checksum_response.split("\n"):
-                        logger.debug(line)
-                        fields = line.split()
-                        if fields:  # process if fields exists
-                            if fields[1].endswith("bw"):  # get bw file
-                                ref = ""
-                                stop = 0
-                                bw_lookup = fields[1].replace(
-                                    "./", ""
-                                )  # get bw file to load will start with ./
-                                logger.debug(bw_lookup)
-                                bw_url = f"{self.datastore_url}{collection_dir}{bw_lookup}"  # where the bigwig file is in the datastore
-                                bw_parts = bw_lookup.split(
-                                    "."
-                                )  # split the bw file name into parts delimited by '.'
-                                genome_lookup = ".".join(
-                                    lookup.split(".")[:-3]
-                                )  # genome parent prefix
-                                #               self.files["genomes"][genome_lookup]["url"]
-                                parent = genome_lookup
-                                self.files[collection_type][bw_lookup] = {
-                                    "url": bw_url,
-                                    "name": bw_lookup,
-                                    "genus": genus,
-                                    "parent": [parent],
-                                    "species": species,
-                                    "infraspecies": strain_lookup,
-                                    "taxid": 0,
-                                }
-                                logger.debug(self.files[collection_type][bw_lookup])
-
-                                # url =  f"{self.datastore_url}{collection_dir}{parts[0]}.{parts[1]}.genome_main.fna.gz"  # genome_main in datastore_url
-                                url = self.files["genomes"][parent]["url"]
-                                fai_url = f"{url}.fai"  # get fai file for jbrowse session construction
-                                fai_response = self.get_remote(
-                                    fai_url
-                                )  # get fai file to build loc from
-                                if fai_response:  # fai SUCCESS 200
-                                    (ref, stop) = fai_response.split("\n")[0].split()[
-                                        :2
-                                    ]  # fai field 1\s+2. field 1 is sequence_id field 2 is length
-                                    logger.debug(f"{ref},{stop}")
-                                else:  # fai file could not be accessed
-                                    logger.error(f"No fai file for: {url}")
-                                    sys.exit(1)
-
-                                linear_session = {  # LinearGenomeView object for JBrowse2
-                                    "views": [
-                                        {
-                                            "assembly": parent,
-                                            # sequence is currently hardcoded, don't know how "ref" works for genomes
-                                            "loc": f"{ref}:1-{stop}",  # JBrowse2 does not allow null loc
-                                            "type": "LinearGenomeView",
-                                            "tracks": [
-                                                ".".join(bw_lookup.split(".")[:-1])
-                                            ],
-                                            # ["glyma.Wm82.gnm6.ann1.expr.mixed.Kour_Boone_2014.Clark_defective"]
-                                            #                                                " gff3tabix_genes " ,
-                                            #                                                " volvox_filtered_vcf " ,
-                                            #                                                " volvox_microarray " ,
-                                            #                                                " volvox_cram "
-                                            #                                            ]
-                                        }
-                                    ]
-                                }
-                                linear_url = f"{self.jbrowse_url}/?config=config.json&session=spec-{linear_session}"  # build the URL for the resource
-
-                                linear_data = {
-                                    "name": f"JBrowse2 {parent}",
-                                    "URL": str(linear_url).replace(
-                                        "'", "%22"
-                                    ),  # url encode for .yml file and Jekyll linking
-                                    "description": "JBrowse2 Linear Genome View",
-                                }  # the object that will be written into the .yml file
-
-                                if strain_lookup not in self.infraspecies_resources:
-                                    self.infraspecies_resources[strain_lookup] = (
-                                        []
-                                    )  # initialize infraspecies list within species
-                                if (
-                                    self.jbrowse_url
-                                ):  # dont add data if no jbrowse url set
-                                    self.infraspecies_resources[strain_lookup].append(
-                                        linear_data
-                                    )
-                                logger.debug(f"linear data for bw: {linear_data} \n")
-            ###
-
-            readme_url = f"{self.datastore_url}/{collection_dir}README.{name}.yml"  # species collection readme
-            readme_response = None
-            if from_github:
-                github_readme = f"{self.from_github}/{collection_dir}README.{name}.yml"
-                if os.path.isfile(github_readme):
-                    readme_response = open(github_readme, encoding="utf-8").read()
+                    logger.debug(files[paf_lookup])
+                    dotplot_view = {  # session object for jbrowse2 dotplot view populate below with parent1 and parent2
+                        "views": [
+                            {
+                                "type": "DotplotView",
+                                "views": [
+                                    {"assembly": parent1},
+                                    {"assembly": parent2},
+                                ],
+                                "tracks": [paf_lookup.replace(".gz", "")],
+                            }
+                        ]
+                    }
+                    dotplot_data = self.session_resource(
+                        f"JBrowse2 {paf_lookup}",
+                        dotplot_view,
+                        "JBrowse2 Dotplot View",
+                    )  # the object that will be written into the .yml file
+                    if strain_lookup not in resources:
+                        resources[strain_lookup] = (
+                            []
+                        )  # initialize infraspecies list within species
+                    if self.jbrowse_url:  # dont add data if no jbrowse url set
+                        resources[strain_lookup].append(
+                            dotplot_data
+                        )  # add data for later writing in resources
+        ###
+        elif collection_type == "expression":  # add parent expr files
+            ref = ""
+            # Synteny after the new changes. Parent is a tuple with both genome_main files
+            manifest = self.collection_manifest(collection_dir)
+            logger.debug(manifest.checksums)
+            if manifest.checksums:  # checksum SUCCESS 200
+                for listed in manifest.names("bw"):  # get bw file
+                    logger.debug(listed)
+                    ref = ""
+                    stop = 0
+                    bw_lookup = listed  # bw file to load
+                    logger.debug(bw_lookup)
+                    bw_url = f"{self.datastore_url}{collection_dir}{bw_lookup}"  # where the bigwig file is in the datastore
+                    genome_lookup = ".".join(
+                        lookup.split(".")[:-3]
+                    )  # genome parent prefix
+                    #               self.files["genomes"][genome_lookup]["url"]
+                    parent = genome_lookup
+                    files[bw_lookup] = {
+                        "url": bw_url,
+                        "name": bw_lookup,
+                        "genus": genus,
+                        "parent": [parent],
+                        "species": species,
+                        "infraspecies": strain_lookup,
+                        "taxid": 0,
+                    }
+                    logger.debug(files[bw_lookup])
+
+                    # url =  f"{self.datastore_url}{collection_dir}{parts[0]}.{parts[1]}.genome_main.fna.gz"  # genome_main in datastore_url
+                    genome = species_files.get("genomes", {}).get(parent)
+                    if not genome:  # bigwigs are shown on their genome
+                        raise LookupError(f"No genome {parent} for: {bw_url}")
+                    url = genome["url"]
+                    fai_ref = self.get_fai_ref(url)  # same genome fai for every bigwig
+                    if fai_ref:  # fai SUCCESS 200
+                        (ref, stop) = fai_ref
+                        logger.debug(f"{ref},{stop}")
+                    else:  # fai file could not be accessed
+                        raise FileNotFoundError(f"No fai file for: {url}")
+
+                    linear_session = {  # LinearGenomeView object for JBrowse2
+                        "views": [
+                            {
+                                "assembly": parent,
+                                # sequence is currently hardcoded, don't know how "ref" works for genomes
+                                "loc": f"{ref}:1-{stop}",  # JBrowse2 does not allow null loc
+                                "type": "LinearGenomeView",
+                                "tracks": [".".join(bw_lookup.split(".")[:-1])],
+                                # ["glyma.Wm82.gnm6.ann1.expr.mixed.Kour_Boone_2014.Clark_defective"]
+                                #                                                " gff3tabix_genes " ,
+                                #                                                " volvox_filtered_vcf " ,
+                                #                                                " volvox_microarray " ,
+                                #                                                " volvox_cram "
+                                #                                            ]
+                            }
+                        ]
+                    }
+                    linear_data = self.session_resource(
+                        f"JBrowse2 {parent}",
+                        linear_session,
+                        "JBrowse2 Linear Genome View",
+                    )  # the object that will be written into the .yml file
+
+                    if strain_lookup not in resources:
+                        resources[strain_lookup] = (
+                            []
+                        )  # initialize infraspecies list within species
+                    if self.jbrowse_url:  # dont add data if no jbrowse url set
+                        resources[strain_lookup].append(linear_data)
+                    logger.debug(f"linear data for bw: {linear_data} \n")
+        ###
+
+        readme_url = f"{self.datastore_url}/{collection_dir}README.{name}.yml"  # species collection readme
+        github_readme = f"{self.from_github}/{collection_dir}README.{name}.yml"
+        readme = self.get_metadata(
+            readme_url, github_readme
+        )  # fetched even if the CHECKSUM does not list it, a 404 is no readme
+        if readme:  # readme get success
+            logger.debug(readme)
+            synopsis = readme["synopsis"]
+            taxid = readme["taxid"]
+            if lookup in files:
+                files[lookup][
+                    "taxid"
+                ] = taxid  # set taxid if available for this file object
             else:
-                readme_response = self.get_remote(readme_url)
-            if readme_response:  # readme get success
-                readme = yaml.load(readme_response, Loader=yaml.FullLoader)
-                logger.debug(readme)
-                synopsis = readme["synopsis"]
-                taxid = readme["taxid"]
-                if lookup in self.files[collection_type]:
-                    self.files[collection_type][lookup][
-                        "taxid"
-                    ] = taxid  # set taxid if available for this file object
-                else:
-                    logger.debug(f"{lookup} not in {self.files[collection_type]}")
-                print(
-                    f"    - collection: {name}",
-                    file=self.species_collections_handle,
-                )
-                print(
-                    f'      synopsis: "{synopsis}"',
-                    file=self.species_collections_handle,
-                )
-            else:  # get failed for
-                logger.debug(f"GET Failed for README {readme_url}")
-        return True
+                logger.debug(f"{lookup} not in {files}")
+            lines.append(f"    - collection: {name}")
+            lines.append(f'      synopsis: "{synopsis}"')
+        else:  # get failed for
+            logger.debug(f"GET Failed for README {readme_url}")
+        return (files, resources, lines)
 
     def process_species(self, genus, species):
-        """Process species and genus from genus_description object"""
+        """Process species and genus from genus_description object. Returns (species_files, lines, species_description, infraspecies_resources)"""
         logger = self.logger
         logger.debug("in process_species")
         from_github = self.from_github
@@ -724,104 +1314,192 @@ class ProcessCollections:
         else:
             logger.info(f"Searching {self.datastore_url} for: {genus} {species}")
         species_url = f"{self.datastore_url}/{genus}/{species}"
-        self.infraspecies_resources = {}
-        print(f"- name: {species}", file=self.species_collections_handle)
+        species_files = {}  # files found for this species by collection type
+        infraspecies_resources = {}  # used to track all "strains"
+        lines = [f"- name: {species}"]  # species collections lines for this species
 
-        for (
-            collection_type
-        ) in (
-            self.collection_types
+        for collection_type in filter(
+            self.selection.type_selected, self.collection_types
         ):  # iterate through collections found in the datastore
-            self.add_collections(collection_type, genus, species)
+            journaled = (
+                self.journal.collection_types.get((genus, species, collection_type))
+                if self.journal
+                else None
+            )
+            if journaled:  # crawled by the run being resumed
+                species_files[collection_type] = self.selection.select_files(
+                    {collection_type: journaled[0]}
+                )[collection_type]
+                added = journaled[1:]
+            else:
+                added = self.metrics.timed(
+                    "crawl_collection_type",
+                    collection_type,
+                    self.add_collections,
+                    collection_type,
+                    genus,
+                    species,
+                    species_files,
+                )  # types are added in order as expression needs its parent genomes
+                if (
+                    added
+                    and self.journal
+                    and not self.selection.collection_glob  # only part of the type
+                    and not self.has_errors(
+                        genus=genus, species=species, collection_type=collection_type
+                    )
+                ):
+                    self.journal.add_collection_type(
+                        genus,
+                        species,
+                        collection_type,
+                        species_files[collection_type],
+                        *added,
+                    )
+            if not added:
+                continue
+            lines += added[0]
+            for strain, resources in added[1].items():
+                if strain not in infraspecies_resources:
+                    infraspecies_resources[strain] = []
+                infraspecies_resources[strain] += resources
 
         species_description_url = f"{species_url}/about_this_collection/description_{genus}_{species}.yml"  # parse for strain resources
         logger.debug(species_description_url)  # get species description url
-        species_description_response = None
-        if from_github:
-            species_description_response = open(
-                f"{from_github}/{genus}/{species}/about_this_collection/description_{genus}_{species}.yml",
-                encoding="utf-8",
-            ).read()
-        else:
-            species_description_response = self.get_remote(species_description_url)
-        if (
-            species_description_response
-        ):  # Read species description yml and add jbrowse resources to "strains"
-            species_description = yaml.load(
-                species_description_response, Loader=yaml.FullLoader
-            )  # load the yaml from the datastore for species
-            count = 0
-            for strain in species_description[
-                "strains"
-            ]:  # iterate through all strains in this species description
-                if (
-                    strain["identifier"] in self.infraspecies_resources
-                ):  # add to this strain
-                    if species_description["strains"][count].get(
-                        "resources", None
-                    ):  # this strain has resources
-                        for resource in self.infraspecies_resources[
-                            strain["identifier"]
-                        ]:  # append all the resources to the existing
-                            species_description["strains"][count]["resources"].append(
-                                resource
-                            )
-                    else:
-                        species_description["strains"][count]["resources"] = (
-                            self.infraspecies_resources[strain["identifier"]]
-                        )  # set resources
-                count += 1  # keep track of how many "strains" we have seen
-            self.species_descriptions.append(species_description)
+        species_description = self.get_metadata(
+            species_description_url,
+            f"{from_github}/{genus}/{species}/about_this_collection/description_{genus}_{species}.yml",
+        )  # load the yaml from the datastore for species
+        return (species_files, lines, species_description, infraspecies_resources)
 
-    def process_taxon(self, taxon):
-        """Retrieve and output collections for jekyll site"""
+    def session_resource(self, name, spec, description):
+        """Resource linking to the JBrowse2 session spec"""
+        return {
+            "name": name,
+            "URL": session_url(self.jbrowse_url, spec),  # JSON and url encoded
+            "description": description,
+        }
+
+    def add_resources(self, species_description, infraspecies_resources):
+        """Adds jbrowse resources found for each strain to "strains" in species_description"""
+        count = 0
+        for strain in species_description[
+            "strains"
+        ]:  # iterate through all strains in this species description
+            if strain["identifier"] in infraspecies_resources:  # add to this strain
+                if species_description["strains"][count].get(
+                    "resources", None
+                ):  # this strain has resources
+                    for resource in infraspecies_resources[
+                        strain["identifier"]
+                    ]:  # append all the resources to the existing
+                        species_description["strains"][count]["resources"].append(
+                            resource
+                        )
+                else:
+                    species_description["strains"][count]["resources"] = (
+                        infraspecies_resources[strain["identifier"]]
+                    )  # set resources
+            count += 1  # keep track of how many "strains" we have seen
+
+    def crawl_taxon(self, taxon):
+        """Retrieve the genus description and collections of every species for taxon. Returns (genus, genus_description, species_results)"""
         logger = self.logger
         from_github = self.from_github
-        logger.debug(f"in process_taxon {from_github}")
+        logger.debug(f"in crawl_taxon {from_github}")
         if not "genus" in taxon:  # genus required for all taxon
-            logger.error(f"Genus not found for: {taxon}")
-            sys.exit(1)
+            self.record_error(KeyError("genus"), taxon=str(taxon))
+            return (None, None, [])
         genus = taxon["genus"]
         genus_description_url = f"{self.datastore_url}/{genus}/GENUS/about_this_collection/description_{genus}.yml"  # genus description to be read
-        genus_description_response = None
         if from_github:  # if build locally from github clone of datastore-metadata
-            genus_description_response = open(
-                f"{self.from_github}/{genus}/GENUS/about_this_collection/description_{genus}.yml",
-                encoding="utf-8",
-            ).read()
+            self.local_index.add_tree(
+                f"{self.from_github}/{genus}"
+            )  # one walk of the genus instead of a stat per file
+        journal = self.journal
+        if journal and genus in journal.genera:  # crawled by the run being resumed
+            genus_description = journal.genera[genus]
         else:
-            genus_description_response = self.get_remote(genus_description_url)
-        logger.debug(genus_description_response)
+            genus_description = self.get_metadata(
+                genus_description_url,
+                f"{self.from_github}/{genus}/GENUS/about_this_collection/description_{genus}.yml",
+            )  # load yml into python object
+            if journal and genus_description:
+                journal.add_genus(genus, genus_description)
+        logger.debug(genus_description)
+        if not genus_description:  # nothing to write for this genus
+            return (genus, None, [])
+        species_results = self.map_workers(
+            self.species_pool,
+            lambda species: self.crawl_species(genus, species),
+            [
+                species
+                for species in genus_description["species"]
+                if self.selection.species_selected(species)
+            ],
+        )  # process all species in the genus concurrently
+        return (
+            genus,
+            genus_description,
+            [result for result in species_results if result],
+        )  # species that failed are left out
+
+    def crawl_species(self, genus, species):
+        """Returns (species,) + process_species results, replayed from the journal when resuming, or None after an error"""
+        journal = self.journal
+        if journal and (genus, species) in journal.species:
+            (replayed,) = self.select_results(
+                [(species,) + journal.species[(genus, species)]]
+            )  # a full species, limited to the selected collections
+            return replayed
+        try:
+            result = self.metrics.timed(
+                "crawl_species",
+                f"{genus} {species}",
+                self.process_species,
+                genus,
+                species,
+            )
+        except Exception as error:  # pylint: disable=broad-except
+            self.record_error(error, genus=genus, species=species)
+            return None
+        if (
+            journal
+            and self.selection.whole_genera
+            and not self.has_errors(genus=genus, species=species)
+        ):  # part of a species is not journaled as done
+            journal.add_species(genus, species, *result)  # before write_taxon edits it
+        return (species,) + result
+
+    def write_taxon(self, genus, genus_description, species_results):
+        """Output collections for jekyll site and add files for genus from crawl_taxon or a snapshot"""
+        logger = self.logger
         self.genus_resources_handle = None  # yaml file to write for genus resources
         self.species_resources_handle = None  # yaml file to write for species resources
         self.species_collections_handle = (
             None  # yaml file to write for species collections
         )
-        if genus_description_response:  # Genus Description yml 200 SUCCESS
+        if genus_description:  # Genus Description yml 200 SUCCESS
             species_collections_filename = None
             self.species_descriptions = []  # null for current taxon genus
-            genus_description = yaml.load(
-                genus_description_response, Loader=yaml.FullLoader
-            )  # load yml into python object
             collection_dir = f"{os.path.abspath(self.out_dir)}/{genus}"
-            pathlib.Path(collection_dir).mkdir(
-                parents=True, exist_ok=True
-            )  # make output dirs if they dont exist
+            if self.selection.whole_genera:
+                pathlib.Path(collection_dir).mkdir(
+                    parents=True, exist_ok=True
+                )  # make output dirs if they dont exist
+            else:
+                logger.info(f"Collections of {genus} not written for part of the genus")
             genus_resources_filename = f"{collection_dir}/genus_resources.yml"  # local file to write genus resources
             species_resources_filename = f"{collection_dir}/species_resources.yml"  # local file to write species resources
             species_collections_filename = f"{collection_dir}/species_collections.yml"  # local file to write collections
-            self.species_collections_handle = open(
-                species_collections_filename, "w", encoding="utf-8"
-            )
-            self.genus_resources_handle = open(
-                genus_resources_filename, "w", encoding="utf-8"
-            )
-            self.species_resources_handle = open(
-                species_resources_filename, "w", encoding="utf-8"
-            )
+            self.species_collections_handle = (
+                io.StringIO()
+            )  # written by write_if_changed
+            self.genus_resources_handle = io.StringIO()
+            self.species_resources_handle = io.StringIO()
             collection_string = "---\nspecies:"
             print("---", file=self.genus_resources_handle)  # write genus resources
-            yaml.dump(
+            dump_yaml(
                 genus_description, self.genus_resources_handle
             )  # dump full description of genus
             print(
@@ -831,35 +1509,304 @@ class ProcessCollections:
                 collection_string, file=self.species_resources_handle
             )  # write species resources
 
-            for species in genus_description[
-                "species"
-            ]:  # iterate through all species in the genus
-                self.process_species(
-                    genus, species
-                )  # process species and genus to populate self.species_descriptions
+            for (
+                _,
+                species_files,
+                lines,
+                species_description,
+                infraspecies_resources,
+            ) in species_results:
+                for (
+                    collection_type,
+                    files,
+                ) in species_files.items():  # merge in species order
+                    self.files.add(collection_type, files)
+                print(
+                    "\n".join(lines), file=self.species_collections_handle
+                )  # write species collection
+                if species_description:
+                    self.add_resources(species_description, infraspecies_resources)
+                    self.species_descriptions.append(species_description)
 
-            yaml.dump(
+            dump_yaml(
                 self.species_descriptions, self.species_resources_handle
             )  # dump species_resources.yml locally with all self.species_descriptions from genus
-        if self.genus_resources_handle:  # close genus resources
-            self.genus_resources_handle.close()
-        if self.species_resources_handle:  # close species resources
-            self.species_resources_handle.close()
-        if self.species_collections_handle:  # close species collections
-            self.species_collections_handle.close()
+            for filename, handle in (
+                (genus_resources_filename, self.genus_resources_handle),
+                (species_resources_filename, self.species_resources_handle),
+                (species_collections_filename, self.species_collections_handle),
+            ):
+                if not self.selection.whole_genera:  # would drop what was not selected
+                    handle.close()
+                    continue
+                if not write_if_changed(filename, handle.getvalue()):
+                    logger.debug(f"Unchanged: {filename}")
+                    self.unchanged_outputs += 1  # keeps its mtime for jekyll
+                handle.close()
+
+    def store_taxon(self, genus, genus_description, species_results):
+        """Writes a crawled taxon, or only stores it when writing a snapshot"""
+        if self.snapshot:  # store for populate commands to read later
+            if genus_description:
+                self.snapshot.add_taxon(genus, genus_description, species_results)
+            return
+        self.metrics.timed(
+            "write_taxon",
+            genus,
+            self.write_taxon,
+            genus,
+            genus_description,
+            species_results,
+        )
+
+    def process_taxon(self, taxon):
+        """Retrieve and output collections for jekyll site"""
+        self.store_taxon(
+            *self.metrics.timed(
+                "crawl_genus", taxon.get("genus", ""), self.crawl_taxon, taxon
+            )
+        )
+
+    def start_pools(self):
+        """Creates the species and collection thread pools if crawling with more than one worker"""
+        if self.workers > 1:  # crawl species and collections concurrently
+            self.species_pool = ThreadPoolExecutor(max_workers=self.workers)
+            self.collection_pool = ThreadPoolExecutor(max_workers=self.workers)
+
+    def stop_pools(self):
+        """Shuts down the thread pools from start_pools"""
+        for pool in (self.species_pool, self.collection_pool):
+            if pool:
+                pool.shutdown()
+        self.species_pool = None
+        self.collection_pool = None
+
+    def flush_caches(self):
+        """Commits the parsed documents and responses cached so far for the next run"""
+        self.metadata.flush()
+        if self.cache:
+            self.cache.flush()
+
+    def select_taxa(self, taxon_list):
+        """Taxa of taxon_list in a selected genus. Taxa without a genus are kept to be reported"""
+        logger = self.logger
+        if self.selection.partial:
+            logger.info(f"Only crawling and building: {self.selection}")
+        return [
+            taxon
+            for taxon in taxon_list
+            if "genus" not in taxon or self.selection.genus_selected(taxon["genus"])
+        ]
+
+    def select_results(self, species_results):
+        """species_results of a snapshot limited to the selection"""
+        return [
+            (species, self.selection.select_files(species_files)) + tuple(rest)
+            for species, species_files, *rest in species_results
+            if self.selection.species_selected(species)
+        ]
 
     def parse_collections(
         self, target="../_data/taxon_list.yml", from_github="./datastore-metadata"
     ):  # refactored from SammyJava
         """Retrieve and output collections for jekyll site"""
+        logger = self.logger
         if from_github:  # set to None if empty dir
             self.from_github = os.path.abspath(from_github)
-        self.logger.debug(f"THIS IS GITHUB: {self.from_github}")
-        taxon_list = yaml.load(
-            open(target, "r", encoding="utf-8").read(), Loader=yaml.FullLoader
+        logger.debug(f"THIS IS GITHUB: {self.from_github}")
+        taxon_list = self.select_taxa(
+            load_yaml(open(target, "r", encoding="utf-8").read())
         )  # load taxon list
-        for taxon in taxon_list:
-            self.process_taxon(taxon)  # process taxon object
+        if self.jobs > 1:  # crawl genera in worker processes
+            settings = {
+                "logger": logger,
+                "datastore_url": self.datastore_url,
+                "jbrowse_url": self.jbrowse_url,
+                "workers": self.workers,
+                "cache_dir": self.cache_dir,
+                "cache_ttl": self.cache_ttl,
+                "retries": self.retries,
+                "selection": self.selection,
+            }  # what each worker needs to crawl like this instance
+            with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                crawls = [
+                    self.replay_taxon(taxon)
+                    or pool.submit(
+                        crawl_genus,
+                        settings,
+                        self.from_github,
+                        taxon,
+                        bool(self.journal),
+                    )
+                    for taxon in taxon_list
+                ]  # genera finished by the run being resumed are not crawled again
+                for crawl in crawls:  # taxon list order like a serial run
+                    if isinstance(crawl, tuple):
+                        self.store_taxon(*crawl)
+                        continue
+                    (
+                        genus,
+                        genus_description,
+                        species_results,
+                        fai_refs,
+                        checksums,
+                        metrics,
+                        errors,
+                        recorded,
+                    ) = crawl.result()
+                    self.fai_refs.update(fai_refs)
+                    self.checksums.update(checksums)
+                    self.metrics.merge(metrics)  # timings from the worker
+                    self.journal_taxon(errors, recorded)
+                    self.store_taxon(genus, genus_description, species_results)
+        else:
+            self.start_pools()
+            try:
+                for taxon in taxon_list:
+                    self.process_taxon(taxon)  # process taxon object
+            finally:
+                self.stop_pools()
+                self.flush_caches()
+        if not self.snapshot:
+            logger.info(f"{self.unchanged_outputs} unchanged files in {self.out_dir}")
+        if self.errors:
+            logger.error(
+                f"{len(self.errors)} collections or taxa were skipped after errors, rerun with --resume to retry only those"
+            )
+
+    def replay_taxon(self, taxon):
+        """Returns crawl_taxon results for taxon from the journal if the genus and all of its species are in it, else None"""
+        journal = self.journal
+        genus = taxon.get("genus")
+        if not journal or genus not in journal.genera:
+            return None
+        genus_description = journal.genera[genus]
+        species_results = []
+        for species in filter(
+            self.selection.species_selected, genus_description["species"]
+        ):
+            if (genus, species) not in journal.species:
+                return None
+            species_results.append((species,) + journal.species[(genus, species)])
+        return (genus, genus_description, self.select_results(species_results))
+
+    def journal_taxon(self, errors, recorded):
+        """Keeps errors from a worker process and journals the records it wrote"""
+        with self.errors_lock:
+            self.errors += errors
+        if self.journal:
+            self.journal.add_recorded(recorded)
+
+    def create_snapshot(
+        self,
+        snapshot_path,
+        target="../_data/taxon_list.yml",
+        from_github="./datastore-metadata",
+    ):
+        """Crawl taxa in target once and store everything found in the sqlite file snapshot_path"""
+        logger = self.logger
+        self.snapshot = DatastoreSnapshot(snapshot_path)
+        try:
+            self.snapshot.reset(self.datastore_url, self.jbrowse_url)
+            self.parse_collections(target, from_github)  # stores taxa in the snapshot
+            urls = (
+                {}
+            )  # one file url per collection to read its CHECKSUM for populate-blast
+            for genus in self.snapshot.genera():
+                for species_result in self.snapshot.taxon(genus)[1]:
+                    for files in species_result[1].values():
+                        for record in files.values():
+                            urls[record["url"].rsplit("/", 1)[0]] = record["url"]
+            pool = None
+            if self.workers > 1:
+                pool = ThreadPoolExecutor(max_workers=self.workers)
+            try:
+                self.map_workers(pool, self.get_checksums, list(urls.values()))
+            finally:
+                if pool:
+                    pool.shutdown()
+                self.flush_caches()
+            self.snapshot.add_fai_refs(self.fai_refs)
+            self.snapshot.add_checksums(self.checksums)
+            logger.info(f"Wrote snapshot of {len(urls)} collections to {snapshot_path}")
+        finally:
+            self.snapshot.close()
+            self.snapshot = None
+
+    def load_snapshot(self, snapshot_path, target="../_data/taxon_list.yml"):
+        """Output collections and add files for the taxa in target from snapshot_path instead of crawling"""
+        logger = self.logger
+        snapshot = DatastoreSnapshot(snapshot_path)
+        try:
+            meta = snapshot.meta()
+            self.datastore_url = meta.get(
+                "datastore_url", self.datastore_url
+            )  # file urls in the snapshot point here
+            logger.info(
+                f"Reading snapshot of {self.datastore_url} from {snapshot_path}"
+            )
+            self.fai_refs.update(snapshot.fai_refs())
+            self.checksums.update(snapshot.checksums())
+            taxon_list = self.select_taxa(
+                load_yaml(open(target, "r", encoding="utf-8").read())
+            )  # load taxon list
+            for taxon in taxon_list:
+                if not "genus" in taxon:  # genus required for all taxon
+                    self.record_error(KeyError("genus"), taxon=str(taxon))
+                    continue
+                stored = snapshot.taxon(taxon["genus"])  # indexed by genus
+                if not stored:
+                    logger.error(f"{taxon['genus']} not found in {snapshot_path}")
+                    continue
+                if self.selection.partial:  # as if only the selection was crawled
+                    stored = (stored[0], self.select_results(stored[1]))
+                self.metrics.timed(
+                    "write_taxon",
+                    taxon["genus"],
+                    self.write_taxon,
+                    taxon["genus"],
+                    *stored,
+                )
+            logger.info(f"{self.unchanged_outputs} unchanged files in {self.out_dir}")
+        finally:
+            snapshot.close()
+
+
+def error_matches(error, genus, species=None, collection_type=None):
+    """True if error was recorded for genus, species and collection_type when given, or for a datastore url below them"""
+    where = {"genus": genus, "species": species, "collection_type": collection_type}
+    path = "/".join(value for value in where.values() if value)
+    return f"/{path}/" in error.get("url", "") or all(
+        error.get(key) == value for key, value in where.items() if value
+    )
+
+
+def crawl_genus(settings, from_github, taxon, journal=False):
+    """Crawls taxon in a worker process for ProcessCollections.parse_collections.
+
+    Returns crawl_taxon results with the fai refs, CHECKSUMs, metrics, errors and, with journal, the
+    journal records so the parent can merge them.
+    """
+    parser = ProcessCollections(**settings)  # nothing is shared with the parent
+    parser.from_github = from_github
+    if journal:  # records are kept for the parent to write to its journal
+        parser.journal = ProgressJournal(None)
+    parser.start_pools()
+    try:
+        return parser.metrics.timed(
+            "crawl_genus", taxon.get("genus", ""), parser.crawl_taxon, taxon
+        ) + (
+            parser.fai_refs,
+            parser.checksums,
+            parser.metrics,
+            parser.errors,
+            parser.journal.recorded() if journal else "",
+        )
+    finally:
+        parser.stop_pools()
+        parser.metadata.close()
+        if parser.cache:
+            parser.cache.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,140 @@
+"""Journal of crawl and build progress used by ProcessCollections to resume a failed run."""
+
+#!/usr/bin/env python3
+
+import io
+import os
+import json
+import time
+import threading
+from metadata_loader import load_yaml, dump_yaml
+
+
+class ProgressJournal:
+    """Records completed genera, species, collection types and build commands as json lines in path.
+
+    Every record is flushed as soon as it is written, so a run that dies keeps everything it finished.
+    With resume the records already in path are replayed, otherwise path is started over. A line cut
+    short by a crash is ignored. Files are only recorded by collection type, species records name the
+    collection types holding theirs. Without path records are kept in memory, see recorded.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.genera = {}  # genus -> genus description
+        self.species = (
+            {}
+        )  # (genus, species) -> (species_files, lines, description, resources)
+        self.collection_types = (
+            {}
+        )  # (genus, species, type) -> (files, lines, resources)
+        self.jobs = {}  # (mode, name) -> md5 of the input the command succeeded with
+        self.errors = []  # error records replayed from path
+        self.lock = threading.Lock()  # records are written by every crawl thread
+        if resume and path and os.path.isfile(path):
+            self.replay()
+        self.handle = (
+            io.StringIO()
+        )  # records of a worker process, written by its parent
+        if path:
+            self.handle = open(  # pylint: disable=consider-using-with
+                path, "a" if resume else "w", encoding="utf-8"
+            )
+
+    def replay(self):
+        """Loads the records already in path"""
+        with open(self.path, encoding="utf-8") as journal_handle:
+            for line in journal_handle:
+                try:
+                    record = json.loads(line)
+                except ValueError:  # the last line of a run that was killed
+                    continue
+                event = record["event"]
+                if event == "genus":
+                    self.genera[record["genus"]] = load_yaml(record["description"])
+                elif event == "collection_type":
+                    self.collection_types[
+                        (record["genus"], record["species"], record["collection_type"])
+                    ] = (record["files"], record["lines"], record["resources"])
+                elif event == "species":
+                    keys = [
+                        (record["genus"], record["species"], collection_type)
+                        for collection_type in record["collection_types"]
+                    ]  # collection_type records are written before their species
+                    if not all(key in self.collection_types for key in keys):
+                        continue  # crawled again
+                    self.species[(record["genus"], record["species"])] = (
+                        {key[2]: self.collection_types[key][0] for key in keys},
+                        record["lines"],
+                        load_yaml(record["description"]),
+                        record["resources"],
+                    )
+                elif event == "job":
+                    self.jobs[(record["mode"], record["name"])] = record["md5"]
+                elif event == "error":
+                    self.errors.append(record)
+
+    def append(self, event, **record):
+        """Writes one record and flushes it to disk"""
+        record = dict(record, event=event, time=time.time())
+        line = json.dumps(record)
+        with self.lock:
+            self.handle.write(f"{line}\n")
+            self.handle.flush()
+
+    def add_genus(self, genus, description):
+        """Records the description of genus"""
+        self.append("genus", genus=genus, description=dump_yaml(description))
+
+    def add_collection_type(
+        self, genus, species, collection_type, files, lines, resources
+    ):
+        """Records every collection of collection_type crawled for genus species"""
+        self.append(
+            "collection_type",
+            genus=genus,
+            species=species,
+            collection_type=collection_type,
+            files=files,
+            lines=lines,
+            resources=resources,
+        )
+
+    def add_species(self, genus, species, species_files, lines, description, resources):
+        """Records a species crawled without errors like process_species returned it. species_files are in its collection_type records"""
+        self.append(
+            "species",
+            genus=genus,
+            species=species,
+            collection_types=list(species_files),
+            lines=lines,
+            description=dump_yaml(description),
+            resources=resources,
+        )
+
+    def recorded(self):
+        """Returns the json lines written to a journal without path"""
+        return self.handle.getvalue()
+
+    def add_recorded(self, lines):
+        """Writes json lines recorded by the journal of a worker process and flushes them"""
+        with self.lock:
+            self.handle.write(lines)
+            self.handle.flush()
+
+    def add_job(self, mode, name, md5):
+        """Records a build command for name in mode that succeeded with input md5"""
+        self.append("job", mode=mode, name=name, md5=md5)
+
+    def add_error(self, record):
+        """Records an error the crawl skipped"""
+        self.append("error", **record)
+
+    def built(self, mode, name, md5):
+        """True if the command for name in mode already succeeded with input md5"""
+        return bool(md5) and self.jobs.get((mode, name)) == md5
+
+    def close(self):
+        """Closes the journal file"""
+        with self.lock:
+            self.handle.close()
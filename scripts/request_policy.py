@@ -0,0 +1,193 @@
+"""Retries, backoff, timeouts and adaptive concurrency for the datastore requests sent by ProcessCollections."""
+
+#!/usr/bin/env python3
+
+import time
+import random
+import threading
+import email.utils
+import requests
+from run_metrics import url_class
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)  # worth sending again
+THROTTLE_STATUSES = (429, 503)  # the datastore asks us to slow down
+FAILED_STATUS = 599  # status of the response returned when every attempt raised
+
+TIMEOUTS = {
+    "listing": (5, 60),
+    "readme": (5, 20),
+    "description": (5, 20),
+    "busco": (5, 20),
+    "checksum": (5, 20),
+    "fai": (5, 20),
+    "head": (5, 10),
+    "sequence": (5, 60),
+    "other": (5, 30),
+}  # (connect, read) seconds by url class. listings of large species are slow to render, a sequence read is between chunks
+
+
+def retry_after_seconds(value):
+    """Returns the seconds a Retry-After header asks for, as seconds or an HTTP date, or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def failed_response(url, error):
+    """Returns an empty response with FAILED_STATUS for url so callers treat it like any failed request"""
+    response = requests.models.Response()
+    response.status_code = FAILED_STATUS
+    response.url = url
+    response.reason = str(error)
+    response._content = b""  # pylint: disable=protected-access
+    response._content_consumed = True  # pylint: disable=protected-access
+    return response
+
+
+class AdaptiveLimit:
+    """Additive increase, multiplicative decrease limit on requests in flight.
+
+    The limit grows by about one for every limit requests that go well and halves, at most once
+    per cooldown seconds, when a request is throttled, times out or is much slower than usual.
+    """
+
+    def __init__(self, maximum, minimum=1, cooldown=1.0):
+        self.maximum = max(1, int(maximum))
+        self.minimum = max(1, min(int(minimum), self.maximum))
+        self.cooldown = (
+            cooldown  # seconds between decreases, one burst of 503s is one signal
+        )
+        self.limit = float(self.maximum)  # start fast, back off when told to
+        self.in_flight = 0
+        self.decreased = 0.0  # time of the last decrease
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """Waits until another request may be sent"""
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, congested):
+        """Ends a request, lowering the limit if it saw congestion and raising it otherwise"""
+        with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if congested:
+                if now - self.decreased >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self.decreased = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+
+class RequestPolicy:
+    """Sends requests with per url class timeouts, retries with jittered exponential backoff and an AdaptiveLimit.
+
+    Responses with RETRY_STATUSES and requests that time out or fail to connect are sent again up
+    to retries times, waiting as long as Retry-After asks for when the server sends it. If every
+    attempt raised, a response with FAILED_STATUS is returned instead of raising.
+    """
+
+    def __init__(
+        self,
+        logger,
+        concurrency=8,
+        retries=4,
+        backoff=0.5,
+        max_backoff=30.0,
+        max_retry_after=300.0,
+        latency_factor=4.0,
+        timeouts=None,
+        metrics=None,
+    ):
+        self.logger = logger
+        self.limit = AdaptiveLimit(concurrency)
+        self.retries = max(0, int(retries))  # attempts after the first
+        self.backoff = backoff  # seconds before the first retry, doubled for each retry
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after  # longest Retry-After honored
+        self.latency_factor = (
+            latency_factor  # this much slower than usual is congestion
+        )
+        self.timeouts = dict(TIMEOUTS, **(timeouts or {}))
+        self.metrics = metrics  # RunMetrics counting retries
+        self.latency = {}  # url class -> moving average of response seconds
+        self.lock = threading.Lock()
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait before retry number attempt, counted from 0"""
+        wanted = retry_after_seconds(retry_after)
+        if wanted is not None:  # the server knows best
+            return min(wanted, self.max_retry_after)
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff * 2**attempt)
+        )  # full jitter spreads retries from concurrent threads
+
+    def slow(self, kind, seconds):
+        """Returns True if seconds is much slower than the average for kind, then updates the average"""
+        with self.lock:
+            average = self.latency.get(kind)
+            self.latency[kind] = (
+                seconds if average is None else average * 0.9 + seconds * 0.1
+            )
+        return average is not None and seconds > max(
+            0.05, average * self.latency_factor
+        )  # ignore jitter on fast responses
+
+    def send(self, send, method, url):
+        """Returns send(timeout) for method and url, retried as needed"""
+        logger = self.logger
+        kind = url_class(method, url)
+        for attempt in range(self.retries + 1):
+            response = None
+            error = None
+            self.limit.acquire()
+            start = time.perf_counter()
+            try:
+                response = send(self.timeouts.get(kind, self.timeouts["other"]))
+            except (requests.Timeout, requests.ConnectionError) as exception:
+                error = exception
+            finally:
+                seconds = time.perf_counter() - start
+                self.limit.release(
+                    error is not None
+                    or (
+                        response is not None
+                        and response.status_code in THROTTLE_STATUSES
+                    )
+                    or self.slow(kind, seconds)
+                )
+            if error is None and response.status_code not in RETRY_STATUSES:
+                return response
+            if attempt == self.retries:  # out of attempts
+                break
+            wait = self.delay(
+                attempt, response.headers.get("Retry-After") if response else None
+            )
+            logger.warning(
+                f"Retrying {method} {url} in {wait:.1f}s after {error or response.status_code}"
+            )
+            if response is not None:
+                response.close()  # return the connection to the pool
+            if self.metrics:
+                self.metrics.retry(method, url)
+            time.sleep(wait)
+        if error is not None:
+            logger.error(
+                f"{method} failed after {self.retries + 1} attempts for: {url}: {error}"
+            )
+            return failed_response(url, error)
+        logger.error(
+            f"{method} failed after {self.retries + 1} attempts with status {response.status_code} for: {url}"
+        )
+        return response
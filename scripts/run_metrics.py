@@ -0,0 +1,351 @@
+"""Timings and request counters collected by ProcessCollections during a run."""
+
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import threading
+import contextlib
+from collections import Counter
+from output_writer import write_if_changed
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)  # seconds, the prometheus client defaults
+DURATION_BUCKETS = (
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+    900.0,
+    3600.0,
+)  # seconds for subprocesses like makeblastdb
+SLOWEST = 10  # subprocesses listed by name in the json summary
+PREFIX = "lis_autocontent"  # prometheus metric name prefix
+
+
+def url_class(method, url):
+    """Returns the kind of datastore request for url: head, listing, readme, busco, fai, checksum, description, sequence or other"""
+    if method == "HEAD":
+        return "head"
+    if url.endswith("/"):
+        return "listing"
+    name = url.rsplit("/", 1)[-1]
+    if name.startswith("README."):
+        return "readme"
+    if "/BUSCO/" in url:
+        return "busco"
+    if name.endswith(".fai"):
+        return "fai"
+    if name.startswith("CHECKSUM."):
+        return "checksum"
+    if name.startswith("description_"):
+        return "description"
+    if name.endswith((".fna.gz", ".faa.gz")):
+        return "sequence"
+    return "other"
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observed values like a prometheus histogram"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets  # upper bounds, +Inf is count
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Adds value to every bucket it fits in"""
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[position] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        """Adds the observations of other, which uses the same buckets"""
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+
+    def to_dict(self):
+        """Returns the histogram for the json summary"""
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "buckets": {
+                str(bound): count for bound, count in zip(self.buckets, self.counts)
+            },
+        }
+
+    def prometheus(self, name, labels):
+        """Returns prometheus text lines for the histogram with labels"""
+        lines = [
+            f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+            for bound, count in zip(self.buckets, self.counts)
+        ]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+def label(value):
+    """Escapes value for a prometheus label"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RunMetrics:
+    """Collects wall and CPU time per phase, request latency, status codes and bytes per url class, and subprocess durations.
+
+    Phases are (phase, name) pairs such as ("crawl_genus", "Cicer"). The json summary keeps every
+    name, the prometheus textfile sums each phase over its names so genera and species do not
+    become series. CPU time is for the whole process, so phases running at the same time on threads
+    each count the CPU used by both.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()  # shared by crawl threads and the scheduler
+        self.started = time.time()
+        self.phases = {}  # (phase, name) -> [calls, wall seconds, cpu seconds]
+        self.latency = {}  # url class -> Histogram of request seconds
+        self.statuses = Counter()  # (url class, status code) -> responses
+        self.bytes = Counter()  # url class -> body bytes received
+        self.cache_hits = Counter()  # url class -> responses served by the cache
+        self.retries = Counter()  # url class -> requests sent again
+        self.subprocesses = {}  # mode -> Histogram of command seconds
+        self.exits = Counter()  # (mode, exit value) -> commands
+        self.slowest = []  # (seconds, mode, name) of the slowest commands
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["lock"]  # sent back from crawl_genus worker processes
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, phase, name=""):
+        """Times the with block as phase for name"""
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.add_phase(
+                phase,
+                name,
+                time.perf_counter() - wall,
+                time.process_time() - cpu,
+            )
+
+    def timed(self, phase, name, func, *args):
+        """Returns func(*args) timed as phase for name"""
+        with self.phase(phase, name):
+            return func(*args)
+
+    def add_phase(self, phase, name, wall, cpu, calls=1):
+        """Adds wall and cpu seconds to phase for name"""
+        with self.lock:
+            totals = self.phases.setdefault((phase, name), [0, 0.0, 0.0])
+            totals[0] += calls
+            totals[1] += wall
+            totals[2] += cpu
+
+    def observe_request(self, method, url, status, seconds, size=0):
+        """Records a response with status, or "error" if none arrived, for url that took seconds and carried size bytes"""
+        kind = url_class(method, url)
+        with self.lock:
+            if kind not in self.latency:
+                self.latency[kind] = Histogram(LATENCY_BUCKETS)
+            self.latency[kind].observe(seconds)
+            self.statuses[(kind, status)] += 1
+            self.bytes[kind] += size
+
+    def add_bytes(self, method, url, size):
+        """Records size bytes read from a streamed response for url"""
+        with self.lock:
+            self.bytes[url_class(method, url)] += size
+
+    def cache_hit(self, method, url):
+        """Records a response for url served by the response cache"""
+        with self.lock:
+            self.cache_hits[url_class(method, url)] += 1
+
+    def retry(self, method, url):
+        """Records a request for url that is about to be sent again"""
+        with self.lock:
+            self.retries[url_class(method, url)] += 1
+
+    def observe_subprocess(self, mode, name, seconds, returncode):
+        """Records a scheduled command for mode that exited with returncode after seconds"""
+        with self.lock:
+            if mode not in self.subprocesses:
+                self.subprocesses[mode] = Histogram(DURATION_BUCKETS)
+            self.subprocesses[mode].observe(seconds)
+            self.exits[(mode, returncode)] += 1
+            self.slowest = sorted(self.slowest + [(seconds, mode, name)], reverse=True)[
+                :SLOWEST
+            ]
+
+    def merge(self, other):
+        """Adds everything recorded by other, e.g. by a worker process"""
+        with self.lock:
+            for (phase, name), (calls, wall, cpu) in other.phases.items():
+                totals = self.phases.setdefault((phase, name), [0, 0.0, 0.0])
+                totals[0] += calls
+                totals[1] += wall
+                totals[2] += cpu
+            for mine, theirs, buckets in (
+                (self.latency, other.latency, LATENCY_BUCKETS),
+                (self.subprocesses, other.subprocesses, DURATION_BUCKETS),
+            ):
+                for key, histogram in theirs.items():
+                    if key not in mine:
+                        mine[key] = Histogram(buckets)
+                    mine[key].merge(histogram)
+            self.statuses.update(other.statuses)
+            self.bytes.update(other.bytes)
+            self.cache_hits.update(other.cache_hits)
+            self.retries.update(other.retries)
+            self.exits.update(other.exits)
+            self.slowest = sorted(self.slowest + other.slowest, reverse=True)[:SLOWEST]
+
+    def summary(self):
+        """Returns everything recorded as a json serializable dict"""
+        with self.lock:
+            requests = {}
+            for kind, histogram in sorted(self.latency.items()):
+                requests[kind] = {
+                    "latency": histogram.to_dict(),
+                    "statuses": {
+                        str(status): count
+                        for (status_kind, status), count in sorted(
+                            self.statuses.items(), key=str
+                        )
+                        if status_kind == kind
+                    },
+                    "bytes": self.bytes[kind],
+                    "cache_hits": self.cache_hits[kind],
+                    "retries": self.retries[kind],
+                }
+            return {
+                "started": self.started,
+                "wall_seconds": round(time.time() - self.started, 6),
+                "phases": [
+                    {
+                        "phase": phase,
+                        "name": name,
+                        "calls": calls,
+                        "wall_seconds": round(wall, 6),
+                        "cpu_seconds": round(cpu, 6),
+                    }
+                    for (phase, name), (calls, wall, cpu) in sorted(self.phases.items())
+                ],
+                "requests": requests,
+                "subprocesses": {
+                    mode: {
+                        "duration": histogram.to_dict(),
+                        "exits": {
+                            str(returncode): count
+                            for (exit_mode, returncode), count in sorted(
+                                self.exits.items(), key=str
+                            )
+                            if exit_mode == mode
+                        },
+                    }
+                    for mode, histogram in sorted(self.subprocesses.items())
+                },
+                "slowest_subprocesses": [
+                    {"mode": mode, "name": name, "seconds": round(seconds, 6)}
+                    for seconds, mode, name in self.slowest
+                ],
+            }
+
+    def prometheus(self):
+        """Returns everything recorded in the prometheus text exposition format"""
+        summary = self.summary()
+        lines = [
+            f"# TYPE {PREFIX}_run_seconds gauge",
+            f"{PREFIX}_run_seconds {summary['wall_seconds']}",
+        ]
+        phases = {}  # phase -> totals over every name, one series per phase
+        for phase in summary["phases"]:
+            totals = phases.setdefault(phase["phase"], Counter())
+            totals.update(
+                {key: phase[key] for key in ("calls", "wall_seconds", "cpu_seconds")}
+            )
+        for metric, key in (
+            ("phase_calls_total", "calls"),
+            ("phase_wall_seconds_total", "wall_seconds"),
+            ("phase_cpu_seconds_total", "cpu_seconds"),
+        ):
+            lines.append(f"# TYPE {PREFIX}_{metric} counter")
+            lines += [
+                f'{PREFIX}_{metric}{{phase="{label(phase)}"}} {round(totals[key], 6)}'
+                for phase, totals in sorted(phases.items())
+            ]
+        lines.append(f"# TYPE {PREFIX}_request_seconds histogram")
+        with self.lock:
+            for kind, histogram in sorted(self.latency.items()):
+                lines += histogram.prometheus(
+                    f"{PREFIX}_request_seconds", f'class="{kind}"'
+                )
+            lines.append(f"# TYPE {PREFIX}_responses_total counter")
+            lines += [
+                f'{PREFIX}_responses_total{{class="{kind}",status="{status}"}} {count}'
+                for (kind, status), count in sorted(self.statuses.items(), key=str)
+            ]
+            lines.append(f"# TYPE {PREFIX}_response_bytes_total counter")
+            lines += [
+                f'{PREFIX}_response_bytes_total{{class="{kind}"}} {count}'
+                for kind, count in sorted(self.bytes.items())
+            ]
+            lines.append(f"# TYPE {PREFIX}_cache_hits_total counter")
+            lines += [
+                f'{PREFIX}_cache_hits_total{{class="{kind}"}} {count}'
+                for kind, count in sorted(self.cache_hits.items())
+            ]
+            lines.append(f"# TYPE {PREFIX}_retries_total counter")
+            lines += [
+                f'{PREFIX}_retries_total{{class="{kind}"}} {count}'
+                for kind, count in sorted(self.retries.items())
+            ]
+            lines.append(f"# TYPE {PREFIX}_subprocess_seconds histogram")
+            for mode, histogram in sorted(self.subprocesses.items()):
+                lines += histogram.prometheus(
+                    f"{PREFIX}_subprocess_seconds", f'mode="{label(mode)}"'
+                )
+            lines.append(f"# TYPE {PREFIX}_subprocess_exits_total counter")
+            lines += [
+                f'{PREFIX}_subprocess_exits_total{{mode="{label(mode)}",code="{returncode}"}} {count}'
+                for (mode, returncode), count in sorted(self.exits.items(), key=str)
+            ]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Writes the json summary to path and the prometheus textfile next to it as .prom. Returns the .prom path"""
+        prom_path = f"{os.path.splitext(path)[0]}.prom"
+        write_if_changed(path, json.dumps(self.summary(), indent=2))
+        write_if_changed(
+            prom_path, self.prometheus()
+        )  # renamed into place for the node_exporter textfile collector
+        return prom_path
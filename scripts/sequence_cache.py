@@ -0,0 +1,86 @@
+"""Content addressed cache of the compressed sequence files ProcessCollections builds BLAST databases from."""
+
+#!/usr/bin/env python3
+
+import os
+import hashlib
+import pathlib
+import threading
+import requests
+
+CHUNK_SIZE = 1024 * 1024  # bytes read from the response and hashed at a time
+
+
+class SequenceCache:
+    """Downloads .fna.gz and .faa.gz files into cache_dir, named by the md5 from their collection CHECKSUM.
+
+    Files are streamed to disk and hashed while they download, a file whose md5 does not match is
+    downloaded again up to retries times and never enters the cache. A cached file is reused by
+    every later build of the same content. Files without a CHECKSUM md5 are downloaded every time.
+    """
+
+    def __init__(self, cache_dir, send, logger, metrics=None, retries=2):
+        self.cache_dir = cache_dir
+        self.send = send  # send(url) returns a streamed GET response
+        self.logger = logger
+        self.metrics = metrics  # RunMetrics counting bytes and cache hits
+        self.retries = retries  # downloads again after a failed or corrupt one
+        pathlib.Path(cache_dir).mkdir(parents=True, exist_ok=True)
+
+    def path(self, url, md5):
+        """Returns the cache path of the file at url with md5"""
+        key = md5 or f"url-{hashlib.md5(url.encode('utf-8')).hexdigest()}"
+        suffix = ".".join(url.rsplit("/", 1)[-1].split(".")[-2:])  # fna.gz or faa.gz
+        return f"{self.cache_dir}/{key[:2]}/{key}.{suffix}"
+
+    def fetch(self, url, md5):
+        """Returns the cache path of url, downloading it unless a file with md5 is already cached"""
+        logger = self.logger
+        path = self.path(url, md5)
+        if md5 and os.path.isfile(path):  # verified when it was downloaded
+            logger.debug(f"Sequence cache hit for: {url}")
+            if self.metrics:
+                self.metrics.cache_hit("GET", url)
+            return path
+        pathlib.Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                logger.warning(f"Downloading {url} again after {error}")
+            try:
+                digest = self.download(url, tmp_path)
+            except requests.RequestException as exception:  # failed part way
+                error = exception
+                continue
+            if md5 and digest != md5:
+                error = ValueError(f"md5 {digest} does not match CHECKSUM {md5}")
+                continue
+            os.replace(tmp_path, path)
+            return path
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise RuntimeError(
+            f"Download failed after {self.retries + 1} attempts for: {url}: {error}"
+        )
+
+    def download(self, url, out_path):
+        """Streams url into out_path. Returns the md5 of what was written"""
+        digest = hashlib.md5()
+        size = 0
+        response = self.send(url)
+        try:
+            if response.status_code != 200:
+                raise requests.HTTPError(
+                    f"GET failed with status {response.status_code}"
+                )
+            with open(out_path, "wb") as out_handle:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    digest.update(chunk)
+                    out_handle.write(chunk)
+                    size += len(chunk)
+        finally:
+            response.close()
+            if self.metrics:
+                self.metrics.add_bytes("GET", url, size)
+        return digest.hexdigest()
@@ -0,0 +1,29 @@
+"""JSON encoded JBrowse2 session links ProcessCollections writes to the species resources."""
+
+#!/usr/bin/env python3
+
+import json
+import urllib.parse
+
+URL_SAFE = ":,[]{}"  # readable in spec- sessions, the rest is percent encoded
+
+
+def session_json(spec):
+    """Canonical JSON of a session spec, the same spec always gives the same text"""
+    return json.dumps(spec, sort_keys=True, separators=(",", ":"))
+
+
+def session_url(jbrowse_url, spec):
+    """Link opening spec in JBrowse2 at jbrowse_url.
+
+    A single LinearGenomeView is opened with the assembly, loc and tracks query parameters,
+    anything else with a spec- session of the JSON encoded spec.
+    """
+    views = spec["views"]
+    if len(views) == 1 and views[0]["type"] == "LinearGenomeView":
+        params = {"config": "config.json", "assembly": views[0]["assembly"]}
+        params["loc"] = views[0]["loc"]
+        if views[0].get("tracks"):
+            params["tracks"] = ",".join(views[0]["tracks"])
+        return f"{jbrowse_url}/?{urllib.parse.urlencode(params, safe=URL_SAFE)}"
+    return f"{jbrowse_url}/?config=config.json&session=spec-{urllib.parse.quote(session_json(spec), safe=URL_SAFE)}"
@@ -17,6 +17,26 @@ setup(
         "scripts/lis_autocontent.py",
         "scripts/process_collections.py",
         "scripts/lis_cli.py",
+        "scripts/http_cache.py",
+        "scripts/job_scheduler.py",
+        "scripts/build_manifest.py",
+        "scripts/jbrowse_config.py",
+        "scripts/listing_scanner.py",
+        "scripts/datastore_snapshot.py",
+        "scripts/dscensor_export.py",
+        "scripts/local_index.py",
+        "scripts/metadata_loader.py",
+        "scripts/output_writer.py",
+        "scripts/run_metrics.py",
+        "scripts/request_policy.py",
+        "scripts/progress_journal.py",
+        "scripts/blast_aliases.py",
+        "scripts/sequence_cache.py",
+        "scripts/annotation_index.py",
+        "scripts/session_links.py",
+        "scripts/collection_manifest.py",
+        "scripts/file_records.py",
+        "scripts/crawl_selection.py",
     ],
     entry_points={
         "console_scripts": [